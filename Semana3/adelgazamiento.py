@@ -0,0 +1,275 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# ==============================
+# REGLAS DE ADELGAZAMIENTO (retazo R de 3x3, enteros 0/1)
+# ==============================
+def parathining1(R):
+    return R[0,:].sum()==0 and R[2,:].sum()==3
+def thining1(R):
+    return parathining1(R) or parathining1(np.rot90(R,k=1)) or parathining1(np.rot90(R,k=2)) or parathining1(np.rot90(R,k=3))
+def parathining2(R):
+    return (R[1,0]+R[2,1])==2 and (R[0,1]+R[0,2]+R[1,2])==0
+def thining2(R):
+    return parathining2(R) or parathining2(np.rot90(R,k=1)) or parathining2(np.rot90(R,k=2)) or parathining2(np.rot90(R,k=3))
+def parapruning1(R):
+    return (R[1,0]+R[0,:].sum()+R[:,2].sum())==0
+def pruning1(R):
+    return parapruning1(R) or parapruning1(np.rot90(R,k=1)) or parapruning1(np.rot90(R,k=2)) or parapruning1(np.rot90(R,k=3))
+def parapruning2(R):
+    return (R[:,0].sum()+R[0,:].sum()+R[1,2])==0
+def pruning2(R):
+    return parapruning2(R) or parapruning2(np.rot90(R,k=1)) or parapruning2(np.rot90(R,k=2)) or parapruning2(np.rot90(R,k=3))
+def caso1(R):
+    return (R[1,0]+R[2,1])==2 and (R[0,1]+R[1,2])==0
+def caso2(R):
+    return (R[1,0]+R[0,1])==2 and (R[2,1]+R[2,2]+R[1,2])==0
+def caso3(R):
+    return (R[1,0]+R[2,1])==0 and (R[0,1]+R[1,2])==2
+def caso4(R):
+    return (R[0,0]+R[0,1]+R[1,0])==0 and (R[2,1]+R[1,2])==2
+
+def se_elimina(R):
+    return (thining1(R) or thining2(R) or pruning1(R) or pruning2(R) or
+            caso1(R) or caso2(R) or caso3(R) or caso4(R))
+
+# ==============================
+# CODIFICACIÓN DE LA VECINDAD EN 8 BITS
+# ==============================
+# Cada vecino P1..P8 ocupa un bit (P1 = bit 0, ..., P8 = bit 7):
+#   P1 P2 P3
+#   P8 P  P4
+#   P7 P6 P5
+# (fila, columna) de cada vecino dentro del retazo de 3x3, en orden P1..P8
+VECINOS = ((0,0), (0,1), (0,2), (1,2), (2,2), (2,1), (2,0), (1,0))
+
+def retazo_desde_codigo(codigo):
+    """Reconstruye el retazo de 3x3 (con el píxel central en 1) a partir de su código."""
+    R = np.zeros((3,3), dtype=int)
+    R[1,1] = 1
+    for bit, (f, c) in enumerate(VECINOS):
+        R[f,c] = (codigo >> bit) & 1
+    return R
+
+# Tabla de 256 entradas: True si el píxel central debe eliminarse
+TABLA_ELIMINACION = np.array([se_elimina(retazo_desde_codigo(k)) for k in range(256)], dtype=bool)
+
+def codigos_vecindad(Img):
+    """
+    Calcula el código de 8 bits de la vecindad de cada píxel de la imagen
+    mediante desplazamientos de NumPy. Los bordes de la imagen quedan en 0.
+    """
+    Img = np.asarray(Img, dtype=bool)
+    m, n = Img.shape
+    codigos = np.zeros((m, n), dtype=np.uint8)
+    if m < 3 or n < 3:
+        return codigos
+    interior = codigos[1:m-1, 1:n-1]
+    for bit, (f, c) in enumerate(VECINOS):
+        interior |= Img[f:m-2+f, c:n-2+c].astype(np.uint8) << bit
+    return codigos
+
+# ==============================
+# PASADAS DE ADELGAZAMIENTO
+# ==============================
+def _pasada_raster(Img):
+    """
+    Una pasada equivalente, bit a bit, al recorrido original píxel a píxel
+    (orden raster y modificación en el mismo arreglo).
+    Cada fila se resuelve con operaciones vectorizadas: la fila de arriba ya
+    está actualizada, la de abajo y el vecino derecho todavía no, y la única
+    dependencia secuencial (el vecino izquierdo, P8) se resuelve con una
+    suma acumulada de paridades.
+    """
+    m, n = Img.shape
+    nuevo = Img.copy()
+    columnas = np.arange(n)
+    for i in range(1, m-1):
+        arriba = nuevo[i-1]
+        actual = Img[i]
+        abajo = Img[i+1]
+        # Código sin el bit de P8 (vecino izquierdo)
+        base = (arriba[:-2].astype(np.uint8)
+                | arriba[1:-1].astype(np.uint8) << 1
+                | arriba[2:].astype(np.uint8) << 2
+                | actual[2:].astype(np.uint8) << 3
+                | abajo[2:].astype(np.uint8) << 4
+                | abajo[1:-1].astype(np.uint8) << 5
+                | abajo[:-2].astype(np.uint8) << 6)
+        d0 = np.zeros(n, dtype=bool)
+        d1 = np.zeros(n, dtype=bool)
+        d0[1:-1] = TABLA_ELIMINACION[base]        # vecino izquierdo en 0
+        d1[1:-1] = TABLA_ELIMINACION[base | 128]  # vecino izquierdo en 1
+        # Si el resultado no depende del vecino izquierdo, el valor es fijo;
+        # si depende, el píxel copia (d0) o invierte (d1) el valor de su izquierda.
+        es_fijo = ~actual | (d0 == d1)
+        es_fijo[0] = es_fijo[-1] = True
+        valor_fijo = actual & ~d0
+        valor_fijo[0], valor_fijo[-1] = actual[0], actual[-1]
+        invierte = (~es_fijo & d1).astype(np.int32)
+        ultimo_fijo = np.maximum.accumulate(np.where(es_fijo, columnas, 0))
+        paridad = np.cumsum(invierte)
+        paridad = (paridad - paridad[ultimo_fijo]) & 1
+        nuevo[i] = valor_fijo[ultimo_fijo] ^ paridad.astype(bool)
+    return nuevo
+
+def _pasada_paralela(Img):
+    """Una pasada donde todos los píxeles se deciden a partir de la misma imagen."""
+    return Img & ~TABLA_ELIMINACION[codigos_vecindad(Img)]
+
+# Número de pasadas que usaba el algoritmo original. Las reglas de poda
+# (pruning1/pruning2) acortan un píxel cada extremo de cresta en cada pasada,
+# por lo que repetir hasta que la imagen no cambie también erosiona las
+# crestas abiertas (y con ellas las terminaciones).
+PASADAS_ORIGINALES = 2
+
+def adelgazar(Img, iteraciones=None, modo="raster"):
+    """
+    Adelgaza una imagen binaria usando la tabla de eliminación de 256 entradas.
+    - iteraciones: número de pasadas; None repite hasta que la imagen no cambie.
+    - modo: "raster" reproduce exactamente el algoritmo original;
+            "paralelo" decide todos los píxeles a la vez (más rápido, pero el
+            resultado puede diferir del original).
+    Devuelve una nueva imagen booleana; la imagen de entrada no se modifica.
+    """
+    if modo == "raster":
+        pasada = _pasada_raster
+    elif modo == "paralelo":
+        pasada = _pasada_paralela
+    else:
+        raise ValueError(f"Modo de adelgazamiento desconocido: {modo}")
+
+    Img = np.array(Img, dtype=bool)
+    if Img.shape[0] < 3 or Img.shape[1] < 3:
+        return Img.copy()
+    k = 0
+    while iteraciones is None or k < iteraciones:
+        nuevo = pasada(Img)
+        k += 1
+        if np.array_equal(nuevo, Img):
+            break
+        Img = nuevo
+    return Img
+
+# ==============================
+# ZHANG-SUEN Y GUO-HALL POR TABLA
+# ==============================
+# Mismas reglas que cv2.ximgproc.thinning, con los vecinos nombrados como en
+# OpenCV: p9 p2 p3 / p8 P p4 / p7 p6 p5 (p9 = P1, p2 = P2, ..., p8 = P8).
+def _vecinos_opencv(codigo):
+    p9, p2, p3, p4, p5, p6, p7, p8 = [(codigo >> bit) & 1 for bit in range(8)]
+    return p2, p3, p4, p5, p6, p7, p8, p9
+
+def _zhangsuen(codigo, subiteracion):
+    p2, p3, p4, p5, p6, p7, p8, p9 = _vecinos_opencv(codigo)
+    A = ((p2 == 0 and p3 == 1) + (p3 == 0 and p4 == 1) + (p4 == 0 and p5 == 1) + (p5 == 0 and p6 == 1) +
+         (p6 == 0 and p7 == 1) + (p7 == 0 and p8 == 1) + (p8 == 0 and p9 == 1) + (p9 == 0 and p2 == 1))
+    B = p2 + p3 + p4 + p5 + p6 + p7 + p8 + p9
+    m1 = p2*p4*p6 if subiteracion == 0 else p2*p4*p8
+    m2 = p4*p6*p8 if subiteracion == 0 else p2*p6*p8
+    return A == 1 and 2 <= B <= 6 and m1 == 0 and m2 == 0
+
+def _guohall(codigo, subiteracion):
+    p2, p3, p4, p5, p6, p7, p8, p9 = _vecinos_opencv(codigo)
+    C = ((not p2 and (p3 or p4)) + (not p4 and (p5 or p6)) +
+         (not p6 and (p7 or p8)) + (not p8 and (p9 or p2)))
+    N1 = (p9 or p2) + (p3 or p4) + (p5 or p6) + (p7 or p8)
+    N2 = (p2 or p3) + (p4 or p5) + (p6 or p7) + (p8 or p9)
+    N = min(N1, N2)
+    m = ((p6 or p7 or not p9) and p8) if subiteracion == 0 else ((p2 or p3 or not p5) and p4)
+    return C == 1 and 2 <= N <= 3 and not m
+
+# Una tabla de eliminación por subiteración
+TABLAS_ITERATIVAS = {
+    "zhangsuen": [np.array([_zhangsuen(k, s) for k in range(256)], dtype=bool) for s in (0, 1)],
+    "guohall": [np.array([_guohall(k, s) for k in range(256)], dtype=bool) for s in (0, 1)],
+    "paralelo": [TABLA_ELIMINACION],
+}
+
+# ==============================
+# ADELGAZAMIENTO EN FRANJAS (VARIOS NÚCLEOS)
+# ==============================
+def _eliminar_en_franja(Img, tabla, desde, hasta):
+    """Píxeles a eliminar en las filas [desde, hasta), leyendo una fila fantasma arriba y abajo."""
+    a, b = max(desde - 1, 0), min(hasta + 1, Img.shape[0])
+    codigos = codigos_vecindad(Img[a:b])[desde - a:hasta - a]
+    return Img[desde:hasta] & tabla[codigos]
+
+def adelgazar_en_franjas(Img, tipo="zhangsuen", hilos=None, franjas=None, iteraciones=None):
+    """
+    Adelgazamiento iterativo repartido en franjas horizontales que se procesan
+    en paralelo con un pool de hilos (NumPy libera el GIL en estas operaciones).
+    - tipo: "zhangsuen" y "guohall" dan exactamente lo mismo que
+            cv2.ximgproc.thinning; "paralelo" equivale a adelgazar(modo="paralelo").
+            El modo raster no se puede repartir: cada píxel depende del anterior.
+    - hilos: hilos del pool (por defecto, uno por núcleo).
+    - franjas: cantidad de franjas (por defecto, 4 por hilo).
+    - iteraciones: None repite hasta que la imagen no cambie.
+    En cada subiteración todas las franjas calculan qué eliminar sobre la misma
+    imagen y recién después se aplican los cambios, así que el borde que ve cada
+    franja (su fila fantasma) siempre está al día. Una franja que no cambió en
+    una iteración completa, con sus vecinas también quietas, ya no se recalcula.
+    Devuelve una imagen uint8 de 0 y 255.
+    """
+    tablas = TABLAS_ITERATIVAS[tipo]
+    Img = np.asarray(Img) > 0
+    m, n = Img.shape
+    if m < 3 or n < 3:
+        return Img.astype(np.uint8) * 255
+    hilos = hilos or os.cpu_count() or 1
+    franjas = min(franjas or 4 * hilos, m)
+    limites = np.linspace(0, m, franjas + 1).astype(int)
+    activas = set(range(franjas))
+    k = 0
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        while activas and (iteraciones is None or k < iteraciones):
+            cambiadas = set()
+            for tabla in tablas:
+                orden = sorted(activas)
+                eliminar = pool.map(lambda f: _eliminar_en_franja(Img, tabla, limites[f], limites[f+1]), orden)
+                for f, borrar in zip(orden, list(eliminar)):
+                    if borrar.any():
+                        Img[limites[f]:limites[f+1]] &= ~borrar
+                        cambiadas.add(f)
+            activas = {v for f in cambiadas for v in (f - 1, f, f + 1) if 0 <= v < franjas}
+            k += 1
+    return Img.astype(np.uint8) * 255
+
+def medir_aceleracion(Img, tipo="zhangsuen", hilos=(1, 2, 4, 8), repeticiones=3):
+    """
+    Mide el adelgazamiento en franjas con distintas cantidades de hilos y
+    comprueba que el resultado sea idéntico al de un hilo. Devuelve una lista
+    de diccionarios con hilos, segundos (el mejor de las repeticiones),
+    aceleración respecto de un hilo e iguales.
+    """
+    referencia = None
+    filas = []
+    for h in hilos:
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = adelgazar_en_franjas(Img, tipo, hilos=h)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        if referencia is None:
+            referencia, base = resultado, mejor
+        filas.append({"hilos": h, "segundos": mejor, "aceleracion": base / mejor,
+                      "iguales": bool(np.array_equal(resultado, referencia))})
+    return filas
+
+if __name__ == "__main__":
+    import sys
+    import cv2
+    img = cv2.imread(sys.argv[1], cv2.IMREAD_GRAYSCALE)
+    _, binarizado = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    print(f"{os.cpu_count()} núcleos, imagen {img.shape[1]}x{img.shape[0]}")
+    for tipo in ("zhangsuen", "guohall"):
+        inicio = time.perf_counter()
+        serie = cv2.ximgproc.thinning(binarizado, thinningType=getattr(cv2.ximgproc, "THINNING_" + tipo.upper()))
+        segundos_cv2 = time.perf_counter() - inicio
+        print(f"{tipo}: OpenCV {segundos_cv2*1000:.1f} ms, "
+              f"igual a OpenCV: {np.array_equal(adelgazar_en_franjas(binarizado, tipo), serie)}")
+        for fila in medir_aceleracion(binarizado, tipo):
+            print(f"  {fila['hilos']} hilos: {fila['segundos']*1000:.1f} ms "
+                  f"(x{fila['aceleracion']:.2f}) iguales: {fila['iguales']}")
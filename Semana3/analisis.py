@@ -0,0 +1,146 @@
+import numpy as np
+import cv2
+from adelgazamiento import adelgazar, adelgazar_en_franjas, PASADAS_ORIGINALES
+from minucias import detectar_minucias, orientar_y_calificar, filtrar_por_calidad
+from perfil import SIN_PERFIL
+from depuracion import depurar_minucias, quitar_borde
+from segmentacion import segmentar
+from realce import realzar
+from umbral import umbral_local, VENTANA
+
+# ==============================
+# PARÁMETROS DEL PIPELINE
+# ==============================
+# Valores por defecto; se pueden sobrescribir pasando un diccionario parcial.
+PARAMETROS_POR_DEFECTO = {
+    "segmentacion": False,     # Recortar a la huella y poner en fondo lo que está fuera de ella (segmentacion.py)
+    "realce": False,           # Filtros de Gabor orientados antes de binarizar (realce.py)
+    "umbral": None,            # None = Otsu; un número = umbral fijo
+    "binarizacion": "global",  # "global" (el umbral de arriba), "sauvola" o "niblack" (umbral.py)
+    "ventana": VENTANA,        # Lado de la ventana de los umbrales locales
+    "k": None,                 # Constante k de Sauvola/Niblack; None = valor típico del método
+    "limpieza": True,          # Apertura morfológica de 3x3 antes de adelgazar
+    "adelgazamiento": "zhangsuen", # "zhangsuen", "guohall" (OpenCV) o "tabla" (adelgazamiento.py)
+    "hilos": 1,                # Más de 1: Zhang-Suen/Guo-Hall en franjas paralelas (mismo resultado)
+    "depuracion": False,       # Quitar crestas cortadas, espolones, puentes y minucias del borde (depuracion.py)
+    "calidad_minima": 0.0,     # Se descartan las minucias con calidad (en [0, 1]) menor a esta
+    "MIN_LAKE_AREA": 5,
+    "MAX_LAKE_AREA": 150,
+    "MIN_ISLAND_PIXELS": 1,
+    "MAX_ISLAND_PIXELS": 10,
+}
+
+def completar_parametros(parametros=None):
+    completos = dict(PARAMETROS_POR_DEFECTO)
+    if parametros:
+        desconocidos = set(parametros) - set(completos)
+        if desconocidos:
+            raise ValueError(f"Parámetros desconocidos: {sorted(desconocidos)}")
+        completos.update(parametros)
+    return completos
+
+# ==============================
+# ETAPAS
+# ==============================
+def binarizar(img_gray, umbral=None, metodo="global", ventana=VENTANA, k=None):
+    """
+    Binariza con crestas en blanco (255) y valles en negro (0). Con metodo
+    "sauvola" o "niblack" cada píxel se compara con el umbral de su ventana
+    y `umbral` se ignora.
+    """
+    if metodo != "global":
+        T = umbral_local(img_gray, metodo, ventana, k)
+        return np.where(img_gray > T, 0, 255).astype(np.uint8)
+    if umbral is None:
+        _, binarizado = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    else:
+        _, binarizado = cv2.threshold(img_gray, umbral, 255, cv2.THRESH_BINARY_INV)
+    return binarizado
+
+def limpiar(binarizado):
+    # La apertura (MORPH_OPEN) elimina el ruido tipo "sal" (puntos blancos aislados)
+    kernel = np.ones((3,3), np.uint8)
+    return cv2.morphologyEx(binarizado, cv2.MORPH_OPEN, kernel, iterations=1)
+
+def adelgazar_imagen(binarizado, tipo="zhangsuen", hilos=1):
+    """Devuelve el esqueleto como imagen uint8 de 0 y 255."""
+    if hilos > 1 and tipo in ("zhangsuen", "guohall"):
+        return adelgazar_en_franjas(binarizado, tipo, hilos)
+    if tipo == "zhangsuen":
+        return cv2.ximgproc.thinning(binarizado, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+    if tipo == "guohall":
+        return cv2.ximgproc.thinning(binarizado, thinningType=cv2.ximgproc.THINNING_GUOHALL)
+    if tipo == "tabla":
+        return (adelgazar(binarizado > 0, iteraciones=PASADAS_ORIGINALES) * 255).astype(np.uint8)
+    raise ValueError(f"Tipo de adelgazamiento desconocido: {tipo}")
+
+def _en_imagen_completa(recorte, forma, caja):
+    """Pone un recorte en su lugar dentro de una imagen de fondo del tamaño original."""
+    y0, y1, x0, x1 = caja
+    completa = np.zeros(forma, dtype=recorte.dtype)
+    completa[y0:y1, x0:x1] = recorte
+    return completa
+
+# ==============================
+# PIPELINE COMPLETO
+# ==============================
+def analizar_huella(img_gray, parametros=None, cache=None, perfil=SIN_PERFIL):
+    """
+    Ejecuta (segmentación ->) (realce ->) binarizado -> limpieza -> adelgazamiento -> Crossing Number ->
+    lagos e islas -> orientación y calidad (-> depuración) sobre una imagen en escala de
+    grises (uint8). Devuelve un diccionario con las imágenes intermedias y un
+    único arreglo de minucias (DTYPE_MINUCIA) con los cuatro tipos, cada una
+    con su ángulo y su calidad.
+    Con una CacheResultados (cache.py), una imagen ya analizada con los
+    mismos parámetros devuelve el resultado guardado. Con un Perfil
+    (perfil.py), se registra el tiempo de cada etapa.
+    """
+    p = completar_parametros(parametros)
+    img_gray = np.asarray(img_gray, dtype=np.uint8)
+    if cache is not None:
+        clave = cache.clave(img_gray, p)
+        resultado = perfil.medir("cache", cache.obtener, clave)
+        if resultado is None:
+            resultado = analizar_huella(img_gray, p, perfil=perfil)
+            cache.guardar(clave, resultado)
+        return resultado
+
+    forma = img_gray.shape
+    mascara = None
+    if p["segmentacion"]:
+        # Las etapas siguientes trabajan solo sobre la caja de la huella
+        mascara, caja = perfil.medir("segmentado", segmentar, img_gray)
+        y0, y1, x0, x1 = caja
+        img_gray = img_gray[y0:y1, x0:x1]
+        dentro = mascara[y0:y1, x0:x1]
+    if p["realce"]:
+        img_gray = perfil.medir("realzado", realzar, img_gray)
+    binarizado = perfil.medir("binarizado", binarizar, img_gray, p["umbral"],
+                             p["binarizacion"], p["ventana"], p["k"])
+    if mascara is not None:
+        binarizado[~dentro] = 0
+    limpio = perfil.medir("limpio", limpiar, binarizado) if p["limpieza"] else binarizado
+    esqueleto = perfil.medir("adelgazado", adelgazar_imagen, limpio, p["adelgazamiento"], p["hilos"])
+
+    minucias = perfil.medir("minucias", detectar_minucias, esqueleto, p["MIN_LAKE_AREA"], p["MAX_LAKE_AREA"],
+                            p["MIN_ISLAND_PIXELS"], p["MAX_ISLAND_PIXELS"])
+    minucias = perfil.medir("orientacion", orientar_y_calificar, minucias, esqueleto, img_gray)
+    if mascara is not None:
+        # Las crestas cortadas por el borde de la máscara dan terminaciones falsas
+        minucias = quitar_borde(minucias, dentro)
+    if p["depuracion"]:
+        minucias = perfil.medir("depuracion", depurar_minucias, minucias, esqueleto,
+                                None if mascara is None else dentro)
+    if p["calidad_minima"] > 0:
+        minucias = filtrar_por_calidad(minucias, p["calidad_minima"])
+    if mascara is not None:
+        minucias["x"] += x0
+        minucias["y"] += y0
+        binarizado, limpio, esqueleto = (_en_imagen_completa(a, forma, caja) for a in (binarizado, limpio, esqueleto))
+    return {
+        "binarizado": binarizado,
+        "limpio": limpio,
+        "esqueleto": esqueleto,
+        "minucias": minucias,
+        "mascara": mascara,
+    }
@@ -0,0 +1,313 @@
+"""
+Benchmark reproducible del análisis de huellas.
+
+Genera huellas sintéticas (crestas sinusoidales con un núcleo tipo
+remolino, ruido y fondo claro) a varias resoluciones, mide cada etapa y cada
+variante de implementación, comprueba que las variantes que deben coincidir
+coincidan y escribe todo en JSON.
+
+Ejemplos:
+    python benchmark.py -o base.json
+    python benchmark.py --tamanos 256 512 1024 2048 -o nuevo.json --comparar base.json
+
+Con --comparar, el programa termina con código 1 si alguna medición es más
+lenta que la de referencia por encima de --tolerancia, o si falla alguna
+comprobación de coincidencia.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import cv2
+from adelgazamiento import adelgazar, adelgazar_en_franjas, PASADAS_ORIGINALES
+from analisis import analizar_huella, binarizar, limpiar
+from cache import CacheResultados
+from minucias import detectar_minucias, extraer_minucias, detectar_lagos, detectar_islas, filtrar_por_calidad
+from mosaico import analizar_por_mosaicos
+from perfil import Perfil
+from umbral import medias_locales, VENTANA
+
+TAMANOS = (256, 512, 1024)
+PERIODO = 9   # Distancia entre crestas en píxeles (unos 500 dpi)
+# Huellas reales de la carpeta para las comprobaciones que las sintéticas no cubren (no tienen bifurcaciones ni lagos)
+MUESTRAS = ("huella.tif", "huella3.tif", "huella5.tif")
+
+# ==============================
+# HUELLAS SINTÉTICAS
+# ==============================
+def huella_sintetica(tam, semilla=0, periodo=PERIODO):
+    """
+    Imagen uint8 de tam x tam con crestas oscuras sobre fondo claro; la misma
+    semilla da la misma imagen. Casi todas sus minucias son crestas cortadas
+    por el borde de la huella (la depuración las quita todas menos el núcleo).
+    """
+    rng = np.random.default_rng(semilla)
+    y, x = np.mgrid[0:tam, 0:tam].astype(np.float64)
+    cx, cy = tam * rng.uniform(0.4, 0.6), tam * rng.uniform(0.4, 0.6)
+    r = np.hypot(x - cx, y - cy)
+    angulo = np.arctan2(y - cy, x - cx)
+    # Círculos concéntricos deformados: el ángulo agrega un remolino y las ondas lentas curvan las crestas
+    fase = 2*np.pi / periodo * (r + 0.8*periodo*angulo / (2*np.pi)
+                                + 0.04*tam*np.sin(x / (0.11*tam)) * np.cos(y / (0.13*tam)))
+    img = 128 + 90*np.cos(fase) + rng.normal(0, 18, (tam, tam))
+    # Fuera de la elipse de la huella queda el fondo claro
+    fuera = ((x - tam/2) / (0.45*tam))**2 + ((y - tam/2) / (0.48*tam))**2 > 1
+    img[fuera] = 235 + rng.normal(0, 4, np.count_nonzero(fuera))
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def huella_con_minucias(tam, semilla=0, periodo=PERIODO, separacion=6):
+    """
+    Huella sintética de crestas rectas con minucias en posiciones conocidas:
+    cada punto suma una vuelta de fase (una cresta que nace o termina ahí).
+    Los puntos van en una grilla de `separacion` periodos, con algo de
+    desorden, dentro de la mitad central de la huella. Devuelve (imagen, puntos (n, 2) x, y).
+    """
+    rng = np.random.default_rng(semilla)
+    y, x = np.mgrid[0:tam, 0:tam].astype(np.float64)
+    paso = separacion * periodo
+    py, px = np.mgrid[paso/2:tam:paso, paso/2:tam:paso].reshape(2, -1)
+    px = px + rng.uniform(-periodo, periodo, px.shape)
+    py = py + rng.uniform(-periodo, periodo, py.shape)
+    adentro = ((px - tam/2) / (0.45*tam))**2 + ((py - tam/2) / (0.48*tam))**2 <= 0.5
+    puntos = np.stack([px[adentro], py[adentro]], axis=1)
+    fase = 2*np.pi / periodo * (0.8*x + 0.6*y)
+    for k, (cx, cy) in enumerate(puntos):
+        # Signos alternados: la fase lejos de los puntos casi no cambia
+        fase += (1 if k % 2 else -1) * np.arctan2(y - cy, x - cx)
+    img = 128 + 90*np.cos(fase) + rng.normal(0, 18, (tam, tam))
+    fuera = ((x - tam/2) / (0.45*tam))**2 + ((y - tam/2) / (0.48*tam))**2 > 1
+    img[fuera] = 235 + rng.normal(0, 4, np.count_nonzero(fuera))
+    return np.clip(img, 0, 255).astype(np.uint8), puntos
+
+# ==============================
+# MEDICIÓN
+# ==============================
+def _cronometrar(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, tiempos
+
+def _fila(tamano, variante, etapa, tiempos, **extra):
+    fila = {"tamano": tamano, "variante": variante, "etapa": etapa,
+            "ms_min": round(min(tiempos), 3), "ms_mediana": round(float(np.median(tiempos)), 3)}
+    fila.update(extra)
+    return fila
+
+def _mismas(a, b, campos=("x", "y", "tipo")):
+    return len(a) == len(b) and all(np.array_equal(a[c], b[c], equal_nan=True) for c in campos)
+
+def medir_tamano(tam, repeticiones=3, semilla=0):
+    """Devuelve (filas de tiempos, comprobaciones) para una huella sintética de tam x tam."""
+    img = huella_sintetica(tam, semilla)
+    filas, comprobaciones = [], []
+
+    # --- Pipeline completo por tipo de adelgazamiento (y con realce), etapa por etapa ---
+    for variante, parametros in [("analisis_zhangsuen", {"adelgazamiento": "zhangsuen"}),
+                                 ("analisis_guohall", {"adelgazamiento": "guohall"}),
+                                 ("analisis_tabla", {"adelgazamiento": "tabla"}),
+                                 ("analisis_realce", {"adelgazamiento": "zhangsuen", "realce": True}),
+                                 ("analisis_depuracion", {"adelgazamiento": "zhangsuen", "depuracion": True}),
+                                 ("analisis_segmentacion", {"adelgazamiento": "zhangsuen", "segmentacion": True})]:
+        por_etapa = {}
+        for _ in range(repeticiones):
+            perfil = Perfil()
+            minucias = analizar_huella(img, parametros, perfil=perfil)["minucias"]
+            for registro in perfil.registros:
+                por_etapa.setdefault(registro["etapa"], []).append(registro["ms"])
+        # Una corrida más con tracemalloc para la memoria (no se usa para los tiempos)
+        perfil = Perfil(memoria=True)
+        analizar_huella(img, parametros, perfil=perfil)
+        asignados = {r["etapa"]: r["asignados"] for r in perfil.registros}
+        for etapa, tiempos in por_etapa.items():
+            filas.append(_fila(tam, variante, etapa, tiempos, bytes_asignados=asignados[etapa]))
+        totales = np.sum(list(por_etapa.values()), axis=0)
+        filas.append(_fila(tam, variante, "total", totales, bytes_asignados=max(asignados.values()),
+                           minucias=len(minucias)))
+
+    # --- Binarización: umbrales globales frente a los locales con imágenes integrales ---
+    for nombre, funcion in [
+        ("otsu", lambda: binarizar(img)),
+        ("fijo", lambda: binarizar(img, 132)),
+        ("sauvola", lambda: binarizar(img, metodo="sauvola")),
+        ("niblack", lambda: binarizar(img, metodo="niblack")),
+        ("opencv_adaptativo", lambda: cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                                            cv2.THRESH_BINARY_INV, VENTANA, 0)),
+    ]:
+        _, tiempos = _cronometrar(funcion, repeticiones)
+        filas.append(_fila(tam, nombre, "binarizado", tiempos))
+    # Lejos del borde, la media por imagen integral es la de un filtro de caja
+    media, _ = medias_locales(img, VENTANA)
+    r = VENTANA // 2
+    caja = cv2.blur(img.astype(np.float64), (VENTANA, VENTANA))
+    comprobaciones.append({"tamano": tam, "comprobacion": "media integral == cv2.blur",
+                           "ok": bool(np.allclose(media[r:-r, r:-r], caja[r:-r, r:-r]))})
+
+    # --- Variantes de adelgazamiento ---
+    limpio = limpiar(binarizar(img))
+    serie = {}
+    for nombre, funcion in [
+        ("opencv_zhangsuen", lambda: cv2.ximgproc.thinning(limpio, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)),
+        ("opencv_guohall", lambda: cv2.ximgproc.thinning(limpio, thinningType=cv2.ximgproc.THINNING_GUOHALL)),
+        ("franjas_zhangsuen", lambda: adelgazar_en_franjas(limpio, "zhangsuen")),
+        ("franjas_guohall", lambda: adelgazar_en_franjas(limpio, "guohall")),
+        ("tabla_raster", lambda: adelgazar(limpio > 0, iteraciones=PASADAS_ORIGINALES)),
+        ("tabla_paralelo", lambda: adelgazar(limpio > 0, iteraciones=PASADAS_ORIGINALES, modo="paralelo")),
+    ]:
+        serie[nombre], tiempos = _cronometrar(funcion, repeticiones)
+        filas.append(_fila(tam, nombre, "adelgazado", tiempos))
+    for tipo in ("zhangsuen", "guohall"):
+        comprobaciones.append({"tamano": tam, "comprobacion": f"franjas_{tipo} == opencv_{tipo}",
+                               "ok": bool(np.array_equal(serie[f"franjas_{tipo}"], serie[f"opencv_{tipo}"]))})
+
+    # --- Detectores: por separado y conjunto ---
+    esqueleto = serie["opencv_zhangsuen"]
+    separados, tiempos = _cronometrar(lambda: np.concatenate([
+        extraer_minucias(esqueleto), detectar_lagos(esqueleto), detectar_islas(esqueleto)]), repeticiones)
+    filas.append(_fila(tam, "detectores_separados", "minucias", tiempos))
+    conjunto, tiempos = _cronometrar(lambda: detectar_minucias(esqueleto), repeticiones)
+    filas.append(_fila(tam, "detector_conjunto", "minucias", tiempos))
+    comprobaciones.append({"tamano": tam, "comprobacion": "detector_conjunto == detectores_separados",
+                           "ok": _mismas(conjunto, separados)})
+
+    # --- Mosaicos y caché frente al análisis completo ---
+    completo = analizar_huella(img)["minucias"]
+    por_mosaicos, tiempos = _cronometrar(lambda: analizar_por_mosaicos(img, tam=max(tam // 4, 64)), repeticiones)
+    filas.append(_fila(tam, "mosaicos", "total", tiempos))
+    comprobaciones.append({"tamano": tam, "comprobacion": "mosaicos == analisis completo",
+                           "ok": _mismas(por_mosaicos, completo, ["x", "y", "tipo", "angulo", "calidad"])})
+    cache = CacheResultados()
+    analizar_huella(img, cache=cache)
+    guardado, tiempos = _cronometrar(lambda: analizar_huella(img, cache=cache)["minucias"], repeticiones)
+    filas.append(_fila(tam, "cache_acierto", "total", tiempos))
+    comprobaciones.append({"tamano": tam, "comprobacion": "cache == analisis completo",
+                           "ok": _mismas(guardado, completo)})
+
+    # --- Depuración: las crestas cortadas por el borde se van, las minucias plantadas quedan ---
+    for periodo in (PERIODO, 14):
+        con_minucias, puntos = huella_con_minucias(tam, semilla, periodo)
+        depuradas = analizar_huella(con_minucias, {"depuracion": True})["minucias"]
+        comprobaciones.append({"tamano": tam, "comprobacion": f"depuracion conserva las minucias plantadas (periodo {periodo})",
+                               "ok": _conserva_plantadas(depuradas, puntos, periodo)})
+    return filas, comprobaciones
+
+def _conserva_plantadas(minucias, puntos, radio, fraccion=0.8):
+    """
+    Al menos `fraccion` de los puntos tiene una minucia a menos de `radio`,
+    y no quedan más minucias que el doble de los puntos (las del borde se quitaron).
+    """
+    if len(minucias) == 0:
+        return len(puntos) == 0
+    d2 = (minucias["x"][:, None] - puntos[:, 0])**2 + (minucias["y"][:, None] - puntos[:, 1])**2
+    halladas = np.count_nonzero(d2.min(axis=0) < radio**2)
+    return halladas >= fraccion * len(puntos) and len(minucias) <= 2 * len(puntos)
+
+def _tipos_conservados(minucias, filtradas, minimo=5):
+    """
+    El filtro no se ensaña con un tipo: cada tipo con al menos `minimo`
+    minucias conserva como mínimo la mitad de la fracción que conserva el total.
+    """
+    total = len(filtradas) / max(len(minucias), 1)
+    for tipo in np.unique(minucias["tipo"]):
+        antes = np.count_nonzero(minucias["tipo"] == tipo)
+        if antes >= minimo and np.count_nonzero(filtradas["tipo"] == tipo) / antes < total / 2:
+            return False
+    return True
+
+def comprobar_muestras(carpeta=os.path.dirname(os.path.abspath(__file__))):
+    """Comprobaciones sobre las huellas reales de MUESTRAS que estén en la carpeta."""
+    comprobaciones = []
+    for nombre in MUESTRAS:
+        img = cv2.imread(os.path.join(carpeta, nombre), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            continue
+        minucias = analizar_huella(img)["minucias"]
+        comprobaciones.append({"tamano": nombre, "comprobacion": "calidad_minima conserva los tipos",
+                               "ok": _tipos_conservados(minucias, filtrar_por_calidad(minucias))})
+    return comprobaciones
+
+def comprobar_imagenes_chicas(semilla=0):
+    """Imágenes con algún lado menor que un bloque del campo de orientación: se analizan sin fallar."""
+    rng = np.random.default_rng(semilla)
+    comprobaciones = []
+    for alto, ancho in [(12, 40), (40, 12), (15, 15)]:
+        img = rng.integers(0, 256, (alto, ancho), dtype=np.uint8)
+        try:
+            minucias = analizar_huella(img)["minucias"]
+            ok = bool(np.isnan(minucias["angulo"]).all() and np.isnan(minucias["calidad"]).all())
+        except Exception:
+            ok = False
+        comprobaciones.append({"tamano": f"{alto}x{ancho}", "comprobacion": "analisis de imagen chica", "ok": ok})
+    return comprobaciones
+
+def entorno():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def comparar(actual, referencia, tolerancia):
+    """Mediciones de `actual` más lentas que en `referencia` por más de la tolerancia (fracción)."""
+    base = {(f["tamano"], f["variante"], f["etapa"]): f["ms_min"] for f in referencia["resultados"]}
+    regresiones = []
+    for f in actual["resultados"]:
+        anterior = base.get((f["tamano"], f["variante"], f["etapa"]))
+        # Por debajo de un milisegundo el ruido de medición domina
+        if anterior and max(f["ms_min"], anterior) >= 1 and f["ms_min"] > anterior * (1 + tolerancia):
+            regresiones.append(dict(f, ms_referencia=anterior))
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del análisis de huellas con imágenes sintéticas.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS), help="Lados de las imágenes, en píxeles")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("-o", "--salida", default=None, help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Fracción de lentitud admitida frente a --comparar")
+    args = parser.parse_args(argv)
+
+    resultados, comprobaciones = [], []
+    for tam in args.tamanos:
+        filas, verificadas = medir_tamano(tam, args.repeticiones, args.semilla)
+        resultados += filas
+        comprobaciones += verificadas
+        for f in filas:
+            print(f"{tam:>5}  {f['variante']:<22} {f['etapa']:<11} {f['ms_min']:>10.2f} ms", file=sys.stderr)
+    comprobaciones += comprobar_muestras()
+    comprobaciones += comprobar_imagenes_chicas()
+    informe = {"entorno": entorno(), "semilla": args.semilla, "repeticiones": args.repeticiones,
+               "resultados": resultados, "comprobaciones": comprobaciones}
+
+    texto = json.dumps(informe, indent=1)
+    if args.salida:
+        with open(args.salida, "w") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    fallidas = [c for c in comprobaciones if not c["ok"]]
+    for c in fallidas:
+        print(f"NO COINCIDE ({c['tamano']}): {c['comprobacion']}", file=sys.stderr)
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar) as f:
+            regresiones = comparar(informe, json.load(f), args.tolerancia)
+        for r in regresiones:
+            print(f"REGRESIÓN ({r['tamano']}) {r['variante']} {r['etapa']}: "
+                  f"{r['ms_referencia']:.2f} -> {r['ms_min']:.2f} ms", file=sys.stderr)
+    return 1 if fallidas or regresiones else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Caché de resultados de análisis indexada por el contenido de la imagen.
+
+La clave es un hash de los píxeles (con su forma y tipo) más los parámetros
+del pipeline, así que volver a cargar el mismo archivo, o analizar dos veces
+la misma imagen, reutiliza el resultado. En memoria se guardan los resultados
+más recientes hasta un límite de bytes (LRU); opcionalmente, un directorio
+sirve como segundo nivel que sobrevive entre ejecuciones.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_BYTES = 256 * 1024 * 1024
+
+def tamano_en_bytes(valor, vistos=None):
+    """
+    Bytes aproximados de un resultado: suma los arreglos de NumPy y las
+    imágenes de PIL (ancho * alto * bandas) que contiene, también dentro de
+    los atributos de objetos como capas.CapasMinucias.
+    """
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if hasattr(valor, "getbands") and hasattr(valor, "size"):
+        ancho, alto = valor.size
+        return ancho * alto * len(valor.getbands())
+    if isinstance(valor, (dict, list, tuple)) or hasattr(valor, "__dict__"):
+        # Un mismo objeto se cuenta una sola vez (y las referencias circulares no cuelgan)
+        vistos = set() if vistos is None else vistos
+        if id(valor) in vistos:
+            return 0
+        vistos.add(id(valor))
+        if isinstance(valor, dict):
+            return sum(tamano_en_bytes(v, vistos) for v in valor.values())
+        if isinstance(valor, (list, tuple)):
+            return sum(tamano_en_bytes(v, vistos) for v in valor)
+        return tamano_en_bytes(vars(valor), vistos)
+    return 64
+
+class CacheResultados:
+    def __init__(self, max_bytes=MAX_BYTES, directorio=None):
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._memoria = OrderedDict()   # clave -> (resultado, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()   # Los Tk apps la usan desde el hilo del trabajador
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def clave(img, parametros):
+        img = np.ascontiguousarray(img)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{img.dtype.str}{img.shape}".encode())
+        h.update(img.data)
+        h.update(json.dumps(parametros, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave + ".pkl")
+
+    def obtener(self, clave):
+        """Devuelve el resultado guardado o None."""
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                self.aciertos += 1
+                return self._memoria[clave][0]
+        if self.directorio and os.path.exists(self._ruta(clave)):
+            try:
+                with open(self._ruta(clave), "rb") as f:
+                    resultado = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                resultado = None
+            if resultado is not None:
+                self._guardar_en_memoria(clave, resultado)
+                with self._lock:
+                    self.aciertos += 1
+                return resultado
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def guardar(self, clave, resultado):
+        self._guardar_en_memoria(clave, resultado)
+        if self.directorio:
+            # Se escribe en un temporal y se renombra para no dejar archivos a medias
+            fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, self._ruta(clave))
+
+    def _guardar_en_memoria(self, clave, resultado):
+        tamano = tamano_en_bytes(resultado)
+        with self._lock:
+            if clave in self._memoria:
+                self._bytes -= self._memoria.pop(clave)[1]
+            if tamano > self.max_bytes:
+                return
+            self._memoria[clave] = (resultado, tamano)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                _, (_, liberado) = self._memoria.popitem(last=False)
+                self._bytes -= liberado
+
+    def limpiar(self):
+        with self._lock:
+            self._memoria.clear()
+            self._bytes = 0
+
+def etapas_con_cache(cache, img, parametros, pipeline):
+    """
+    Envuelve un generador de etapas (nombre, resultado), como los que usa
+    TrabajadorPipeline: si la imagen ya se analizó con esos parámetros,
+    repite las etapas guardadas; si no, las ejecuta y las guarda al final.
+    """
+    clave = cache.clave(img, parametros)
+    etapas = cache.obtener(clave)
+    if etapas is not None:
+        yield from etapas
+        return
+    etapas = []
+    for nombre, resultado in pipeline:
+        etapas.append((nombre, resultado))
+        yield nombre, resultado
+    cache.guardar(clave, etapas)
@@ -0,0 +1,55 @@
+import numpy as np
+import cv2
+from PIL import Image
+from minucias import TERMINACION, BIFURCACION, LAGO, ISLA
+
+# ==============================
+# MARCADORES DE CADA TIPO DE MINUCIA (colores RGB)
+# ==============================
+def dibujar_marcador(img, x, y, tipo):
+    if tipo == TERMINACION:
+        cv2.rectangle(img, (x-3, y-3), (x+3, y+3), (255, 0, 0), 1) # Rojo
+    elif tipo == BIFURCACION:
+        cv2.circle(img, (x, y), 4, (0, 0, 255), 1) # Azul
+    elif tipo == LAGO:
+        cv2.rectangle(img, (x-4, y-4), (x+4, y+4), (0, 255, 0), 1) # Verde
+    elif tipo == ISLA:
+        size = 5
+        triangle_cnt = np.array([(x, y - size), (x - size, y + size // 2), (x + size, y + size // 2)], dtype=np.int32)
+        cv2.drawContours(img, [triangle_cnt], 0, (0, 0, 255), 1)
+
+# ==============================
+# RENDERIZADO POR CAPAS
+# ==============================
+class CapasMinucias:
+    """
+    Guarda, ya redimensionados al tamaño de visualización, el esqueleto base y
+    una capa transparente de marcadores por cada tipo de minucia. Mostrar u
+    ocultar un tipo solo compone capas en caché, sin volver a dibujar ni a
+    redimensionar la imagen completa.
+    """
+    def __init__(self, esqueleto, minucias, display_size):
+        esqueleto_uint8 = (np.asarray(esqueleto, dtype=bool) * 255).astype(np.uint8)
+        base = Image.fromarray(esqueleto_uint8).convert("RGBA")
+        self.base = base.resize(display_size, Image.Resampling.LANCZOS)
+
+        self.capas = {}
+        for tipo in np.unique(minucias["tipo"]):
+            lienzo = np.zeros(esqueleto_uint8.shape + (3,), dtype=np.uint8)
+            for x, y, *_ in minucias[minucias["tipo"] == tipo]:
+                dibujar_marcador(lienzo, x, y, tipo)
+            # El canal alfa marca solo los píxeles donde se dibujó algo
+            alfa = np.where(lienzo.any(axis=2), 255, 0).astype(np.uint8)
+            capa = Image.fromarray(np.dstack([lienzo, alfa]), "RGBA")
+            self.capas[int(tipo)] = capa.resize(display_size, Image.Resampling.LANCZOS)
+        self._compuestas = {}
+
+    def componer(self, tipos_visibles):
+        """Devuelve la imagen RGB con las capas de los tipos indicados encima del esqueleto."""
+        clave = tuple(sorted(t for t in tipos_visibles if t in self.capas))
+        if clave not in self._compuestas:
+            imagen = self.base
+            for tipo in clave:
+                imagen = Image.alpha_composite(imagen, self.capas[tipo])
+            self._compuestas[clave] = imagen.convert("RGB")
+        return self._compuestas[clave]
@@ -0,0 +1,272 @@
+"""
+Comparación 1:1 de huellas a partir de sus minucias (arreglos DTYPE_MINUCIA).
+
+1. Se generan alineaciones candidatas (rotación + traslación), solo con
+   terminaciones y bifurcaciones (los lagos e islas tienen ángulo en
+   [0, pi), ambiguo en media vuelta, y no sirven para estimar la rotación):
+   cada minucia forma una estructura local con sus vecinas más cercanas:
+   de cada vecina, la distancia, la dirección y el ángulo relativos a la
+   minucia, cuantizados en una clave (como los tripletes de indice.py). El
+   ángulo de referencia es el de la minucia o, si alguna plantilla no tiene
+   ángulos, la dirección hacia su vecina más cercana. Los pares (a, b) que
+   comparten claves proponen la alineación que lleva a sobre b, y solo se
+   conservan los CANDIDATAS pares con más claves en común. Buscar las
+   vecinas más cercanas arma la matriz de distancias de la plantilla,
+   O(n²) en su número de minucias, pero se hace una sola vez por plantilla
+   (ver PlantillaComparable); cruzar las claves de dos plantillas ya
+   preparadas cuesta O(n log n) más las claves que coinciden.
+2. Las candidatas votan en una grilla (rotación, tx, ty) y solo se evalúan
+   las alineaciones más votadas.
+3. Todas esas alineaciones se puntúan a la vez: las minucias de `b` se
+   reparten en una grilla de celdas del lado de la tolerancia y cada minucia
+   alineada de `a` solo se compara con las de las celdas vecinas. Empareja
+   si hay otra del mismo tipo dentro de una caja de tolerancia (y, si hay
+   ángulos, con un ángulo parecido; el de lagos e islas, módulo pi).
+
+Las estructuras locales y la grilla dependen de una sola
+plantilla: PlantillaComparable las calcula una vez. Para comparar una sonda
+contra muchas plantillas conviene preparar cada una con preparar() y pasar
+las preparadas a alinear() o comparar(), que también aceptan minucias sueltas.
+"""
+import itertools
+
+import numpy as np
+from minucias import BIFURCACION, LAGO
+
+TOLERANCIA = 8                   # Lado medio de la caja de emparejamiento, en píxeles
+TOLERANCIA_ANGULO = np.pi / 12   # Diferencia de ángulo admitida, en radianes
+VECINOS = 4                      # Vecinas de cada minucia en su estructura local
+ALINEACIONES = 10                # Alineaciones más votadas que se puntúan
+CANDIDATAS = 256                 # Pares de minucias que proponen alineaciones
+PASO_LOCAL = 4                   # Cuantización de las distancias de la estructura local, en píxeles
+SECTORES = 24                    # Cuantización de los ángulos de la estructura local (sectores por vuelta)
+_BITS_DISTANCIA = 6
+_BITS_SECTOR = 5
+_BITS_TIPO = 1                   # Solo terminación o bifurcación
+
+def _diferencia_angular(a, b):
+    """Diferencia entre ángulos llevada a [-pi, pi)."""
+    return np.mod(a - b + np.pi, 2*np.pi) - np.pi
+
+def _segmentos(xy, vecinos):
+    """
+    Segmentos dirigidos de cada minucia a sus vecinos más cercanos: (i, j,
+    largo, ángulo). Usa la matriz de distancias completa (O(n²)).
+    """
+    n = len(xy)
+    k = min(vecinos, n - 1)
+    if k < 1:
+        vacio = np.zeros(0, dtype=np.intp)
+        return vacio, vacio, np.zeros(0), np.zeros(0)
+    dx = np.subtract.outer(xy[:, 0], xy[:, 0])
+    dy = np.subtract.outer(xy[:, 1], xy[:, 1])
+    d = dx * dx
+    d += dy * dy
+    np.fill_diagonal(d, np.inf)
+    j = np.argpartition(d, k - 1, axis=1)[:, :k].ravel()
+    i = np.repeat(np.arange(n), k)
+    v = xy[j] - xy[i]
+    return i, j, np.hypot(v[:, 0], v[:, 1]), np.arctan2(v[:, 1], v[:, 0])
+
+def _pares_en_rangos(desde, cantidad, orden):
+    """Pares (consulta, posición en `orden`) a partir del rango [desde, desde + cantidad) de cada consulta."""
+    sa = np.repeat(np.arange(len(desde)), cantidad)
+    # Posición dentro del rango de cada consulta
+    desplazamiento = np.arange(len(sa)) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+    return sa, orden[np.repeat(desde, cantidad) + desplazamiento]
+
+def _claves_estructura(angulo, tipos, i, j, largo, direccion, tolerante=False):
+    """
+    Claves de la estructura local de cada minucia: una por vecina, con la
+    distancia, la dirección hacia la vecina y su ángulo, los dos relativos
+    al ángulo de la minucia, y los tipos de ambas. Devuelve (minucia, clave).
+    Con tolerante=True, cada valor también va al intervalo vecino más
+    cercano (8 claves por vecina), como en indice.claves_tripletes.
+    """
+    valores = np.stack([largo / PASO_LOCAL,
+                        np.mod(direccion - angulo[i], 2*np.pi) * SECTORES / (2*np.pi),
+                        np.mod(angulo[j] - angulo[i], 2*np.pi) * SECTORES / (2*np.pi)], axis=1)
+    cuantizados = np.floor(valores).astype(np.int64)
+    variantes = [cuantizados]
+    if tolerante:
+        vecino = np.where(valores - cuantizados < 0.5, cuantizados - 1, cuantizados + 1)
+        variantes = [np.where(np.array(eleccion)[None, :], vecino, cuantizados)
+                     for eleccion in itertools.product((False, True), repeat=3)]
+    tipos = tipos.astype(np.int64)
+    claves = []
+    for q in variantes:
+        clave = np.clip(q[:, 0], 0, (1 << _BITS_DISTANCIA) - 1)
+        # Los ángulos dan la vuelta: el sector -1 es el último
+        clave = (clave << _BITS_SECTOR) | np.mod(q[:, 1], SECTORES)
+        clave = (clave << _BITS_SECTOR) | np.mod(q[:, 2], SECTORES)
+        clave = (clave << _BITS_TIPO) | tipos[i]
+        clave = (clave << _BITS_TIPO) | tipos[j]
+        claves.append(clave)
+    return np.tile(i, len(variantes)), np.concatenate(claves)
+
+# ==============================
+# PLANTILLA PREPARADA
+# ==============================
+class PlantillaComparable:
+    """
+    Minucias de una plantilla con lo que el comparador deriva de ellas, que
+    se calcula una sola vez (la primera vez que se usa).
+    """
+    def __init__(self, minucias):
+        self.minucias = minucias
+        self.xy = np.stack([minucias["x"], minucias["y"]], axis=1).astype(np.float64)
+        self.con_angulo = bool(np.isfinite(minucias["angulo"]).all())
+        # Terminaciones y bifurcaciones: las únicas que proponen alineaciones
+        self.tb = np.flatnonzero(minucias["tipo"] <= BIFURCACION)
+        self._estructuras = {}
+        self._grillas = {}
+
+    def __len__(self):
+        return len(self.minucias)
+
+    def estructura(self, vecinos, con_angulo):
+        """
+        Estructuras locales de las terminaciones y bifurcaciones (índices
+        sobre self.tb): (angulo de referencia, (minucia, claves), (minucia,
+        claves tolerantes ordenadas por clave)). Sin ángulos, la referencia
+        es la dirección hacia la vecina más cercana.
+        """
+        if (vecinos, con_angulo) not in self._estructuras:
+            m = self.minucias[self.tb]
+            i, j, largo, direccion = _segmentos(self.xy[self.tb], vecinos)
+            if con_angulo:
+                angulo = m["angulo"].astype(np.float64)
+            else:
+                angulo = np.zeros(len(m))
+                if len(i):
+                    k = min(vecinos, len(m) - 1)
+                    cercana = np.argmin(largo.reshape(-1, k), axis=1)
+                    angulo = direccion.reshape(-1, k)[np.arange(len(m)), cercana]
+            exactas = _claves_estructura(angulo, m["tipo"], i, j, largo, direccion)
+            minucia, claves = _claves_estructura(angulo, m["tipo"], i, j, largo, direccion, tolerante=True)
+            orden = np.argsort(claves, kind="stable")
+            self._estructuras[(vecinos, con_angulo)] = angulo, exactas, (minucia[orden], claves[orden])
+        return self._estructuras[(vecinos, con_angulo)]
+
+    def grilla(self, tolerancia):
+        """
+        Minucias repartidas en celdas de lado `tolerancia`, con dos filas y dos
+        columnas vacías en cada borde: (x0, y0, forma, orden, desde, cantidad),
+        donde las minucias de la celda k son orden[desde[k]:desde[k] + cantidad[k]].
+        """
+        if tolerancia not in self._grillas:
+            x0, y0 = self.xy[:, 0].min(), self.xy[:, 1].min()
+            forma = (int((self.xy[:, 1].max() - y0) // tolerancia) + 5,
+                     int((self.xy[:, 0].max() - x0) // tolerancia) + 5)
+            celda = (((self.xy[:, 1] - y0) // tolerancia + 2) * forma[1]
+                     + (self.xy[:, 0] - x0) // tolerancia + 2).astype(np.int64)
+            orden = np.argsort(celda, kind="stable")
+            cantidad = np.bincount(celda, minlength=forma[0] * forma[1])
+            desde = np.cumsum(cantidad) - cantidad
+            self._grillas[tolerancia] = x0, y0, forma, orden, desde, cantidad
+        return self._grillas[tolerancia]
+
+def preparar(minucias):
+    """PlantillaComparable de unas minucias (si ya lo es, la devuelve tal cual)."""
+    return minucias if isinstance(minucias, PlantillaComparable) else PlantillaComparable(minucias)
+
+# ==============================
+# ALINEACIÓN Y PUNTAJE
+# ==============================
+def _candidatas(a, b, con_angulo, vecinos, candidatas=CANDIDATAS):
+    """Rotaciones y traslaciones candidatas (arreglos de igual largo)."""
+    nb = max(len(b.tb), 1)
+    ref_a, (ma, claves_a), _ = a.estructura(vecinos, con_angulo)
+    ref_b, _, (mb, claves_b) = b.estructura(vecinos, con_angulo)
+    desde = np.searchsorted(claves_b, claves_a, side="left")
+    cantidad = np.searchsorted(claves_b, claves_a, side="right") - desde
+    sa, sb = _pares_en_rangos(desde, cantidad, np.arange(len(claves_b)))
+    # Cada par de minucias suma una coincidencia por vecina; se quedan los de más coincidencias
+    par, coincidencias = np.unique(ma[sa] * nb + mb[sb], return_counts=True)
+    par = par[np.argsort(-coincidencias, kind="stable")[:candidatas]]
+    ia, ib = par // nb, par % nb
+    rot = _diferencia_angular(ref_b[ib], ref_a[ia])
+    origen_a, origen_b = a.xy[a.tb[ia]], b.xy[b.tb[ib]]
+    c, s = np.cos(rot), np.sin(rot)
+    tx = origen_b[:, 0] - (c*origen_a[:, 0] - s*origen_a[:, 1])
+    ty = origen_b[:, 1] - (s*origen_a[:, 0] + c*origen_a[:, 1])
+    return rot, tx, ty
+
+def _mas_votadas(rot, tx, ty, tolerancia, tolerancia_angulo, alineaciones):
+    """Agrupa las candidatas en una grilla y devuelve la alineación media de las celdas más votadas."""
+    # Cada celda se identifica con un único entero (mucho más rápido que np.unique por filas)
+    celda_rot = np.floor((rot + np.pi) / tolerancia_angulo).astype(np.int64)
+    celda_x = np.floor(tx / tolerancia).astype(np.int64)
+    celda_y = np.floor(ty / tolerancia).astype(np.int64)
+    celda_x -= celda_x.min()
+    celda_y -= celda_y.min()
+    clave = (celda_rot * (celda_x.max() + 1) + celda_x) * (celda_y.max() + 1) + celda_y
+    _, grupo, votos = np.unique(clave, return_inverse=True, return_counts=True)
+    mejores = np.argsort(votos)[::-1][:alineaciones]
+    # Promedio de cada celda (la rotación se promedia con seno y coseno)
+    suma_cos = np.bincount(grupo, np.cos(rot))[mejores]
+    suma_sin = np.bincount(grupo, np.sin(rot))[mejores]
+    return (np.arctan2(suma_sin, suma_cos),
+            np.bincount(grupo, tx)[mejores] / votos[mejores],
+            np.bincount(grupo, ty)[mejores] / votos[mejores])
+
+def _puntuar(a, b, rot, tx, ty, con_angulo, tolerancia, tolerancia_angulo):
+    """Puntaje de cada alineación, calculado para todas a la vez."""
+    c, s = np.cos(rot)[:, None], np.sin(rot)[:, None]
+    x = (c*a.xy[None, :, 0] - s*a.xy[None, :, 1] + tx[:, None]).ravel()   # (alineaciones * n_a)
+    y = (s*a.xy[None, :, 0] + c*a.xy[None, :, 1] + ty[:, None]).ravel()
+    alineacion = np.repeat(np.arange(len(rot)), len(a))
+    ka = np.tile(np.arange(len(a)), len(rot))
+
+    # Una caja de tolerancia alrededor de un punto solo toca su celda de `b` y las 8 vecinas
+    x0, y0, (filas, columnas), orden, desde, cantidad = b.grilla(tolerancia)
+    fila = np.floor((y - y0) / tolerancia).astype(np.int64) + 2
+    columna = np.floor((x - x0) / tolerancia).astype(np.int64) + 2
+    # Los puntos a más de una celda de la grilla no tienen vecinas
+    dentro_grilla = (fila >= 1) & (fila < filas - 1) & (columna >= 1) & (columna < columnas - 1)
+    celda = (fila * columnas + columna)[dentro_grilla]
+    indices = np.flatnonzero(dentro_grilla)
+    vecinas = (celda[:, None] + (np.array([-1, 0, 1])[:, None] * columnas + np.array([-1, 0, 1])).ravel()).ravel()
+    pa, pb = _pares_en_rangos(desde[vecinas], cantidad[vecinas], orden)
+    pa = indices[pa // 9]
+    ia = ka[pa]
+    tipo_a, tipo_b = a.minucias["tipo"], b.minucias["tipo"]
+    dentro = ((np.abs(x[pa] - b.xy[pb, 0]) <= tolerancia)
+              & (np.abs(y[pa] - b.xy[pb, 1]) <= tolerancia)
+              & (tipo_a[ia] == tipo_b[pb]))
+    if con_angulo:
+        diferencia = _diferencia_angular(a.minucias["angulo"][ia].astype(np.float64) + rot[alineacion[pa]],
+                                         b.minucias["angulo"][pb].astype(np.float64))
+        # Lagos e islas tienen ángulo en [0, pi): se comparan módulo pi
+        axial = tipo_a[ia] >= LAGO
+        diferencia[axial] = np.mod(diferencia[axial] + np.pi/2, np.pi) - np.pi/2
+        dentro &= np.abs(diferencia) <= tolerancia_angulo
+    pa, pb = pa[dentro], pb[dentro]
+    # Emparejadas: cota del emparejamiento uno a uno entre ambas plantillas
+    con_par_a = np.bincount(alineacion[np.unique(pa)], minlength=len(rot))
+    con_par_b = np.bincount(np.unique(alineacion[pa] * len(b) + pb) // len(b), minlength=len(rot))
+    emparejadas = np.minimum(con_par_a, con_par_b)
+    return emparejadas**2 / (len(a) * len(b))
+
+def alinear(a, b, tolerancia=TOLERANCIA, tolerancia_angulo=TOLERANCIA_ANGULO, vecinos=VECINOS, alineaciones=ALINEACIONES):
+    """
+    Compara dos conjuntos de minucias (arreglos DTYPE_MINUCIA o plantillas
+    ya preparadas). Devuelve (puntaje, (rotacion, tx, ty)), con el puntaje
+    en [0, 1] y la alineación que lleva `a` sobre `b`.
+    """
+    a, b = preparar(a), preparar(b)
+    if len(a) == 0 or len(b) == 0:
+        return 0.0, (0.0, 0.0, 0.0)
+    con_angulo = a.con_angulo and b.con_angulo
+
+    rot, tx, ty = _candidatas(a, b, con_angulo, vecinos)
+    if len(rot) == 0:
+        return 0.0, (0.0, 0.0, 0.0)
+    rot, tx, ty = _mas_votadas(rot, tx, ty, tolerancia, tolerancia_angulo, alineaciones)
+    puntajes = _puntuar(a, b, rot, tx, ty, con_angulo, tolerancia, tolerancia_angulo)
+    k = int(np.argmax(puntajes))
+    return float(puntajes[k]), (float(rot[k]), float(tx[k]), float(ty[k]))
+
+def comparar(a, b, **tolerancias):
+    """Puntaje de similitud en [0, 1] entre dos conjuntos de minucias."""
+    return alinear(a, b, **tolerancias)[0]
@@ -0,0 +1,139 @@
+"""
+Depuración de minucias falsas con un índice espacial por grilla.
+
+El filtro de 3x3 de minucias.py solo ve minucias pegadas. Aquí se buscan
+todos los pares de minucias a menos de un radio con una grilla de cubos de
+ese lado: cada minucia solo se compara con las de su cubo y los ocho
+vecinos, y los cubos se recorren con un orden y búsquedas binarias, así que
+el costo es O(k log k) en la cantidad de minucias (más los pares cercanos,
+que son pocos). Sobre esos pares se aplican reglas de distancia:
+
+  - Terminación-terminación cerca y enfrentadas: cresta cortada.
+  - Terminación-bifurcación cerca: espolón (una rama corta de la cresta).
+  - Bifurcación-bifurcación cerca: puente entre dos crestas.
+  - Cualquier minucia a menos de MARGEN_PERIODOS periodos de cresta del
+    borde de la región de la huella (ahí las crestas se cortan). El periodo
+    se estima en la propia región: su área dividida por el largo del
+    esqueleto que contiene.
+
+En las reglas de pares se eliminan las dos minucias del par.
+"""
+import numpy as np
+import cv2
+from minucias import TERMINACION, BIFURCACION
+
+DISTANCIA_TT = 12                   # Terminaciones enfrentadas a menos de esto: cresta cortada
+DISTANCIA_TB = 8                    # Terminación y bifurcación a menos de esto: espolón
+DISTANCIA_BB = 8                    # Bifurcaciones a menos de esto: puente
+TOLERANCIA_ENFRENTADAS = np.pi / 4  # Cuánto pueden apartarse de sentidos opuestos dos terminaciones
+MARGEN_PERIODOS = 1.5               # Distancia mínima al borde de la región de la huella, en periodos de cresta
+MARGEN = 12                         # La misma distancia en píxeles, si no hay esqueleto para estimar el periodo
+PERIODO_MINIMO, PERIODO_MAXIMO = 4, 16  # Periodos de cresta admitidos, en píxeles (como realce.PERIODOS)
+CIERRE = 15                         # Lado del cierre que une las crestas del esqueleto en una región
+
+# ==============================
+# ÍNDICE POR GRILLA
+# ==============================
+def pares_cercanos(xs, ys, radio):
+    """Pares (i, j) con i < j de puntos a distancia <= radio, buscados en una grilla de cubos de lado radio."""
+    xs = np.asarray(xs, dtype=np.int64)
+    ys = np.asarray(ys, dtype=np.int64)
+    n = len(xs)
+    if n < 2:
+        vacio = np.zeros(0, dtype=np.intp)
+        return vacio, vacio
+    radio = max(int(np.ceil(radio)), 1)
+    cx, cy = xs // radio, ys // radio
+    # Una columna de cubos de más a cada lado: los vecinos de un borde no se mezclan con la fila siguiente
+    ancho = int(cx.max()) + 3
+    clave = (cy + 1) * ancho + (cx + 1)
+    orden = np.argsort(clave, kind="stable")
+    ordenadas = clave[orden]
+    todos_i, todos_j = [], []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            vecina = clave + dy * ancho + dx
+            desde = np.searchsorted(ordenadas, vecina, side="left")
+            cantidad = np.searchsorted(ordenadas, vecina, side="right") - desde
+            i = np.repeat(np.arange(n), cantidad)
+            # Posición dentro del cubo vecino de cada punto
+            desplazamiento = np.arange(len(i)) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+            todos_i.append(i)
+            todos_j.append(orden[np.repeat(desde, cantidad) + desplazamiento])
+    i, j = np.concatenate(todos_i), np.concatenate(todos_j)
+    # Cada par aparece desde sus dos puntos; se queda una vez
+    cerca = (i < j) & ((xs[i] - xs[j])**2 + (ys[i] - ys[j])**2 <= radio**2)
+    return i[cerca], j[cerca]
+
+# ==============================
+# REGIÓN DE LA HUELLA
+# ==============================
+def region_desde_esqueleto(esqueleto, cierre=CIERRE):
+    """
+    Máscara (bool) de la zona con crestas: el esqueleto cerrado con un
+    elemento de cierre x cierre y con los agujeros que queden rellenados.
+    """
+    esqueleto = np.where(np.asarray(esqueleto) > 0, 255, 0).astype(np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (cierre, cierre))
+    cerrado = cv2.morphologyEx(esqueleto, cv2.MORPH_CLOSE, kernel)
+    contornos, _ = cv2.findContours(cerrado, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    region = np.zeros_like(cerrado)
+    cv2.drawContours(region, contornos, -1, 255, thickness=cv2.FILLED)
+    return region > 0
+
+def periodo_crestas(esqueleto, mascara):
+    """
+    Periodo medio de las crestas dentro de la máscara, en píxeles: cada cresta
+    aporta un píxel de esqueleto por cada periodo de ancho, así que es el área
+    dividida por los píxeles de esqueleto.
+    """
+    pixeles = np.count_nonzero(np.asarray(esqueleto)[mascara])
+    if pixeles == 0:
+        return float(PERIODO_MAXIMO)
+    return float(np.clip(np.count_nonzero(mascara) / pixeles, PERIODO_MINIMO, PERIODO_MAXIMO))
+
+def _lejos_del_borde(mascara, margen):
+    # Fuera de la imagen también es borde
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*margen + 1, 2*margen + 1))
+    return cv2.erode(mascara.astype(np.uint8), kernel, borderType=cv2.BORDER_CONSTANT, borderValue=0) > 0
+
+def quitar_borde(minucias, mascara, margen=MARGEN):
+    """Descarta las minucias a menos de `margen` píxeles del borde de la máscara (o de la imagen)."""
+    return minucias[_lejos_del_borde(mascara, margen)[minucias["y"], minucias["x"]]]
+
+# ==============================
+# DEPURACIÓN
+# ==============================
+def depurar_minucias(minucias, esqueleto=None, mascara=None, margen=None,
+                     distancia_tt=DISTANCIA_TT, distancia_tb=DISTANCIA_TB, distancia_bb=DISTANCIA_BB):
+    """
+    Devuelve las minucias sin las falsas (mismo orden). La región de la
+    huella es `mascara` si se pasa, o la que cubre `esqueleto`; sin ninguna
+    de las dos no se aplica la regla del borde. Sin `margen`, la distancia
+    al borde es MARGEN_PERIODOS periodos de cresta estimados con el esqueleto
+    (o MARGEN píxeles si no hay esqueleto). Las terminaciones con ángulo
+    (orientar_y_calificar) solo se consideran cresta cortada si están
+    enfrentadas; sin ángulo basta la distancia.
+    """
+    eliminar = np.zeros(len(minucias), dtype=bool)
+    if mascara is None and esqueleto is not None:
+        mascara = region_desde_esqueleto(esqueleto)
+    if mascara is not None and margen is None:
+        margen = MARGEN if esqueleto is None else int(round(MARGEN_PERIODOS * periodo_crestas(esqueleto, mascara)))
+    if mascara is not None and margen > 0:
+        eliminar |= ~_lejos_del_borde(mascara, margen)[minucias["y"], minucias["x"]]
+
+    i, j = pares_cercanos(minucias["x"], minucias["y"], max(distancia_tt, distancia_tb, distancia_bb))
+    ti, tj = minucias["tipo"][i], minucias["tipo"][j]
+    d2 = (minucias["x"][i] - minucias["x"][j]).astype(np.int64)**2 + (minucias["y"][i] - minucias["y"][j]).astype(np.int64)**2
+    tt = (ti == TERMINACION) & (tj == TERMINACION) & (d2 <= distancia_tt**2)
+    angulo = minucias["angulo"].astype(np.float64)
+    # Enfrentadas: los sentidos difieren en pi (los NaN no descartan el par)
+    diferencia = np.abs(np.mod(angulo[i] - angulo[j], 2*np.pi) - np.pi)
+    tt &= ~(diferencia > TOLERANCIA_ENFRENTADAS)
+    tb = (((ti == TERMINACION) & (tj == BIFURCACION)) | ((ti == BIFURCACION) & (tj == TERMINACION))) & (d2 <= distancia_tb**2)
+    bb = (ti == BIFURCACION) & (tj == BIFURCACION) & (d2 <= distancia_bb**2)
+    falso = tt | tb | bb
+    eliminar[i[falso]] = True
+    eliminar[j[falso]] = True
+    return minucias[~eliminar]
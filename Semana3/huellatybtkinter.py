@@ -1,8 +1,14 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
+from adelgazamiento import adelgazar, PASADAS_ORIGINALES
+from minucias import extraer_minucias, contar_minucias, TERMINACION, BIFURCACION
+from trabajador import TrabajadorPipeline
+from cache import CacheResultados, etapas_con_cache
+from perfil import Perfil
+from umbral import umbral_local
 
 class FingerprintApp:
     def __init__(self, master):
@@ -22,6 +28,14 @@ class FingerprintApp:
         self.btn_load.pack(side=tk.LEFT, padx=20)
         self.btn_process = tk.Button(control_frame, text="Analizar Huella", command=self.process_image, state=tk.DISABLED, font=("Helvetica", 10))
         self.btn_process.pack(side=tk.LEFT, padx=10)
+        # Barra de progreso por etapa del análisis (se ejecuta en un hilo aparte)
+        self.progress = ttk.Progressbar(control_frame, length=200, mode="determinate", maximum=3)
+        self.progress.pack(side=tk.LEFT, padx=10)
+        # Umbral global o local por ventana (Sauvola/Niblack, ver umbral.py)
+        tk.Label(control_frame, text="Binarización:", font=("Helvetica", 10)).pack(side=tk.LEFT, padx=(10, 2))
+        self.binarizacion = tk.StringVar(value="global")
+        ttk.Combobox(control_frame, textvariable=self.binarizacion, values=["global", "sauvola", "niblack"],
+                     state="readonly", width=9).pack(side=tk.LEFT)
         self.grid_frame = tk.Frame(self.master, padx=10, pady=10)
         self.grid_frame.pack(fill=tk.BOTH, expand=True)
         self.grid_frame.rowconfigure(0, weight=1)
@@ -35,6 +49,14 @@ class FingerprintApp:
         self.lbl_results = tk.Label(self.master, text="Resultados aparecerán aquí", font=("Helvetica", 12, "italic"), pady=10)
         self.lbl_results.pack(side=tk.BOTTOM)
 
+        self.worker = TrabajadorPipeline(self.master)
+        # Resultados por contenido de la imagen: volver a analizar la misma huella es inmediato
+        self.cache = CacheResultados()
+        # Tiempos por etapa del último análisis, en la barra de estado
+        self.perfil = Perfil()
+        self.lbl_status = tk.Label(self.master, text="", font=("Helvetica", 9), anchor="w", relief=tk.SUNKEN)
+        self.lbl_status.pack(side=tk.BOTTOM, fill=tk.X, before=self.lbl_results)
+
     def _create_image_panel(self, title, row, col):
         frame = tk.LabelFrame(self.grid_frame, text=title, font=("Helvetica", 11, "bold"), padx=10, pady=10)
         frame.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
@@ -59,6 +81,9 @@ class FingerprintApp:
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.tif *.jpg *.png *.bmp")])
         if not file_path:
             return
+        # Un análisis en curso de la imagen anterior ya no sirve
+        self.worker.cancelar()
+        self.progress.config(value=0)
         self.original_pil_image = Image.open(file_path)
         self._update_image_label(self.lbl_original, self.original_pil_image)
         for label in [self.lbl_binarized, self.lbl_thinned, self.lbl_final]:
@@ -73,89 +98,76 @@ class FingerprintApp:
             return
         
         img_gray = self.original_pil_image.convert("L")
-        self.n, self.m = img_gray.size 
         img_np = np.array(img_gray)
         
-        binarizado = self.binarizar(img_np, 132)
-        self._update_image_label(self.lbl_binarized, binarizado)
-        self.master.update_idletasks()
+        self.btn_process.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+        self.lbl_results.config(text="Analizando...", font=("Helvetica", 12, "italic"))
+        metodo = self.binarizacion.get()
+        parametros = {"binarizacion": metodo, "umbral": 132, "adelgazamiento": "tabla", "pasadas": PASADAS_ORIGINALES}
+        etapas = etapas_con_cache(self.cache, img_np, parametros, self._pipeline(img_np, metodo))
+        # Un Perfil por análisis: el generador de uno cancelado puede seguir sumando registros al suyo
+        perfil = self.perfil = Perfil()
+        self.worker.iniciar(perfil.etapas(etapas), perfil.envolver("mostrar", self._on_stage_done),
+                            lambda: self._on_pipeline_done(perfil), self._on_pipeline_error)
+
+    def _pipeline(self, img_np, metodo):
+        # Se ejecuta en el hilo del trabajador: solo calcula, no toca la interfaz
+        binarizado = self.binarizar(img_np, 132, metodo)
+        yield "binarizado", binarizado
         
-        adelgazado = self.adelgazar(binarizado.copy())
-        adelgazado = self.adelgazar(adelgazado)
-        self._update_image_label(self.lbl_thinned, adelgazado)
-        self.master.update_idletasks()
+        adelgazado = adelgazar(binarizado, iteraciones=PASADAS_ORIGINALES)
+        yield "adelgazado", adelgazado
         
         # --- LLAMADA: ---
-        img_remarcada, terminaciones, bifurcaciones = self.analizar_y_remarcar(adelgazado)
-        self._update_image_label(self.lbl_final, img_remarcada)
-        
-        self.lbl_results.config(text=f"ANÁLISIS COMPLETO  |  Terminaciones: {terminaciones}  |  Bifurcaciones: {bifurcaciones}", font=("Helvetica", 12, "bold"))
+        yield "minucias", self.analizar_y_remarcar(adelgazado)
 
-    def binarizar(self, Img, u):
-        return Img >= u
+    def _on_stage_done(self, numero, nombre, resultado):
+        # Cada panel se llena apenas termina su etapa
+        self.progress.config(value=numero)
+        if nombre == "binarizado":
+            self._update_image_label(self.lbl_binarized, resultado)
+        elif nombre == "adelgazado":
+            self._update_image_label(self.lbl_thinned, resultado)
+        elif nombre == "minucias":
+            img_remarcada, terminaciones, bifurcaciones = resultado
+            self._update_image_label(self.lbl_final, img_remarcada)
+            self.lbl_results.config(text=f"ANÁLISIS COMPLETO  |  Terminaciones: {terminaciones}  |  Bifurcaciones: {bifurcaciones}", font=("Helvetica", 12, "bold"))
+
+    def _on_pipeline_done(self, perfil):
+        self.btn_process.config(state=tk.NORMAL)
+        if perfil is self.perfil:  # Solo los tiempos del análisis en curso
+            self.lbl_status.config(text=perfil.resumen())
 
-    def adelgazar(self, Img):
-        for i in range(1, self.m - 1):
-            for j in range(1, self.n - 1):
-                if Img[i, j]:
-                    R = Img[i-1:i+2, j-1:j+2].astype(int)
-                    if R[1,1] == 1:
-                        should_be_removed = (self.thining1(R) or self.thining2(R) or
-                                             self.pruning1(R) or self.pruning2(R) or
-                                             self.caso1(R) or self.caso2(R) or
-                                             self.caso3(R) or self.caso4(R))
-                        Img[i, j] = int(not should_be_removed)
-        return Img
+    def _on_pipeline_error(self, e):
+        self.btn_process.config(state=tk.NORMAL)
+        messagebox.showerror("Error de Procesamiento", f"Ocurrió un error inesperado: {e}")
+        self.lbl_results.config(text="Análisis fallido.", font=("Helvetica", 12, "italic"))
+
+    def binarizar(self, Img, u, metodo="global"):
+        if metodo != "global":
+            # Umbral propio de cada píxel según su ventana
+            return Img >= umbral_local(Img, metodo)
+        return Img >= u
 
     # --- FUNCIÓN ---
     def analizar_y_remarcar(self, Img):
         # La función ahora solo necesita la imagen adelgazada (Img)
-        T = np.zeros((self.m, self.n))
-        B = np.zeros((self.m, self.n))
-        for i in range(1, self.m - 1):
-            for j in range(1, self.n - 1):
-                if Img[i, j]:
-                    R = Img[i-1:i+2, j-1:j+2].astype(int)
-                    P1,P2,P3 = int(R[0,0]),int(R[0,1]),int(R[0,2])
-                    P8,P, P4 = int(R[1,0]),int(R[1,1]),int(R[1,2])
-                    P7,P6,P5 = int(R[2,0]),int(R[2,1]),int(R[2,2])
-                    CN = 0.5 * (abs(P2-P1) + abs(P3-P2) + abs(P4-P3) + abs(P5-P4) + abs(P6-P5) + abs(P7-P6) + abs(P8-P7) + abs(P1-P8))
-                    if CN == 1.0: T[i, j] = 1
-                    if CN == 3.0: B[i, j] = 1
-        for i in range(1, self.m - 1):
-            for j in range(1, self.n - 1):
-                if T[i,j]: T[i,j] = not (T[i-1:i+2,j-1:j+2].sum() > 1)
-                if B[i,j]: B[i,j] = not (B[i-1:i+2,j-1:j+2].sum() > 1)
-        
-        terminacion, bifurcacion = 0, 0
+        minucias = extraer_minucias(Img)
         
         # --- Crear el lienzo a partir del esqueleto ---
         esqueleto_uint8 = (Img * 255).astype(np.uint8)
         img_para_dibujar = cv2.cvtColor(esqueleto_uint8, cv2.COLOR_GRAY2RGB)
         
-        for i in range(1, self.m - 1):
-            for j in range(1, self.n - 1):
-                if T[i, j]:
-                    terminacion += 1
-                    cv2.rectangle(img_para_dibujar, (j-3, i-3), (j+3, i+3), (255, 0, 0), 1) # Rojo
-                if B[i, j]:
-                    bifurcacion += 1
-                    cv2.circle(img_para_dibujar, (j, i), 4, (0, 0, 255), 1) # Azul
+        for x, y, tipo, *_ in minucias:
+            if tipo == TERMINACION:
+                cv2.rectangle(img_para_dibujar, (x-3, y-3), (x+3, y+3), (255, 0, 0), 1) # Rojo
+            if tipo == BIFURCACION:
+                cv2.circle(img_para_dibujar, (x, y), 4, (0, 0, 255), 1) # Azul
+        terminacion = contar_minucias(minucias, TERMINACION)
+        bifurcacion = contar_minucias(minucias, BIFURCACION)
         
         return img_para_dibujar, terminacion, bifurcacion
-    
-    def parathining1(self, R): return R[0,:].sum() == 0 and R[2,:].sum() == 3
-    def thining1(self, R): return self.parathining1(R) or self.parathining1(np.rot90(R, k=1)) or self.parathining1(np.rot90(R, k=2)) or self.parathining1(np.rot90(R, k=3))
-    def parathining2(self, R): return (R[1,0] + R[2,1]) == 2 and (R[0,1] + R[0,2] + R[1,2]) == 0
-    def thining2(self, R): return self.parathining2(R) or self.parathining2(np.rot90(R, k=1)) or self.parathining2(np.rot90(R, k=2)) or self.parathining2(np.rot90(R, k=3))
-    def parapruning1(self, R): return (R[1,0] + R[0,:].sum() + R[:,2].sum()) == 0
-    def pruning1(self, R): return self.parapruning1(R) or self.parapruning1(np.rot90(R, k=1)) or self.parapruning1(np.rot90(R, k=2)) or self.parapruning1(np.rot90(R, k=3))
-    def parapruning2(self, R): return (R[:,0].sum() + R[0,:].sum() + R[1,2]) == 0
-    def pruning2(self, R): return self.parapruning2(R) or self.parapruning2(np.rot90(R, k=1)) or self.parapruning2(np.rot90(R, k=2)) or self.parapruning2(np.rot90(R, k=3))
-    def caso1(self, R): return (R[1,0]+R[2,1])==2 and (R[0,1]+R[1,2])==0
-    def caso2(self, R): return (R[1,0]+R[0,1])==2 and (R[2,1]+R[2,2]+R[1,2])==0
-    def caso3(self, R): return (R[1,0]+R[2,1])==0 and (R[0,1]+R[1,2])==2
-    def caso4(self, R): return (R[0,0]+R[0,1]+R[1,0])==0 and (R[2,1]+R[1,2])==2
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,8 +1,13 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
+from minucias import extraer_minucias, contar_minucias, TERMINACION, BIFURCACION
+from trabajador import TrabajadorPipeline
+from cache import CacheResultados, etapas_con_cache
+from perfil import Perfil
+from analisis import binarizar
 
 class FingerprintApp:
     def __init__(self, master):
@@ -22,6 +27,14 @@ class FingerprintApp:
         self.btn_load.pack(side=tk.LEFT, padx=20)
         self.btn_process = tk.Button(control_frame, text="Analizar Huella", command=self.process_image, state=tk.DISABLED, font=("Helvetica", 10))
         self.btn_process.pack(side=tk.LEFT, padx=10)
+        # Barra de progreso por etapa del análisis (se ejecuta en un hilo aparte)
+        self.progress = ttk.Progressbar(control_frame, length=200, mode="determinate", maximum=3)
+        self.progress.pack(side=tk.LEFT, padx=10)
+        # Umbral global o local por ventana (Sauvola/Niblack, ver umbral.py)
+        tk.Label(control_frame, text="Binarización:", font=("Helvetica", 10)).pack(side=tk.LEFT, padx=(10, 2))
+        self.binarizacion = tk.StringVar(value="global")
+        ttk.Combobox(control_frame, textvariable=self.binarizacion, values=["global", "sauvola", "niblack"],
+                     state="readonly", width=9).pack(side=tk.LEFT)
         self.grid_frame = tk.Frame(self.master, padx=10, pady=10)
         self.grid_frame.pack(fill=tk.BOTH, expand=True)
         self.grid_frame.rowconfigure(0, weight=1)
@@ -35,6 +48,14 @@ class FingerprintApp:
         self.lbl_results = tk.Label(self.master, text="Resultados aparecerán aquí", font=("Helvetica", 12, "italic"), pady=10)
         self.lbl_results.pack(side=tk.BOTTOM)
 
+        self.worker = TrabajadorPipeline(self.master)
+        # Resultados por contenido de la imagen: volver a analizar la misma huella es inmediato
+        self.cache = CacheResultados()
+        # Tiempos por etapa del último análisis, en la barra de estado
+        self.perfil = Perfil()
+        self.lbl_status = tk.Label(self.master, text="", font=("Helvetica", 9), anchor="w", relief=tk.SUNKEN)
+        self.lbl_status.pack(side=tk.BOTTOM, fill=tk.X, before=self.lbl_results)
+
     def _create_image_panel(self, title, row, col):
         frame = tk.LabelFrame(self.grid_frame, text=title, font=("Helvetica", 11, "bold"), padx=10, pady=10)
         frame.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
@@ -57,6 +78,9 @@ class FingerprintApp:
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.tif *.jpg *.png *.bmp")])
         if not file_path:
             return
+        # Un análisis en curso de la imagen anterior ya no sirve
+        self.worker.cancelar()
+        self.progress.config(value=0)
         self.original_pil_image = Image.open(file_path)
         self._update_image_label(self.lbl_original, self.original_pil_image)
         for label in [self.lbl_binarized, self.lbl_thinned, self.lbl_final]:
@@ -74,71 +98,77 @@ class FingerprintApp:
         img_gray = self.original_pil_image.convert("L")
         img_np = np.array(img_gray)
 
-        # --- 2. Binarización (Método de Otsu) ---
-        # Se usa THRESH_BINARY_INV para que las crestas queden en blanco (255)
-        # y los valles en negro (0), que es lo estándar para el adelgazamiento.
-        _, binarized_np = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        self._update_image_label(self.lbl_binarized, binarized_np)
-        self.master.update_idletasks()
+        # El análisis corre en un hilo aparte; cada panel se llena al terminar su etapa
+        self.btn_process.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+        self.lbl_results.config(text="Analizando...", font=("Helvetica", 12, "italic"))
+        metodo = self.binarizacion.get()
+        parametros = {"binarizacion": metodo, "umbral": None, "adelgazamiento": "zhangsuen"}
+        etapas = etapas_con_cache(self.cache, img_np, parametros, self._pipeline(img_np, metodo))
+        # Un Perfil por análisis: el generador de uno cancelado puede seguir sumando registros al suyo
+        perfil = self.perfil = Perfil()
+        self.worker.iniciar(perfil.etapas(etapas), perfil.envolver("mostrar", self._on_stage_done),
+                            lambda: self._on_pipeline_done(perfil), self._on_pipeline_error)
+
+    def _pipeline(self, img_np, metodo):
+        # Se ejecuta en el hilo del trabajador: solo calcula, no toca la interfaz
+
+        # --- 2. Binarización (Otsu, o Sauvola/Niblack por ventana) ---
+        # Las crestas quedan en blanco (255) y los valles en negro (0),
+        # que es lo estándar para el adelgazamiento.
+        binarized_np = binarizar(img_np, None, metodo)
+        yield "binarizado", binarized_np
         
         # --- 3. Adelgazamiento (Usando OpenCV - Rápido y Eficiente) ---
         thinned_np = cv2.ximgproc.thinning(binarized_np)
-        self._update_image_label(self.lbl_thinned, thinned_np)
-        self.master.update_idletasks()
+        yield "adelgazado", thinned_np
         
         # --- 4. Extracción y Validación de Minucias ---
         # Convertimos la imagen adelgazada (0s y 255s) a booleana (False/True)
         # para que sea compatible con la función de análisis.
         thinned_bool = thinned_np > 0
-        img_remarcada, terminaciones, bifurcaciones = self.analizar_y_remarcar(thinned_bool)
-        self._update_image_label(self.lbl_final, img_remarcada)
-        
-        # --- 5. Mostrar Resultados ---
-        self.lbl_results.config(text=f"ANÁLISIS COMPLETO  |  Terminaciones: {terminaciones}  |  Bifurcaciones: {bifurcaciones}", font=("Helvetica", 12, "bold"))
+        yield "minucias", self.analizar_y_remarcar(thinned_bool)
 
-    def analizar_y_remarcar(self, Img_bool):
-        # La función ahora recibe la imagen adelgazada y booleana.
-        m, n = Img_bool.shape
-        T = np.zeros((m, n))
-        B = np.zeros((m, n))
+    def _on_stage_done(self, numero, nombre, resultado):
+        self.progress.config(value=numero)
+        if nombre == "binarizado":
+            self._update_image_label(self.lbl_binarized, resultado)
+        elif nombre == "adelgazado":
+            self._update_image_label(self.lbl_thinned, resultado)
+        elif nombre == "minucias":
+            img_remarcada, terminaciones, bifurcaciones = resultado
+            self._update_image_label(self.lbl_final, img_remarcada)
+            # --- 5. Mostrar Resultados ---
+            self.lbl_results.config(text=f"ANÁLISIS COMPLETO  |  Terminaciones: {terminaciones}  |  Bifurcaciones: {bifurcaciones}", font=("Helvetica", 12, "bold"))
 
-        # --- Extracción de minucias con Crossing Number ---
-        for i in range(1, m - 1):
-            for j in range(1, n - 1):
-                if Img_bool[i, j]:
-                    # Tomamos la región de 3x3 y la convertimos a entero (0 o 1)
-                    R = Img_bool[i-1:i+2, j-1:j+2].astype(int)
-                    P1,P2,P3 = R[0,0], R[0,1], R[0,2]
-                    P8, _ ,P4 = R[1,0], R[1,1], R[1,2]
-                    P7,P6,P5 = R[2,0], R[2,1], R[2,2]
-                    
-                    # Cálculo del Crossing Number
-                    CN = 0.5 * (abs(P2-P1) + abs(P3-P2) + abs(P4-P3) + abs(P5-P4) + abs(P6-P5) + abs(P7-P6) + abs(P8-P7) + abs(P1-P8))
-                    
-                    if CN == 1.0: T[i, j] = 1 # Terminación
-                    if CN == 3.0: B[i, j] = 1 # Bifurcación
+    def _on_pipeline_done(self, perfil):
+        self.btn_process.config(state=tk.NORMAL)
+        if perfil is self.perfil:  # Solo los tiempos del análisis en curso
+            self.lbl_status.config(text=perfil.resumen())
 
-        # --- Validación/Filtro de minucias ---
-        # Elimina minucias que están agrupadas en un vecindario de 3x3
-        for i in range(1, m - 1):
-            for j in range(1, n - 1):
-                if T[i,j]: T[i,j] = not (T[i-1:i+2,j-1:j+2].sum() > 1)
-                if B[i,j]: B[i,j] = not (B[i-1:i+2,j-1:j+2].sum() > 1)
-        
-        terminacion, bifurcacion = 0, 0
+    def _on_pipeline_error(self, e):
+        self.btn_process.config(state=tk.NORMAL)
+        messagebox.showerror("Error de Procesamiento", f"Ocurrió un error inesperado: {e}")
+        self.lbl_results.config(text="Análisis fallido.", font=("Helvetica", 12, "italic"))
+
+    def analizar_y_remarcar(self, Img_bool):
+        # La función ahora recibe la imagen adelgazada y booleana.
+        # --- Extracción y validación de minucias con Crossing Number ---
+        # Se calcula para todo el esqueleto a la vez y se eliminan las
+        # minucias que están agrupadas en un vecindario de 3x3
+        minucias = extraer_minucias(Img_bool)
         
         # --- Crear imagen final y dibujar minucias ---
         esqueleto_uint8 = (Img_bool * 255).astype(np.uint8)
         img_para_dibujar = cv2.cvtColor(esqueleto_uint8, cv2.COLOR_GRAY2RGB)
         
-        for i in range(1, m - 1):
-            for j in range(1, n - 1):
-                if T[i, j]:
-                    terminacion += 1
-                    cv2.rectangle(img_para_dibujar, (j-3, i-3), (j+3, i+3), (255, 0, 0), 1) # Rojo para Terminaciones
-                if B[i, j]:
-                    bifurcacion += 1
-                    cv2.circle(img_para_dibujar, (j, i), 4, (0, 0, 255), 1) # Azul para Bifurcaciones
+        for x, y, tipo, *_ in minucias:
+            if tipo == TERMINACION:
+                cv2.rectangle(img_para_dibujar, (x-3, y-3), (x+3, y+3), (255, 0, 0), 1) # Rojo para Terminaciones
+            if tipo == BIFURCACION:
+                cv2.circle(img_para_dibujar, (x, y), 4, (0, 0, 255), 1) # Azul para Bifurcaciones
+        terminacion = contar_minucias(minucias, TERMINACION)
+        bifurcacion = contar_minucias(minucias, BIFURCACION)
         
         return img_para_dibujar, terminacion, bifurcacion
 
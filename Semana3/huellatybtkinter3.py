@@ -1,8 +1,14 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
+from minucias import extraer_minucias, contar_minucias, TERMINACION, BIFURCACION
+from capas import CapasMinucias
+from trabajador import TrabajadorPipeline
+from cache import CacheResultados, etapas_con_cache
+from perfil import Perfil
+from analisis import binarizar
 
 class FingerprintApp:
     def __init__(self, master):
@@ -15,8 +21,8 @@ class FingerprintApp:
 
         # NUEVO: Variables para guardar los resultados del análisis
         self.thinned_image_bool = None
-        self.terminations_map = None
-        self.bifurcations_map = None
+        self.minutiae = None
+        self.overlay_layers = None # Capas en caché para mostrar/ocultar minucias
 
         # --- Configuración de la Interfaz ---
         title_label = tk.Label(self.master, text="Proceso de Análisis de Huella Dactilar", font=("Helvetica", 16, "bold"), pady=10)
@@ -30,6 +36,14 @@ class FingerprintApp:
         
         self.btn_process = tk.Button(control_frame, text="Analizar Huella", command=self.process_image, state=tk.DISABLED, font=("Helvetica", 10))
         self.btn_process.pack(side=tk.LEFT, padx=10)
+        # Barra de progreso por etapa del análisis (se ejecuta en un hilo aparte)
+        self.progress = ttk.Progressbar(control_frame, length=200, mode="determinate", maximum=3)
+        self.progress.pack(side=tk.LEFT, padx=10)
+        # Umbral global o local por ventana (Sauvola/Niblack, ver umbral.py)
+        tk.Label(control_frame, text="Binarización:", font=("Helvetica", 10)).pack(side=tk.LEFT, padx=(10, 2))
+        self.binarizacion = tk.StringVar(value="global")
+        ttk.Combobox(control_frame, textvariable=self.binarizacion, values=["global", "sauvola", "niblack"],
+                     state="readonly", width=9).pack(side=tk.LEFT)
 
         # NUEVO: Variables de control para los Checkbuttons
         self.show_terminations = tk.BooleanVar(value=True)
@@ -57,6 +71,14 @@ class FingerprintApp:
         self.lbl_results = tk.Label(self.master, text="Resultados aparecerán aquí", font=("Helvetica", 12, "italic"), pady=10)
         self.lbl_results.pack(side=tk.BOTTOM)
 
+        self.worker = TrabajadorPipeline(self.master)
+        # Resultados por contenido de la imagen: volver a analizar la misma huella es inmediato
+        self.cache = CacheResultados()
+        # Tiempos por etapa del último análisis, en la barra de estado
+        self.perfil = Perfil()
+        self.lbl_status = tk.Label(self.master, text="", font=("Helvetica", 9), anchor="w", relief=tk.SUNKEN)
+        self.lbl_status.pack(side=tk.BOTTOM, fill=tk.X, before=self.lbl_results)
+
     def _create_image_panel(self, title, row, col):
         frame = tk.LabelFrame(self.grid_frame, text=title, font=("Helvetica", 11, "bold"), padx=10, pady=10)
         frame.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
@@ -71,6 +93,10 @@ class FingerprintApp:
             pil_image = image_data
         
         pil_image = pil_image.resize(self.display_size, Image.Resampling.LANCZOS)
+        self._show_image(label, pil_image)
+
+    def _show_image(self, label, pil_image):
+        # Muestra una imagen que ya tiene el tamaño de visualización
         photo_image = ImageTk.PhotoImage(pil_image)
         label.config(image=photo_image, text="")
         label.image = photo_image
@@ -79,6 +105,9 @@ class FingerprintApp:
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.tif *.jpg *.png *.bmp")])
         if not file_path:
             return
+        # Un análisis en curso de la imagen anterior ya no sirve
+        self.worker.cancelar()
+        self.progress.config(value=0)
         self.original_pil_image = Image.open(file_path)
         self._update_image_label(self.lbl_original, self.original_pil_image)
         for label in [self.lbl_binarized, self.lbl_thinned, self.lbl_final]:
@@ -101,89 +130,83 @@ class FingerprintApp:
         img_gray = self.original_pil_image.convert("L")
         img_np = np.array(img_gray)
 
-        _, binarized_np = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        self._update_image_label(self.lbl_binarized, binarized_np)
-        self.master.update_idletasks()
+        # El análisis corre en un hilo aparte; cada panel se llena al terminar su etapa
+        self.btn_process.config(state=tk.DISABLED)
+        self.cb_terminations.config(state=tk.DISABLED)
+        self.cb_bifurcations.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+        self.lbl_results.config(text="Analizando...", font=("Helvetica", 12, "italic"))
+        metodo = self.binarizacion.get()
+        parametros = {"binarizacion": metodo, "umbral": None, "adelgazamiento": "zhangsuen", "display_size": self.display_size}
+        etapas = etapas_con_cache(self.cache, img_np, parametros, self._pipeline(img_np, metodo))
+        # Un Perfil por análisis: el generador de uno cancelado puede seguir sumando registros al suyo
+        perfil = self.perfil = Perfil()
+        self.worker.iniciar(perfil.etapas(etapas), perfil.envolver("mostrar", self._on_stage_done),
+                            lambda: self._on_pipeline_done(perfil), self._on_pipeline_error)
+
+    def _pipeline(self, img_np, metodo):
+        # Se ejecuta en el hilo del trabajador: solo calcula, no toca la interfaz
+        binarized_np = binarizar(img_np, None, metodo)
+        yield "binarizado", binarized_np
         
         thinned_np = cv2.ximgproc.thinning(binarized_np)
-        self._update_image_label(self.lbl_thinned, thinned_np)
-        self.master.update_idletasks()
-        
-        # Guardamos los resultados para no tener que recalcularlos
-        self.thinned_image_bool = thinned_np > 0
-        
-        # La función de análisis ahora solo calcula y devuelve los mapas de minucias
-        self.terminations_map, self.bifurcations_map = self.analizar_minucias(self.thinned_image_bool)
-        
-        # La primera vez, dibujamos la imagen final
-        self._redraw_final_image()
-        
-        # NUEVO: Activamos los checkbuttons ahora que el análisis está completo
-        self.cb_terminations.config(state=tk.NORMAL)
-        self.cb_bifurcations.config(state=tk.NORMAL)
+        yield "adelgazado", thinned_np
+        
+        # La función de análisis ahora solo calcula y devuelve la lista de minucias;
+        # las capas de marcadores también se preparan aquí, fuera del hilo de Tk
+        thinned_bool = thinned_np > 0
+        minutiae = self.analizar_minucias(thinned_bool)
+        yield "minucias", (thinned_bool, minutiae, CapasMinucias(thinned_bool, minutiae, self.display_size))
+
+    def _on_stage_done(self, numero, nombre, resultado):
+        self.progress.config(value=numero)
+        if nombre == "binarizado":
+            self._update_image_label(self.lbl_binarized, resultado)
+        elif nombre == "adelgazado":
+            self._update_image_label(self.lbl_thinned, resultado)
+        elif nombre == "minucias":
+            # Guardamos los resultados para no tener que recalcularlos
+            self.thinned_image_bool, self.minutiae, self.overlay_layers = resultado
+            # La primera vez, dibujamos la imagen final
+            self._redraw_final_image()
+            # Activamos los checkbuttons ahora que el análisis está completo
+            self.cb_terminations.config(state=tk.NORMAL)
+            self.cb_bifurcations.config(state=tk.NORMAL)
+
+    def _on_pipeline_done(self, perfil):
+        self.btn_process.config(state=tk.NORMAL)
+        if perfil is self.perfil:  # Solo los tiempos del análisis en curso
+            self.lbl_status.config(text=perfil.resumen())
+
+    def _on_pipeline_error(self, e):
+        self.btn_process.config(state=tk.NORMAL)
+        messagebox.showerror("Error de Procesamiento", f"Ocurrió un error inesperado: {e}")
+        self.lbl_results.config(text="Análisis fallido.", font=("Helvetica", 12, "italic"))
 
-    # NUEVO: Función para redibujar la imagen final según los checkbuttons
+    # Función para redibujar la imagen final según los checkbuttons.
+    # Solo compone las capas ya redimensionadas, sin recorrer la imagen.
     def _redraw_final_image(self):
-        if self.thinned_image_bool is None:
+        if self.overlay_layers is None:
             return # No hacer nada si no hay una imagen procesada
 
         # Recuperar el estado de los checkbuttons
-        show_term = self.show_terminations.get()
-        show_bif = self.show_bifurcations.get()
+        tipos_visibles = []
+        if self.show_terminations.get():
+            tipos_visibles.append(TERMINACION)
+        if self.show_bifurcations.get():
+            tipos_visibles.append(BIFURCACION)
 
-        # Crear la imagen base (el esqueleto)
-        esqueleto_uint8 = (self.thinned_image_bool * 255).astype(np.uint8)
-        img_para_dibujar = cv2.cvtColor(esqueleto_uint8, cv2.COLOR_GRAY2RGB)
-
-        terminacion_count = 0
-        bifurcacion_count = 0
-        
-        m, n = self.thinned_image_bool.shape
-
-        # Dibujar solo las minucias seleccionadas
-        for i in range(1, m - 1):
-            for j in range(1, n - 1):
-                if self.terminations_map[i, j]:
-                    terminacion_count +=1
-                    if show_term:
-                        cv2.rectangle(img_para_dibujar, (j-3, i-3), (j+3, i+3), (255, 0, 0), 1) # Rojo
-                
-                if self.bifurcations_map[i, j]:
-                    bifurcacion_count += 1
-                    if show_bif:
-                        cv2.circle(img_para_dibujar, (j, i), 4, (0, 0, 255), 1) # Azul
+        terminacion_count = contar_minucias(self.minutiae, TERMINACION)
+        bifurcacion_count = contar_minucias(self.minutiae, BIFURCACION)
 
         # Actualizar el panel de la imagen final
-        self._update_image_label(self.lbl_final, img_para_dibujar)
+        self._show_image(self.lbl_final, self.overlay_layers.componer(tipos_visibles))
         # Actualizar el texto de resultados
         self.lbl_results.config(text=f"ANÁLISIS COMPLETO  |  Terminaciones encontradas: {terminacion_count}  |  Bifurcaciones encontradas: {bifurcacion_count}", font=("Helvetica", 12, "bold"))
 
-    # MODIFICADO: La función ahora solo analiza y devuelve los mapas
+    # MODIFICADO: La función ahora solo analiza y devuelve la lista de minucias
     def analizar_minucias(self, Img_bool):
-        m, n = Img_bool.shape
-        T = np.zeros((m, n))
-        B = np.zeros((m, n))
-
-        for i in range(1, m - 1):
-            for j in range(1, n - 1):
-                if Img_bool[i, j]:
-                    R = Img_bool[i-1:i+2, j-1:j+2].astype(int)
-                    P1,P2,P3 = R[0,0], R[0,1], R[0,2]
-                    P8, _ ,P4 = R[1,0], R[1,1], R[1,2]
-                    P7,P6,P5 = R[2,0], R[2,1], R[2,2]
-                    
-                    CN = 0.5 * (abs(P2-P1) + abs(P3-P2) + abs(P4-P3) + abs(P5-P4) + abs(P6-P5) + abs(P7-P6) + abs(P8-P7) + abs(P1-P8))
-                    
-                    if CN == 1.0: T[i, j] = 1
-                    if CN == 3.0: B[i, j] = 1
-
-        # Filtro de minucias
-        for i in range(1, m - 1):
-            for j in range(1, n - 1):
-                if T[i,j]: T[i,j] = not (T[i-1:i+2,j-1:j+2].sum() > 1)
-                if B[i,j]: B[i,j] = not (B[i-1:i+2,j-1:j+2].sum() > 1)
-        
-        return T, B # Devuelve los mapas de terminaciones y bifurcaciones
+        return extraer_minucias(Img_bool) # Arreglo DTYPE_MINUCIA (ver minucias.py)
 
 if __name__ == "__main__":
     root = tk.Tk()
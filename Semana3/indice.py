@@ -0,0 +1,223 @@
+"""
+Índice 1:N de plantillas por tripletes de minucias.
+
+Cada minucia forma triángulos con pares de sus vecinas más cercanas. Un
+triángulo se describe por sus tres lados (ordenados de mayor a menor) y por
+el tipo de minucia de cada vértice, en ese mismo orden; esa descripción no
+cambia al rotar o trasladar la huella. Los lados se cuantizan y todo se
+empaqueta en un entero, la clave del "cubo" del triplete.
+
+Una sonda vota por las plantillas que comparten sus claves y solo las más
+votadas pasan a la comparación completa (comparador.py).
+"""
+import itertools
+import numpy as np
+
+VECINOS = 4     # Vecinas por minucia con las que se forman triángulos
+PASO = 4        # Ancho de cada intervalo de cuantización de los lados, en píxeles
+_BITS_LADO = 6  # Lados cuantizados a [0, 63]
+_BITS_TIPO = 2  # Tipos de minucia en [0, 3]
+
+def tripletes(minucias, vecinos=VECINOS):
+    """Índices (i, j, l) de los triángulos formados por cada minucia y pares de sus vecinas."""
+    n = len(minucias)
+    k = min(vecinos, n - 1)
+    if k < 2:
+        vacio = np.zeros(0, dtype=np.intp)
+        return vacio, vacio, vacio
+    xy = np.stack([minucias["x"], minucias["y"]], axis=1).astype(np.float64)
+    d = np.hypot(xy[:, None, 0] - xy[None, :, 0], xy[:, None, 1] - xy[None, :, 1])
+    np.fill_diagonal(d, np.inf)
+    cercanas = np.argpartition(d, k - 1, axis=1)[:, :k]
+    p, q = np.array(list(itertools.combinations(range(k), 2))).T
+    i = np.repeat(np.arange(n), len(p))
+    return i, cercanas[:, p].ravel(), cercanas[:, q].ravel()
+
+def _lados_y_tipos(minucias, vecinos):
+    """Lados de cada triángulo ordenados de mayor a menor y el tipo del vértice opuesto a cada uno."""
+    i, j, l = tripletes(minucias, vecinos)
+    xy = np.stack([minucias["x"], minucias["y"]], axis=1).astype(np.float64)
+    vertices = np.stack([i, j, l], axis=1)
+    # El lado k es el opuesto al vértice k
+    lados = np.stack([np.hypot(*(xy[j] - xy[l]).T),
+                      np.hypot(*(xy[i] - xy[l]).T),
+                      np.hypot(*(xy[i] - xy[j]).T)], axis=1)
+    orden = np.argsort(-lados, axis=1, kind="stable")
+    lados = np.take_along_axis(lados, orden, axis=1)
+    tipos = minucias["tipo"][np.take_along_axis(vertices, orden, axis=1)].astype(np.int64)
+    return lados, tipos
+
+def _empaquetar(cuantizados, tipos):
+    clave = np.zeros(len(cuantizados), dtype=np.int64)
+    for c in range(3):
+        clave = (clave << _BITS_LADO) | np.clip(cuantizados[:, c], 0, (1 << _BITS_LADO) - 1)
+    for c in range(3):
+        clave = (clave << _BITS_TIPO) | tipos[:, c]
+    return clave
+
+def claves_tripletes(minucias, vecinos=VECINOS, paso=PASO, tolerante=False):
+    """
+    Claves (sin repetir) de los tripletes de una plantilla. Con tolerante=True
+    también se generan las claves con cada lado en el intervalo vecino más
+    cercano (8 por triplete), para no perder tripletes que caen en el borde
+    de un intervalo; se usa al consultar, no al indexar.
+    """
+    lados, tipos = _lados_y_tipos(minucias, vecinos)
+    escalados = lados / paso
+    cuantizados = np.floor(escalados).astype(np.int64)
+    if not tolerante:
+        return np.unique(_empaquetar(cuantizados, tipos))
+    vecino = np.where(escalados - cuantizados < 0.5, cuantizados - 1, cuantizados + 1)
+    claves = []
+    for eleccion in itertools.product((False, True), repeat=3):
+        variante = np.where(np.array(eleccion)[None, :], vecino, cuantizados)
+        claves.append(_empaquetar(variante, tipos))
+    return np.unique(np.concatenate(claves))
+
+def _ruta_npz(ruta):
+    """np.savez agrega .npz a las rutas sin esa extensión: guardar y cargar usan la misma ruta."""
+    return ruta if ruta.endswith(".npz") else ruta + ".npz"
+
+class IndiceTripletes:
+    """
+    Índice invertido clave de triplete -> plantillas, guardado como dos
+    arreglos paralelos (claves e ids) ordenados por clave. Las inserciones se
+    acumulan y el orden se rehace una sola vez, en la siguiente consulta.
+    Cada id se indexa una sola vez.
+    """
+    def __init__(self, vecinos=VECINOS, paso=PASO):
+        self.vecinos = vecinos
+        self.paso = paso
+        self.claves = np.zeros(0, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.tripletes_por_id = np.zeros(0, dtype=np.int64)
+        self.indexados = np.zeros(0, dtype=bool)
+        self._pendientes = []
+
+    def __len__(self):
+        return len(self.tripletes_por_id)
+
+    def contiene(self, id):
+        return 0 <= id < len(self.indexados) and bool(self.indexados[id])
+
+    def agregar(self, minucias, id=None):
+        """
+        Indexa una plantilla y devuelve su id (por defecto, el siguiente
+        libre). Un id ya indexado lanza ValueError: sus tripletes contarían
+        dos veces en los votos.
+        """
+        if id is None:
+            id = len(self)
+        if self.contiene(id):
+            raise ValueError(f"La plantilla {id} ya está en el índice")
+        claves = claves_tripletes(minucias, self.vecinos, self.paso)
+        if id >= len(self.tripletes_por_id):
+            self.tripletes_por_id = np.pad(self.tripletes_por_id, (0, id + 1 - len(self.tripletes_por_id)))
+            self.indexados = np.pad(self.indexados, (0, id + 1 - len(self.indexados)))
+        self.tripletes_por_id[id] = len(claves)
+        self.indexados[id] = True
+        self._pendientes.append((claves, np.full(len(claves), id, dtype=np.int64)))
+        return id
+
+    def agregar_galeria(self, galeria):
+        """
+        Indexa las plantillas de una galería (plantilla.Galeria) con sus ids,
+        salteando las que ya están en el índice. Devuelve cuántas se agregaron.
+        """
+        agregadas = 0
+        for k in range(len(galeria)):
+            id = int(galeria.indice["id"][k])
+            if not self.contiene(id):
+                self.agregar(galeria.minucias(k), id)
+                agregadas += 1
+        return agregadas
+
+    def _consolidar(self):
+        if not self._pendientes:
+            return
+        claves = np.concatenate([self.claves] + [c for c, _ in self._pendientes])
+        ids = np.concatenate([self.ids] + [i for _, i in self._pendientes])
+        orden = np.argsort(claves, kind="stable")
+        self.claves, self.ids = claves[orden], ids[orden]
+        self._pendientes = []
+
+    def buscar(self, minucias, candidatos=20):
+        """
+        Devuelve (ids, puntajes) de las `candidatos` plantillas más votadas.
+        Los votos se normalizan por la raíz del número de tripletes de cada
+        plantilla, para no favorecer a las que tienen muchas minucias.
+        """
+        self._consolidar()
+        consulta = claves_tripletes(minucias, self.vecinos, self.paso, tolerante=True)
+        desde = np.searchsorted(self.claves, consulta, side="left")
+        hasta = np.searchsorted(self.claves, consulta, side="right")
+        cantidad = hasta - desde
+        posiciones = np.repeat(desde - np.cumsum(cantidad) + cantidad, cantidad) + np.arange(cantidad.sum())
+        # Solo se puntúan las plantillas que recibieron votos: el costo no depende del tamaño de la galería
+        ids, votos = np.unique(self.ids[posiciones], return_counts=True)
+        puntajes = votos / np.sqrt(np.maximum(self.tripletes_por_id[ids], 1))
+        if len(ids) > candidatos:
+            elegidos = np.argpartition(-puntajes, candidatos - 1)[:candidatos]
+            ids, puntajes = ids[elegidos], puntajes[elegidos]
+        # De mayor a menor puntaje; los empates, por id
+        orden = np.lexsort((ids, -puntajes))
+        return ids[orden], puntajes[orden]
+
+    def guardar(self, ruta):
+        self._consolidar()
+        np.savez(_ruta_npz(ruta), claves=self.claves, ids=self.ids, tripletes_por_id=self.tripletes_por_id,
+                 indexados=self.indexados, parametros=np.array([self.vecinos, self.paso]))
+
+    @classmethod
+    def cargar(cls, ruta):
+        datos = np.load(_ruta_npz(ruta))
+        vecinos, paso = datos["parametros"].tolist()
+        indice = cls(vecinos, paso)
+        indice.claves = datos["claves"]
+        indice.ids = datos["ids"]
+        indice.tripletes_por_id = datos["tripletes_por_id"]
+        indice.indexados = datos["indexados"]
+        return indice
+
+def evaluar_recall(indice, sondas, ids_verdaderos, tamanos=(1, 5, 10, 20, 50)):
+    """
+    Recall en función del tamaño de la lista de candidatos: fracción de
+    sondas cuya plantilla verdadera aparece entre las primeras `t` candidatas.
+    Devuelve un diccionario {t: recall}.
+    """
+    aciertos = {t: 0 for t in tamanos}
+    total = 0
+    for minucias, verdadero in zip(sondas, ids_verdaderos):
+        total += 1
+        ids, _ = indice.buscar(minucias, max(tamanos))
+        posicion = np.flatnonzero(ids == verdadero)
+        for t in tamanos:
+            aciertos[t] += bool(len(posicion) and posicion[0] < t)
+    return {t: aciertos[t] / max(total, 1) for t in tamanos}
+
+def main(argv=None):
+    import argparse
+    from plantilla import Galeria
+    parser = argparse.ArgumentParser(description="Construye un índice de tripletes a partir de una galería de plantillas.")
+    parser.add_argument("galeria", help="Galería de plantillas (plantilla.py)")
+    parser.add_argument("indice", help="Archivo .npz del índice (se agrega la extensión si falta); si existe, "
+                                       "se agregan solo las plantillas que no estén indexadas")
+    parser.add_argument("--sondas", default=None, help="Galería de sondas cuyo id es el id verdadero en la galería; reporta el recall")
+    args = parser.parse_args(argv)
+
+    try:
+        indice = IndiceTripletes.cargar(args.indice)
+    except FileNotFoundError:
+        indice = IndiceTripletes()
+    agregadas = indice.agregar_galeria(Galeria(args.galeria))
+    indice.guardar(args.indice)
+    print(f"Índice con {int(indice.indexados.sum())} plantillas ({agregadas} nuevas) -> {_ruta_npz(args.indice)}")
+
+    if args.sondas:
+        sondas = Galeria(args.sondas)
+        recall = evaluar_recall(indice, (sondas.minucias(k) for k in range(len(sondas))), sondas.indice["id"])
+        for t, r in recall.items():
+            print(f"  candidatos {t:>3}: recall {r:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Análisis de huellas por lotes, sin interfaz gráfica.
+
+Ejemplos:
+    python lote.py carpeta_huellas/ -o resultados.jsonl
+    python lote.py "enrolamiento/**/*.tif" -j 8 --umbral 132 --adelgazamiento tabla
+    python lote.py escaneos/ --binarizacion sauvola --ventana 41
+
+Cada imagen produce una línea JSON con sus conteos y la lista de minucias
+[x, y, tipo] (tipo: 0 terminación, 1 bifurcación, 2 lago, 3 isla); la
+galería guarda además el ángulo y la calidad de cada una.
+Con --galeria también se escribe una galería binaria (ver plantilla.py) con
+una plantilla por imagen leída correctamente; su id es el número de línea
+(desde 0) de la imagen en el archivo JSONL. Las imágenes de más de 65535
+píxeles por lado no entran en la galería: su línea lleva el error.
+Con --mosaico, cada imagen se analiza por mosaicos de ese tamaño (ver
+mosaico.py), para escaneos demasiado grandes para tenerlos enteros en
+memoria; los .npy se leen mapeados en memoria.
+Con --perfil, cada línea lleva también "etapas": un registro por etapa con su
+tiempo y el tamaño de su salida (ver perfil.py); --perfil-memoria agrega los
+bytes asignados y --cprofile ETAPA el informe de cProfile de esa etapa.
+Con --cache, los resultados (también los de --mosaico) se guardan en disco
+por contenido de imagen y parámetros (ver cache.py): volver a procesar las
+mismas imágenes no las analiza de nuevo.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+from analisis import analizar_huella, completar_parametros, PARAMETROS_POR_DEFECTO
+from cache import CacheResultados
+from minucias import contar_minucias, TERMINACION, BIFURCACION, LAGO, ISLA
+from plantilla import EscritorGaleria
+from mosaico import abrir_imagen, analizar_por_mosaicos
+from perfil import Perfil, SIN_PERFIL
+
+EXTENSIONES = (".tif", ".tiff", ".jpg", ".jpeg", ".png", ".bmp", ".npy")
+
+def buscar_imagenes(entradas):
+    """Expande carpetas y patrones glob en una lista ordenada de archivos de imagen."""
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _, archivos in os.walk(entrada):
+                rutas.extend(os.path.join(raiz, a) for a in archivos)
+        else:
+            rutas.extend(glob.glob(entrada, recursive=True))
+    return sorted(r for r in set(rutas) if r.lower().endswith(EXTENSIONES))
+
+_cache = None  # Caché en disco del proceso, si se pidió --cache
+
+def _inicializar_proceso(directorio_cache=None):
+    # Un hilo de OpenCV por proceso: el paralelismo lo da el pool de procesos
+    cv2.setNumThreads(1)
+    global _cache
+    if directorio_cache:
+        # Sin nivel en memoria: cada imagen del lote se ve una sola vez por proceso
+        _cache = CacheResultados(max_bytes=0, directorio=directorio_cache)
+
+def _analizar_por_mosaicos(img_gray, parametros, tam):
+    """analizar_por_mosaicos pasando por la caché del proceso (la clave incluye el tamaño de mosaico)."""
+    if _cache is None:
+        return analizar_por_mosaicos(img_gray, parametros, tam)
+    clave = _cache.clave(img_gray, dict(completar_parametros(parametros), mosaico=tam))
+    minucias = _cache.obtener(clave)
+    if minucias is None:
+        minucias = analizar_por_mosaicos(img_gray, parametros, tam)
+        _cache.guardar(clave, minucias)
+    return minucias
+
+def procesar_archivo(ruta, parametros, mosaico=None, perfil=None):
+    """
+    Analiza un archivo y devuelve (registro, minucias); si falla, el registro
+    lleva el error y las minucias son None (nunca lanza excepciones).
+    Con `mosaico`, la imagen se analiza por mosaicos de ese tamaño. Con
+    `perfil` (argumentos de perfil.Perfil), el registro lleva los tiempos por etapa.
+    """
+    medidor = Perfil(**perfil) if perfil is not None else SIN_PERFIL
+    try:
+        img_gray = medidor.medir("lectura", abrir_imagen, ruta)
+        if mosaico:
+            minucias = medidor.medir("mosaicos", _analizar_por_mosaicos, img_gray, parametros, mosaico)
+        else:
+            minucias = analizar_huella(img_gray, parametros, _cache, medidor)["minucias"]
+        registro = {
+            "archivo": ruta,
+            "alto": img_gray.shape[0],
+            "ancho": img_gray.shape[1],
+            "terminaciones": contar_minucias(minucias, TERMINACION),
+            "bifurcaciones": contar_minucias(minucias, BIFURCACION),
+            "lagos": contar_minucias(minucias, LAGO),
+            "islas": contar_minucias(minucias, ISLA),
+            "minucias": [[int(x), int(y), int(t)] for x, y, t, *_ in minucias],
+        }
+        if perfil is not None:
+            registro["etapas"] = medidor.registros
+            if medidor.estadisticas:
+                registro["cprofile"] = medidor.estadisticas
+        return registro, minucias
+    except Exception as e:
+        return {"archivo": ruta, "error": str(e)}, None
+
+def procesar_lote(rutas, parametros=None, procesos=None, salida=sys.stdout, galeria=None, directorio_cache=None, mosaico=None, perfil=None):
+    """
+    Procesa las rutas con un pool de procesos y escribe una línea JSON por
+    imagen en `salida`, en el mismo orden que `rutas`. Si se pasa un
+    EscritorGaleria, también agrega una plantilla por imagen. Con
+    `directorio_cache`, los resultados se leen y guardan en esa carpeta; con
+    `mosaico`, cada imagen se analiza por mosaicos de ese tamaño; con
+    `perfil`, cada registro lleva sus tiempos por etapa.
+    Devuelve (imagenes_procesadas, errores, segundos).
+    """
+    procesos = procesos or os.cpu_count() or 1
+    # Trozos grandes para amortizar la comunicación entre procesos
+    chunksize = max(1, min(64, len(rutas) // (procesos * 4)))
+    errores = 0
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso, initargs=(directorio_cache,)) as pool:
+        resultados = pool.map(procesar_archivo, rutas, [parametros] * len(rutas), [mosaico] * len(rutas), [perfil] * len(rutas), chunksize=chunksize)
+        for linea, (registro, minucias) in enumerate(resultados):
+            if galeria is not None and minucias is not None:
+                try:
+                    galeria.agregar(minucias, registro["ancho"], registro["alto"], id=linea)
+                except ValueError as e:
+                    # No entra en el formato de la galería (escaneos de más de 65535 píxeles)
+                    registro["error"] = str(e)
+            errores += "error" in registro
+            salida.write(json.dumps(registro) + "\n")
+    return len(rutas), errores, time.perf_counter() - inicio
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extracción de minucias por lotes (sin interfaz gráfica).")
+    parser.add_argument("entradas", nargs="+", help="Carpetas o patrones glob con las imágenes")
+    parser.add_argument("-o", "--salida", default=None, help="Archivo JSONL de resultados (por defecto resultados_<fecha>.jsonl)")
+    parser.add_argument("-j", "--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, todos los núcleos)")
+    parser.add_argument("--galeria", default=None, help="Archivo de galería binaria de plantillas a escribir (opcional)")
+    parser.add_argument("--cache", default=None, help="Carpeta para guardar y reutilizar resultados entre ejecuciones (opcional)")
+    parser.add_argument("--mosaico", type=int, default=None, help="Analizar por mosaicos de este tamaño, para imágenes muy grandes (opcional)")
+    parser.add_argument("--perfil", action="store_true", help="Agregar los tiempos por etapa a cada registro")
+    parser.add_argument("--perfil-memoria", action="store_true", help="Con --perfil, medir también los bytes asignados por etapa (más lento)")
+    parser.add_argument("--cprofile", action="append", default=[], metavar="ETAPA", help="Con --perfil, ejecutar esa etapa (p. ej. adelgazado, minucias) dentro de cProfile (se puede repetir)")
+    parser.add_argument("--segmentar", action="store_true", help="Recortar a la huella y descartar el fondo del escaneo antes de binarizar")
+    parser.add_argument("--realce", action="store_true", help="Realzar las crestas con filtros de Gabor antes de binarizar")
+    parser.add_argument("--umbral", type=int, default=None, help="Umbral fijo de binarización (por defecto, Otsu)")
+    parser.add_argument("--binarizacion", choices=["global", "sauvola", "niblack"], default=PARAMETROS_POR_DEFECTO["binarizacion"],
+                        help="Umbral global (Otsu o --umbral) o local por ventana")
+    parser.add_argument("--ventana", type=int, default=PARAMETROS_POR_DEFECTO["ventana"], help="Lado de la ventana de los umbrales locales")
+    parser.add_argument("--depurar", action="store_true", help="Quitar minucias falsas: crestas cortadas, espolones, puentes y borde")
+    parser.add_argument("--calidad-minima", type=float, default=PARAMETROS_POR_DEFECTO["calidad_minima"],
+                        help="Descartar las minucias con calidad (0 a 1) menor a esta")
+    parser.add_argument("--sin-limpieza", action="store_true", help="No aplicar la apertura morfológica")
+    parser.add_argument("--adelgazamiento", choices=["zhangsuen", "guohall", "tabla"], default=PARAMETROS_POR_DEFECTO["adelgazamiento"])
+    args = parser.parse_args(argv)
+
+    rutas = buscar_imagenes(args.entradas)
+    if not rutas:
+        print("No se encontraron imágenes.", file=sys.stderr)
+        return 1
+
+    parametros = {
+        "segmentacion": args.segmentar,
+        "realce": args.realce,
+        "umbral": args.umbral,
+        "binarizacion": args.binarizacion,
+        "ventana": args.ventana,
+        "depuracion": args.depurar,
+        "calidad_minima": args.calidad_minima,
+        "limpieza": not args.sin_limpieza,
+        "adelgazamiento": args.adelgazamiento,
+    }
+    perfil = {"memoria": args.perfil_memoria, "cprofile": args.cprofile} if args.perfil else None
+    salida = args.salida or time.strftime("resultados_%Y%m%d_%H%M%S.jsonl")
+    galeria = EscritorGaleria(args.galeria) if args.galeria else None
+    try:
+        with open(salida, "w") as f:
+            total, errores, segundos = procesar_lote(rutas, parametros, args.procesos, f, galeria, args.cache, args.mosaico, perfil)
+    finally:
+        if galeria is not None:
+            galeria.cerrar()
+    print(f"{total} imágenes en {segundos:.2f} s ({total / segundos:.1f} img/s), {errores} con error -> {salida}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
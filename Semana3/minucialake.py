@@ -1,8 +1,13 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
+from minucias import detectar_lagos
+from trabajador import TrabajadorPipeline
+from cache import CacheResultados, etapas_con_cache
+from perfil import Perfil
+from analisis import binarizar
 
 class LakeFinderApp:
     def __init__(self, master):
@@ -31,6 +36,14 @@ class LakeFinderApp:
         
         self.btn_process = tk.Button(control_frame, text="Detectar Lakes", command=self.process_image, state=tk.DISABLED, font=("Helvetica", 10))
         self.btn_process.pack(side=tk.LEFT, padx=10)
+        # Barra de progreso por etapa del análisis (se ejecuta en un hilo aparte)
+        self.progress = ttk.Progressbar(control_frame, length=200, mode="determinate", maximum=3)
+        self.progress.pack(side=tk.LEFT, padx=10)
+        # Umbral global o local por ventana (Sauvola/Niblack, ver umbral.py)
+        tk.Label(control_frame, text="Binarización:", font=("Helvetica", 10)).pack(side=tk.LEFT, padx=(10, 2))
+        self.binarizacion = tk.StringVar(value="global")
+        ttk.Combobox(control_frame, textvariable=self.binarizacion, values=["global", "sauvola", "niblack"],
+                     state="readonly", width=9).pack(side=tk.LEFT)
 
         self.grid_frame = tk.Frame(self.master, padx=10, pady=10)
         self.grid_frame.pack(fill=tk.BOTH, expand=True)
@@ -47,6 +60,14 @@ class LakeFinderApp:
         self.lbl_results = tk.Label(self.master, text="Resultados aparecerán aquí", font=("Helvetica", 12, "italic"), pady=10)
         self.lbl_results.pack(side=tk.BOTTOM)
 
+        self.worker = TrabajadorPipeline(self.master)
+        # Resultados por contenido de la imagen: volver a analizar la misma huella es inmediato
+        self.cache = CacheResultados()
+        # Tiempos por etapa del último análisis, en la barra de estado
+        self.perfil = Perfil()
+        self.lbl_status = tk.Label(self.master, text="", font=("Helvetica", 9), anchor="w", relief=tk.SUNKEN)
+        self.lbl_status.pack(side=tk.BOTTOM, fill=tk.X, before=self.lbl_results)
+
     def _create_image_panel(self, title, row, col):
         frame = tk.LabelFrame(self.grid_frame, text=title, font=("Helvetica", 11, "bold"), padx=10, pady=10)
         frame.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
@@ -69,6 +90,9 @@ class LakeFinderApp:
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.tif *.jpg *.png *.bmp")])
         if not file_path:
             return
+        # Un análisis en curso de la imagen anterior ya no sirve
+        self.worker.cancelar()
+        self.progress.config(value=0)
         self.original_pil_image = Image.open(file_path)
         self._update_image_label(self.lbl_original, self.original_pil_image)
         for label in [self.lbl_binarized, self.lbl_thinned, self.lbl_final]:
@@ -82,17 +106,31 @@ class LakeFinderApp:
             messagebox.showerror("Error", "Primero debes cargar una imagen.")
             return
         
-        # 1. Binarización
         img_gray = self.original_pil_image.convert("L")
         img_np = np.array(img_gray)
-        _, binarized_np = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        self._update_image_label(self.lbl_binarized, binarized_np)
-        self.master.update_idletasks()
+
+        # El análisis corre en un hilo aparte; cada panel se llena al terminar su etapa
+        self.btn_process.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+        self.lbl_results.config(text="Analizando...", font=("Helvetica", 12, "italic"))
+        metodo = self.binarizacion.get()
+        parametros = {"binarizacion": metodo, "umbral": None, "adelgazamiento": "zhangsuen",
+                      "MIN_LAKE_AREA": self.MIN_LAKE_AREA, "MAX_LAKE_AREA": self.MAX_LAKE_AREA}
+        etapas = etapas_con_cache(self.cache, img_np, parametros, self._pipeline(img_np, metodo))
+        # Un Perfil por análisis: el generador de uno cancelado puede seguir sumando registros al suyo
+        perfil = self.perfil = Perfil()
+        self.worker.iniciar(perfil.etapas(etapas), perfil.envolver("mostrar", self._on_stage_done),
+                            lambda: self._on_pipeline_done(perfil), self._on_pipeline_error)
+
+    def _pipeline(self, img_np, metodo):
+        # Se ejecuta en el hilo del trabajador: solo calcula, no toca la interfaz
+        # 1. Binarización
+        binarized_np = binarizar(img_np, None, metodo)
+        yield "binarizado", binarized_np
         
         # 2. Adelgazamiento
         thinned_np = cv2.ximgproc.thinning(binarized_np)
-        self._update_image_label(self.lbl_thinned, thinned_np)
-        self.master.update_idletasks()
+        yield "adelgazado", thinned_np
         
         # 3. Extracción de Minucias (con validación interna)
         lake_centers, lake_count = self.detect_lakes(thinned_np)
@@ -104,36 +142,36 @@ class LakeFinderApp:
             # Dibuja un cuadrado verde con grosor de línea de 1 píxel
             cv2.rectangle(img_para_dibujar, (x-4, y-4), (x+4, y+4), (0, 255, 0), 1)
 
-        self._update_image_label(self.lbl_final, img_para_dibujar)
-        self.lbl_results.config(text=f"ANÁLISIS COMPLETO   |   Lakes encontrados: {lake_count}", font=("Helvetica", 12, "bold"))
+        yield "lagos", (img_para_dibujar, lake_count)
+
+    def _on_stage_done(self, numero, nombre, resultado):
+        self.progress.config(value=numero)
+        if nombre == "binarizado":
+            self._update_image_label(self.lbl_binarized, resultado)
+        elif nombre == "adelgazado":
+            self._update_image_label(self.lbl_thinned, resultado)
+        elif nombre == "lagos":
+            img_para_dibujar, lake_count = resultado
+            self._update_image_label(self.lbl_final, img_para_dibujar)
+            self.lbl_results.config(text=f"ANÁLISIS COMPLETO   |   Lakes encontrados: {lake_count}", font=("Helvetica", 12, "bold"))
+
+    def _on_pipeline_done(self, perfil):
+        self.btn_process.config(state=tk.NORMAL)
+        if perfil is self.perfil:  # Solo los tiempos del análisis en curso
+            self.lbl_status.config(text=perfil.resumen())
+
+    def _on_pipeline_error(self, e):
+        self.btn_process.config(state=tk.NORMAL)
+        messagebox.showerror("Error de Procesamiento", f"Ocurrió un error inesperado: {e}")
+        self.lbl_results.config(text="Análisis fallido.", font=("Helvetica", 12, "italic"))
 
     def detect_lakes(self, thinned_image):
         """
         Detecta minucias de tipo lago y las valida por tamaño.
         Devuelve una lista de las coordenadas (x, y) del centro de cada lago validado.
         """
-        lake_centers = []
-        image_copy = thinned_image.copy()
-
-        # Extracción: Encuentra todos los contornos y su jerarquía
-        contours, hierarchy = cv2.findContours(image_copy, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if hierarchy is None:
-            return [], 0
-
-        # Validación: Itera y filtra los contornos que son "agujeros" y cumplen el criterio de área
-        for i in range(len(contours)):
-            if hierarchy[0][i][3] != -1: # Es un agujero (tiene un contorno padre)
-                contour = contours[i]
-                area = cv2.contourArea(contour)
-                
-                if self.MIN_LAKE_AREA < area < self.MAX_LAKE_AREA: # Criterio de validación
-                    M = cv2.moments(contour)
-                    if M["m00"] != 0:
-                        cX = int(M["m10"] / M["m00"])
-                        cY = int(M["m01"] / M["m00"])
-                        lake_centers.append((cX, cY))
-        
+        lagos = detectar_lagos(thinned_image, self.MIN_LAKE_AREA, self.MAX_LAKE_AREA)
+        lake_centers = list(zip(lagos["x"].tolist(), lagos["y"].tolist()))
         return lake_centers, len(lake_centers)
 
 
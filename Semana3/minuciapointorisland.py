@@ -1,8 +1,13 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
+from minucias import detectar_islas
+from trabajador import TrabajadorPipeline
+from cache import CacheResultados, etapas_con_cache
+from perfil import Perfil
+from analisis import binarizar
 
 class IslandFinderApp:
     def __init__(self, master):
@@ -31,6 +36,14 @@ class IslandFinderApp:
         
         self.btn_process = tk.Button(control_frame, text="Detectar Islas/Puntos", command=self.process_image, state=tk.DISABLED, font=("Helvetica", 10))
         self.btn_process.pack(side=tk.LEFT, padx=10)
+        # Barra de progreso por etapa del análisis (se ejecuta en un hilo aparte)
+        self.progress = ttk.Progressbar(control_frame, length=200, mode="determinate", maximum=4)
+        self.progress.pack(side=tk.LEFT, padx=10)
+        # Umbral global o local por ventana (Sauvola/Niblack, ver umbral.py)
+        tk.Label(control_frame, text="Binarización:", font=("Helvetica", 10)).pack(side=tk.LEFT, padx=(10, 2))
+        self.binarizacion = tk.StringVar(value="global")
+        ttk.Combobox(control_frame, textvariable=self.binarizacion, values=["global", "sauvola", "niblack"],
+                     state="readonly", width=9).pack(side=tk.LEFT)
 
         # Reconfiguramos la grilla para 2x3 paneles
         self.grid_frame = tk.Frame(self.master, padx=10, pady=10)
@@ -47,6 +60,14 @@ class IslandFinderApp:
         self.lbl_results = tk.Label(self.master, text="Resultados aparecerán aquí", font=("Helvetica", 12, "italic"), pady=10)
         self.lbl_results.pack(side=tk.BOTTOM)
 
+        self.worker = TrabajadorPipeline(self.master)
+        # Resultados por contenido de la imagen: volver a analizar la misma huella es inmediato
+        self.cache = CacheResultados()
+        # Tiempos por etapa del último análisis, en la barra de estado
+        self.perfil = Perfil()
+        self.lbl_status = tk.Label(self.master, text="", font=("Helvetica", 9), anchor="w", relief=tk.SUNKEN)
+        self.lbl_status.pack(side=tk.BOTTOM, fill=tk.X, before=self.lbl_results)
+
     def _create_image_panel(self, title, row, col):
         frame = tk.LabelFrame(self.grid_frame, text=title, font=("Helvetica", 11, "bold"), padx=10, pady=10)
         frame.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
@@ -68,6 +89,9 @@ class IslandFinderApp:
     def load_image(self):
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.tif *.jpg *.png *.bmp")])
         if not file_path: return
+        # Un análisis en curso de la imagen anterior ya no sirve
+        self.worker.cancelar()
+        self.progress.config(value=0)
         self.original_pil_image = Image.open(file_path)
         self._update_image_label(self.lbl_original, self.original_pil_image)
         for label in [self.lbl_binarized, self.lbl_cleaned, self.lbl_thinned, self.lbl_final]:
@@ -81,62 +105,88 @@ class IslandFinderApp:
             messagebox.showerror("Error", "Primero debes cargar una imagen.")
             return
         
-        try:
-            # 1. Binarización
-            img_gray = self.original_pil_image.convert("L")
-            img_np = np.array(img_gray)
-            _, binarized_np = cv2.threshold(img_np, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-            self._update_image_label(self.lbl_binarized, binarized_np)
-            self.master.update_idletasks()
-            
-            # 2. **Limpieza Morfológica**
-            kernel = np.ones((3,3), np.uint8)
-            # La apertura (MORPH_OPEN) elimina el ruido tipo "sal" (puntos blancos aislados)
-            cleaned_np = cv2.morphologyEx(binarized_np, cv2.MORPH_OPEN, kernel, iterations=1)
-            self._update_image_label(self.lbl_cleaned, cleaned_np)
-            self.master.update_idletasks()
-
-            # 3. Adelgazamiento (ahora sobre la imagen limpia)
-            thinned_np = cv2.ximgproc.thinning(cleaned_np, thinningType=cv2.ximgproc.THINNING_GUOHALL)
-            self._update_image_label(self.lbl_thinned, thinned_np)
-            self.master.update_idletasks()
-            
-            # 4. Extracción de Minucias (Isla/Punto)
-            island_centers, island_count = self.detect_islands(thinned_np)
-            
-            # 5. Dibujo de resultados
-            img_para_dibujar = cv2.cvtColor(thinned_np, cv2.COLOR_GRAY2RGB)
-            
-            for (x, y) in island_centers:
-                size = 5
-                p1 = (x, y - size)
-                p2 = (x - size, y + size // 2)
-                p3 = (x + size, y + size // 2)
-                triangle_cnt = np.array([p1, p2, p3], dtype=np.int32)
-                cv2.drawContours(img_para_dibujar, [triangle_cnt], 0, (0, 0, 255), 1)
+        img_gray = self.original_pil_image.convert("L")
+        img_np = np.array(img_gray)
+
+        # El análisis corre en un hilo aparte; cada panel se llena al terminar su etapa.
+        # Los errores de cualquier etapa llegan a _on_pipeline_error.
+        self.btn_process.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+        self.lbl_results.config(text="Analizando...", font=("Helvetica", 12, "italic"))
+        metodo = self.binarizacion.get()
+        parametros = {"binarizacion": metodo, "umbral": None, "limpieza": True, "adelgazamiento": "guohall",
+                      "MIN_ISLAND_PIXELS": self.MIN_ISLAND_PIXELS, "MAX_ISLAND_PIXELS": self.MAX_ISLAND_PIXELS}
+        etapas = etapas_con_cache(self.cache, img_np, parametros, self._pipeline(img_np, metodo))
+        # Un Perfil por análisis: el generador de uno cancelado puede seguir sumando registros al suyo
+        perfil = self.perfil = Perfil()
+        self.worker.iniciar(perfil.etapas(etapas), perfil.envolver("mostrar", self._on_stage_done),
+                            lambda: self._on_pipeline_done(perfil), self._on_pipeline_error)
+
+    def _pipeline(self, img_np, metodo):
+        # Se ejecuta en el hilo del trabajador: solo calcula, no toca la interfaz
+        # 1. Binarización
+        binarized_np = binarizar(img_np, None, metodo)
+        yield "binarizado", binarized_np
+        
+        # 2. **Limpieza Morfológica**
+        kernel = np.ones((3,3), np.uint8)
+        # La apertura (MORPH_OPEN) elimina el ruido tipo "sal" (puntos blancos aislados)
+        cleaned_np = cv2.morphologyEx(binarized_np, cv2.MORPH_OPEN, kernel, iterations=1)
+        yield "limpio", cleaned_np
+
+        # 3. Adelgazamiento (ahora sobre la imagen limpia)
+        thinned_np = cv2.ximgproc.thinning(cleaned_np, thinningType=cv2.ximgproc.THINNING_GUOHALL)
+        yield "adelgazado", thinned_np
+        
+        # 4. Extracción de Minucias (Isla/Punto)
+        island_centers, island_count = self.detect_islands(thinned_np)
+        
+        # 5. Dibujo de resultados
+        img_para_dibujar = cv2.cvtColor(thinned_np, cv2.COLOR_GRAY2RGB)
+        
+        for (x, y) in island_centers:
+            size = 5
+            p1 = (x, y - size)
+            p2 = (x - size, y + size // 2)
+            p3 = (x + size, y + size // 2)
+            triangle_cnt = np.array([p1, p2, p3], dtype=np.int32)
+            cv2.drawContours(img_para_dibujar, [triangle_cnt], 0, (0, 0, 255), 1)
 
+        yield "islas", (img_para_dibujar, island_count)
+
+    def _on_stage_done(self, numero, nombre, resultado):
+        self.progress.config(value=numero)
+        if nombre == "binarizado":
+            self._update_image_label(self.lbl_binarized, resultado)
+        elif nombre == "limpio":
+            self._update_image_label(self.lbl_cleaned, resultado)
+        elif nombre == "adelgazado":
+            self._update_image_label(self.lbl_thinned, resultado)
+        elif nombre == "islas":
+            img_para_dibujar, island_count = resultado
             self._update_image_label(self.lbl_final, img_para_dibujar)
             self.lbl_results.config(text=f"ANÁLISIS COMPLETO   |   Islas/Puntos encontrados: {island_count}", font=("Helvetica", 12, "bold"))
-        except Exception as e:
-            messagebox.showerror("Error de Procesamiento", f"Ocurrió un error inesperado: {e}")
-            self.lbl_results.config(text="Análisis fallido.", font=("Helvetica", 12, "italic"))
+
+    def _on_pipeline_done(self, perfil):
+        self.btn_process.config(state=tk.NORMAL)
+        if perfil is self.perfil:  # Solo los tiempos del análisis en curso
+            self.lbl_status.config(text=perfil.resumen())
+
+    def _on_pipeline_error(self, e):
+        self.btn_process.config(state=tk.NORMAL)
+        messagebox.showerror("Error de Procesamiento", f"Ocurrió un error inesperado: {e}")
+        self.lbl_results.config(text="Análisis fallido.", font=("Helvetica", 12, "italic"))
 
     def detect_islands(self, thinned_image):
         """
         Detecta minucias de tipo Isla/Punto utilizando el análisis de componentes conectados
         sobre una imagen previamente limpiada.
         """
-        island_centers = []
-        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(thinned_image, 8, cv2.CV_32S)
-        
-        for i in range(1, num_labels):
-            pixel_count = stats[i, cv2.CC_STAT_AREA]
-            if self.MIN_ISLAND_PIXELS <= pixel_count <= self.MAX_ISLAND_PIXELS:
-                cx, cy = centroids[i]
-                island_centers.append((int(cx), int(cy)))
-                
+        islas = detectar_islas(thinned_image, self.MIN_ISLAND_PIXELS, self.MAX_ISLAND_PIXELS)
+        island_centers = list(zip(islas["x"].tolist(), islas["y"].tolist()))
         return island_centers, len(island_centers)
 
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = IslandFinderApp(root)
@@ -0,0 +1,231 @@
+import numpy as np
+import cv2
+from adelgazamiento import codigos_vecindad, retazo_desde_codigo
+from realce import campo_orientacion, BLOQUE
+
+# ==============================
+# REPRESENTACIÓN DE LAS MINUCIAS
+# ==============================
+# Tipos de minucia
+TERMINACION = 0
+BIFURCACION = 1
+LAGO = 2
+ISLA = 3
+
+# Cada minucia es un registro (x, y, tipo, angulo, calidad); x es la columna e y la fila.
+# El ángulo (en radianes) y la calidad (en [0, 1]) quedan en NaN mientras no se calculen.
+DTYPE_MINUCIA = np.dtype([("x", np.int32), ("y", np.int32), ("tipo", np.uint8), ("angulo", np.float32),
+                          ("calidad", np.float32)])
+
+def crear_minucias(xs, ys, tipos, angulos=None, calidades=None):
+    """Arma el arreglo estructurado de minucias a partir de sus columnas."""
+    minucias = np.empty(len(xs), dtype=DTYPE_MINUCIA)
+    minucias["x"] = xs
+    minucias["y"] = ys
+    minucias["tipo"] = tipos
+    minucias["angulo"] = np.nan if angulos is None else angulos
+    minucias["calidad"] = np.nan if calidades is None else calidades
+    return minucias
+
+def contar_minucias(minucias, tipo):
+    return int(np.count_nonzero(minucias["tipo"] == tipo))
+
+# ==============================
+# CROSSING NUMBER POR TABLA
+# ==============================
+def _crossing_number(R):
+    P1,P2,P3 = int(R[0,0]),int(R[0,1]),int(R[0,2])
+    P8,P, P4 = int(R[1,0]),int(R[1,1]),int(R[1,2])
+    P7,P6,P5 = int(R[2,0]),int(R[2,1]),int(R[2,2])
+    return 0.5*(abs(P2-P1)+abs(P3-P2)+abs(P4-P3)+abs(P5-P4)+abs(P6-P5)+abs(P7-P6)+abs(P8-P7)+abs(P1-P8))
+
+# Tabla de 256 entradas con el Crossing Number de cada código de vecindad
+TABLA_CN = np.array([_crossing_number(retazo_desde_codigo(k)) for k in range(256)], dtype=np.uint8)
+
+def crossing_number(Img):
+    """
+    Calcula el Crossing Number de todos los píxeles del esqueleto a la vez.
+    Los píxeles de fondo y los bordes de la imagen quedan en 0.
+    """
+    Img = np.asarray(Img, dtype=bool)
+    return np.where(Img, TABLA_CN[codigos_vecindad(Img)], 0).astype(np.uint8)
+
+# ==============================
+# FILTRO DE MINUCIAS DUPLICADAS
+# ==============================
+def _suma_3x3(M):
+    """Suma de cada vecindario de 3x3 (filtro de caja sin normalizar, ceros fuera de la imagen)."""
+    return cv2.boxFilter(M.astype(np.uint8), -1, (3, 3), normalize=False, borderType=cv2.BORDER_CONSTANT)
+
+def filtrar_duplicadas(M):
+    """
+    Elimina las minucias agrupadas en un vecindario de 3x3, con el mismo
+    resultado que el recorrido original en orden raster: las minucias aisladas
+    se resuelven con un filtro de caja y solo las agrupadas (pocas) se revisan
+    una por una, en el mismo orden que antes.
+    """
+    M = np.asarray(M, dtype=bool).copy()
+    m, n = M.shape
+    agrupadas = M & (_suma_3x3(M) > 1)
+    # El recorrido original no visita los bordes de la imagen
+    agrupadas[0, :] = agrupadas[-1, :] = False
+    agrupadas[:, 0] = agrupadas[:, -1] = False
+    for i, j in np.argwhere(agrupadas):
+        M[i, j] = not (M[i-1:i+2, j-1:j+2].sum() > 1)
+    return M
+
+# ==============================
+# EXTRACCIÓN DE MINUCIAS
+# ==============================
+def extraer_minucias(Img):
+    """
+    Extrae las minucias de un esqueleto (booleano o 0/255) con el Crossing Number.
+    Devuelve un arreglo estructurado (DTYPE_MINUCIA) con las terminaciones
+    (CN == 1) y bifurcaciones (CN == 3) ya filtradas, en orden raster.
+    """
+    CN = crossing_number(Img)
+    T = filtrar_duplicadas(CN == 1)
+    B = filtrar_duplicadas(CN == 3)
+    ys, xs = np.nonzero(T | B)
+    tipos = np.where(T[ys, xs], TERMINACION, BIFURCACION)
+    return crear_minucias(xs, ys, tipos)
+
+# ==============================
+# LAGOS E ISLAS
+# ==============================
+def _a_uint8(esqueleto):
+    return np.where(np.asarray(esqueleto) > 0, 255, 0).astype(np.uint8)
+
+def _en_orden_raster(centros):
+    """Centros (n, 2) de x, y ordenados por fila y luego por columna."""
+    return centros[np.lexsort((centros[:, 0], centros[:, 1]))]
+
+def _lagos_desde_contornos(contours, hierarchy, area_min, area_max):
+    centros = []
+    if hierarchy is not None:
+        for i in np.flatnonzero(hierarchy[0][:, 3] != -1): # Es un agujero (tiene un contorno padre)
+            # En un contorno, m00 es su área (igual que cv2.contourArea)
+            M = cv2.moments(contours[i])
+            if area_min < M["m00"] < area_max:
+                centros.append((int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"])))
+    centros = _en_orden_raster(np.array(centros, dtype=np.int32).reshape(-1, 2))
+    return crear_minucias(centros[:, 0], centros[:, 1], LAGO)
+
+def _islas_desde_componentes(stats, centroids, pixeles_min, pixeles_max):
+    area = stats[1:, cv2.CC_STAT_AREA]
+    validas = (pixeles_min <= area) & (area <= pixeles_max)
+    centros = _en_orden_raster(centroids[1:][validas].astype(np.int32))
+    return crear_minucias(centros[:, 0], centros[:, 1], ISLA)
+
+def detectar_lagos(esqueleto, area_min=5, area_max=150):
+    """
+    Detecta minucias de tipo lago: agujeros del esqueleto (contornos con padre)
+    cuya área está entre area_min y area_max. Devuelve un arreglo de minucias
+    con el centroide de cada lago, en orden raster.
+    """
+    contours, hierarchy = cv2.findContours(_a_uint8(esqueleto), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    return _lagos_desde_contornos(contours, hierarchy, area_min, area_max)
+
+def detectar_islas(esqueleto, pixeles_min=1, pixeles_max=10):
+    """
+    Detecta minucias de tipo isla/punto: componentes conectados del esqueleto
+    con entre pixeles_min y pixeles_max píxeles. Devuelve un arreglo de
+    minucias con el centroide de cada isla, en orden raster.
+    """
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(_a_uint8(esqueleto), 8, cv2.CV_32S)
+    return _islas_desde_componentes(stats, centroids, pixeles_min, pixeles_max)
+
+# ==============================
+# DETECTOR CONJUNTO
+# ==============================
+def detectar_minucias(esqueleto, area_min=5, area_max=150, pixeles_min=1, pixeles_max=10):
+    """
+    Detecta los cuatro tipos de minucia sobre un mismo esqueleto, que se
+    normaliza una sola vez: el Crossing Number da las terminaciones y
+    bifurcaciones, un findContours los lagos y un etiquetado de componentes
+    las islas. Devuelve lo mismo que concatenar extraer_minucias,
+    detectar_lagos y detectar_islas.
+    """
+    esqueleto_bool = np.asarray(esqueleto) > 0
+    esqueleto = esqueleto_bool.view(np.uint8) * np.uint8(255)
+    contours, hierarchy = cv2.findContours(esqueleto, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(esqueleto, 8, cv2.CV_32S)
+    return np.concatenate([
+        extraer_minucias(esqueleto_bool),
+        _lagos_desde_contornos(contours, hierarchy, area_min, area_max),
+        _islas_desde_componentes(stats, centroids, pixeles_min, pixeles_max),
+    ])
+
+# ==============================
+# ORIENTACIÓN Y CALIDAD
+# ==============================
+RADIO_VECINDAD = 7   # Vecindario del esqueleto alrededor de cada minucia: (2*RADIO+1) de lado
+# Densidad de esqueleto esperada en el vecindario de cada tipo, relativa a la
+# de la zona que lo rodea (un cuadrado del doble de lado): una terminación
+# tiene menos cresta que sus vecinas, una bifurcación o un lago más.
+DENSIDAD_RELATIVA = np.array([0.8, 1.15, 1.25, 0.65], dtype=np.float32)   # Por tipo: T, B, lago, isla
+CALIDAD_MINIMA = 0.3   # Umbral sugerido para filtrar_por_calidad
+
+def _vecindarios(esqueleto_bool, xs, ys, radio):
+    """Vecindarios de todas las minucias a la vez: arreglo (n, 2*radio+1, 2*radio+1), fuera de la imagen es fondo."""
+    P = np.pad(esqueleto_bool, radio)
+    lado = 2*radio + 1
+    return np.lib.stride_tricks.sliding_window_view(P, (lado, lado))[ys, xs]
+
+def orientar_y_calificar(minucias, esqueleto, img_gray=None, radio=RADIO_VECINDAD):
+    """
+    Devuelve una copia de las minucias con su ángulo y su calidad, calculados
+    para todas a la vez:
+      - La orientación de la cresta sale del campo por bloques (realce.py),
+        de la imagen en grises si se pasa o, si no, del propio esqueleto.
+        El campo no cambia con el brillo ni el contraste, así que la imagen
+        no se normaliza: cada bloque depende solo de sus píxeles y de los
+        bloques vecinos, y un mosaico alineado a la grilla de bloques da
+        los mismos valores que la imagen completa (mosaico.py).
+      - Terminaciones y bifurcaciones toman el sentido de esa orientación
+        con su vecindario: la terminación apunta hacia donde no hay cresta y
+        la bifurcación hacia donde se abren las ramas. Lagos e islas quedan
+        con la orientación de la cresta, en [0, pi).
+      - La calidad es la coherencia del campo en el bloque de la minucia por
+        lo regular de su vecindario: su densidad de esqueleto frente a la
+        esperada para su tipo en la zona que lo rodea (DENSIDAD_RELATIVA).
+        Solo se usan datos locales, así que la calidad de una minucia no
+        depende del resto de la imagen; los vecindarios cortados por el
+        borde o con crestas ruidosas quedan con calidad baja.
+    En una imagen con algún lado menor que BLOQUE no hay ningún bloque
+    completo: ángulo y calidad quedan en NaN.
+    """
+    minucias = minucias.copy()
+    esqueleto_bool = np.asarray(esqueleto) > 0
+    if len(minucias) == 0 or min(esqueleto_bool.shape) < BLOQUE:
+        return minucias
+    fuente = esqueleto_bool.view(np.uint8) if img_gray is None else img_gray
+    orientacion, coherencia = campo_orientacion(np.asarray(fuente, dtype=np.float32))
+    xs, ys = minucias["x"], minucias["y"]
+    bx = np.minimum(xs // BLOQUE, orientacion.shape[1] - 1)
+    by = np.minimum(ys // BLOQUE, orientacion.shape[0] - 1)
+    theta = orientacion[by, bx]
+
+    vecindarios = _vecindarios(esqueleto_bool, xs, ys, radio)
+    dy, dx = np.mgrid[-radio:radio+1, -radio:radio+1]
+    pixeles = vecindarios.sum(axis=(1, 2))
+    # Centroide del esqueleto vecino, relativo a la minucia
+    cx = (vecindarios * dx).sum(axis=(1, 2)) / np.maximum(pixeles, 1)
+    cy = (vecindarios * dy).sum(axis=(1, 2)) / np.maximum(pixeles, 1)
+    # Sentido de la orientación: contra el centroide en las terminaciones, hacia él en las bifurcaciones
+    hacia_centroide = np.cos(theta) * cx + np.sin(theta) * cy
+    signo = np.where(minucias["tipo"] == TERMINACION, -1, 1)
+    angulo = np.where(hacia_centroide * signo < 0, theta + np.pi, theta)
+    con_sentido = minucias["tipo"] <= BIFURCACION
+    minucias["angulo"] = np.where(con_sentido, np.mod(angulo, 2*np.pi), theta)
+
+    densidad = pixeles / float((2*radio + 1) ** 2)
+    zona = _vecindarios(esqueleto_bool, xs, ys, 2*radio).mean(axis=(1, 2))
+    esperada = np.maximum(DENSIDAD_RELATIVA[minucias["tipo"]] * zona, 1e-6)
+    regularidad = np.clip(1 - np.abs(densidad - esperada) / esperada, 0, 1)
+    minucias["calidad"] = coherencia[by, bx] * regularidad
+    return minucias
+
+def filtrar_por_calidad(minucias, minima=CALIDAD_MINIMA):
+    """Descarta las minucias con calidad menor que `minima` (las que no tienen calidad se conservan)."""
+    return minucias[~(minucias["calidad"] < minima)]
@@ -0,0 +1,120 @@
+"""
+Análisis por mosaicos para imágenes muy grandes (palmas, fichas decadactilares).
+
+La imagen se recorre en mosaicos de tam x tam píxeles. Cada mosaico se
+analiza junto con un margen (halo) de píxeles vecinos, y de su resultado solo
+se conservan las minucias que caen en el mosaico: así cada minucia pertenece
+a un único mosaico y las costuras no duplican ni pierden minucias. Con un
+halo mayor que el alcance de cada etapa, el resultado es el mismo que el de
+analizar la imagen completa (posición, tipo, ángulo y calidad, y en el
+mismo orden):
+  - En Zhang-Suen y Guo-Hall cada iteración propaga cambios un píxel, así
+    que bastan unas pocas decenas de píxeles. El adelgazamiento por tabla
+    recorre la imagen en orden raster y sus eliminaciones se pueden
+    encadenar a cualquier distancia: usa un halo mayor, pero junto a las
+    costuras puede dar algunas minucias distintas.
+  - El campo de orientación (ángulo y calidad) se suaviza sobre varios
+    bloques vecinos: el halo cubre HALO_ORIENTACION y cada ventana empieza
+    en la grilla de bloques de la imagen completa.
+  - El umbral de Otsu depende de toda la imagen, así que se calcula antes
+    con el histograma acumulado de los mosaicos. Los umbrales locales
+    (Sauvola, Niblack) solo miran su ventana: el halo crece en media ventana.
+
+El realce, la segmentación y la depuración (que arma la región de la huella
+con todo el esqueleto) dependen de la imagen entera y no se pueden aplicar
+por mosaicos. La memoria usada depende del tamaño del mosaico y no del de
+la imagen, siempre que la fuente se pueda leer por partes (un arreglo
+mapeado en memoria, como los .npy abiertos con abrir_imagen).
+"""
+import numpy as np
+import cv2
+from analisis import analizar_huella, completar_parametros
+from minucias import DTYPE_MINUCIA, LAGO
+from realce import BLOQUE
+
+TAM_MOSAICO = 512
+# Halo por defecto según el adelgazamiento
+HALO = {"zhangsuen": 32, "guohall": 32, "tabla": 128}
+# Alcance del campo de orientación: el suavizado gaussiano (4 bloques) más el bloque del borde
+HALO_ORIENTACION = 5 * BLOQUE
+
+def abrir_imagen(ruta):
+    """Abre una imagen en escala de grises; los .npy se mapean en memoria en lugar de leerse."""
+    if ruta.lower().endswith(".npy"):
+        return np.load(ruta, mmap_mode="r")
+    img = cv2.imread(ruta, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError("no se pudo leer la imagen")
+    return img
+
+def mosaicos(alto, ancho, tam=TAM_MOSAICO):
+    """Recorre los mosaicos en orden raster como (fila_ini, fila_fin, col_ini, col_fin)."""
+    for y0 in range(0, alto, tam):
+        for x0 in range(0, ancho, tam):
+            yield y0, min(y0 + tam, alto), x0, min(x0 + tam, ancho)
+
+def umbral_otsu(histograma):
+    """Umbral de Otsu a partir de un histograma de 256 niveles, igual al que calcula cv2.threshold."""
+    p = histograma.astype(np.float64) / histograma.sum()
+    niveles = np.arange(256)
+    q1 = np.cumsum(p)
+    q2 = 1 - q1
+    suma1 = np.cumsum(niveles * p)
+    mu = suma1[-1]
+    eps = np.finfo(np.float32).eps
+    validos = (np.minimum(q1, q2) >= eps) & (np.maximum(q1, q2) <= 1 - eps)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mu1 = suma1 / q1
+        mu2 = (mu - q1*mu1) / q2
+        sigma = np.where(validos, q1*q2*(mu1 - mu2)**2, 0)
+    # cv2 se queda con el primer máximo estricto y devuelve 0 si ninguno supera 0
+    return int(np.argmax(sigma)) if sigma.max() > 0 else 0
+
+def histograma(fuente, tam=TAM_MOSAICO):
+    """Histograma de niveles de gris de la fuente, leída mosaico por mosaico."""
+    total = np.zeros(256, dtype=np.int64)
+    for y0, y1, x0, x1 in mosaicos(*fuente.shape, tam):
+        total += np.bincount(np.asarray(fuente[y0:y1, x0:x1], dtype=np.uint8).ravel(), minlength=256)
+    return total
+
+def analizar_por_mosaicos(fuente, parametros=None, tam=TAM_MOSAICO, halo=None, esqueleto=None):
+    """
+    Analiza `fuente` (arreglo 2-D uint8, puede estar mapeado en memoria) por
+    mosaicos y devuelve sus minucias (DTYPE_MINUCIA) en el mismo orden que
+    analizar_huella: terminaciones y bifurcaciones en orden raster, y luego
+    lagos e islas, cada grupo en orden raster.
+    Si se pasa `esqueleto` (un arreglo uint8 del mismo tamaño, por ejemplo un
+    np.memmap de escritura), también se escribe ahí el esqueleto.
+    """
+    p = completar_parametros(parametros)
+    if p["realce"]:
+        raise ValueError("El realce normaliza con estadísticas de toda la imagen; no se puede aplicar por mosaicos")
+    if p["segmentacion"]:
+        raise ValueError("La segmentación compara bloques de toda la imagen; no se puede aplicar por mosaicos")
+    if p["depuracion"]:
+        raise ValueError("La depuración arma la región de la huella con todo el esqueleto; no se puede aplicar por mosaicos")
+    if halo is None:
+        halo = max(HALO[p["adelgazamiento"]], HALO_ORIENTACION)
+        if p["binarizacion"] != "global":
+            halo += p["ventana"] // 2
+    alto, ancho = fuente.shape
+    if p["binarizacion"] == "global" and p["umbral"] is None:
+        p["umbral"] = umbral_otsu(histograma(fuente, tam))
+
+    partes = []
+    for y0, y1, x0, x1 in mosaicos(alto, ancho, tam):
+        # La ventana empieza en la grilla de bloques del campo de orientación
+        a0, a1 = max((y0 - halo) // BLOQUE * BLOQUE, 0), min(y1 + halo, alto)
+        b0, b1 = max((x0 - halo) // BLOQUE * BLOQUE, 0), min(x1 + halo, ancho)
+        resultado = analizar_huella(np.asarray(fuente[a0:a1, b0:b1], dtype=np.uint8), p)
+        m = resultado["minucias"]
+        m["x"] += b0
+        m["y"] += a0
+        partes.append(m[(y0 <= m["y"]) & (m["y"] < y1) & (x0 <= m["x"]) & (m["x"] < x1)])
+        if esqueleto is not None:
+            esqueleto[y0:y1, x0:x1] = resultado["esqueleto"][y0-a0:y1-a0, x0-b0:x1-b0]
+
+    minucias = np.concatenate(partes) if partes else np.zeros(0, dtype=DTYPE_MINUCIA)
+    # Terminaciones y bifurcaciones mezcladas (como en el análisis completo); lagos e islas aparte
+    grupo = np.where(minucias["tipo"] >= LAGO, minucias["tipo"], 0)
+    return minucias[np.lexsort((minucias["x"], minucias["y"], grupo))]
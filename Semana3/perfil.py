@@ -0,0 +1,124 @@
+"""
+Medición de tiempos por etapa del análisis.
+
+Un Perfil guarda un registro por etapa ejecutada:
+
+    {"etapa": "adelgazado", "ms": 12.3, "forma": [256, 256], "bytes": 65536}
+
+y, si se pide, también los bytes asignados durante la etapa (tracemalloc, que
+también ve las asignaciones de NumPy) y un cProfile de las etapas elegidas.
+Sin perfil se usa SIN_PERFIL, cuyas operaciones llaman directamente a la
+función medida: el costo cuando está desactivado es una llamada más.
+"""
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+import numpy as np
+
+def _describir(resultado):
+    """Forma y bytes de los arreglos de NumPy de un resultado (o de una tupla de resultados)."""
+    arreglos = resultado if isinstance(resultado, (tuple, list)) else (resultado,)
+    arreglos = [a for a in arreglos if isinstance(a, np.ndarray)]
+    if not arreglos:
+        return {}
+    return {"forma": list(arreglos[0].shape), "bytes": int(sum(a.nbytes for a in arreglos))}
+
+class Perfil:
+    def __init__(self, memoria=False, cprofile=()):
+        self.memoria = memoria
+        self.cprofile = set(cprofile)   # Etapas que se ejecutan dentro de cProfile
+        self.registros = []
+        self.estadisticas = {}          # etapa -> texto de pstats
+
+    def reiniciar(self):
+        self.registros = []
+        self.estadisticas = {}
+
+    def _ejecutar(self, etapa, funcion, args, kwargs):
+        if self.memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+        # En un generador el nombre de la etapa se conoce al terminar: se perfila
+        # cada paso y solo se guardan las estadísticas de las etapas pedidas
+        perfilar = etapa in self.cprofile if etapa is not None else bool(self.cprofile)
+        perfilador = cProfile.Profile() if perfilar else None
+        inicio = time.perf_counter()
+        if perfilador is not None:
+            resultado = perfilador.runcall(funcion, *args, **kwargs)
+        else:
+            resultado = funcion(*args, **kwargs)
+        registro = {"etapa": etapa, "ms": round((time.perf_counter() - inicio) * 1000, 3)}
+        registro.update(_describir(resultado))
+        if self.memoria:
+            registro["asignados"] = tracemalloc.get_traced_memory()[1] - memoria_inicial
+        return resultado, registro, perfilador
+
+    def _guardar_estadisticas(self, etapa, perfilador):
+        if perfilador is not None and etapa in self.cprofile:
+            texto = io.StringIO()
+            pstats.Stats(perfilador, stream=texto).sort_stats("cumulative").print_stats(15)
+            self.estadisticas[etapa] = texto.getvalue()
+
+    def medir(self, etapa, funcion, *args, **kwargs):
+        """Ejecuta funcion(*args, **kwargs) registrando su tiempo y el tamaño del resultado."""
+        resultado, registro, perfilador = self._ejecutar(etapa, funcion, args, kwargs)
+        self._guardar_estadisticas(etapa, perfilador)
+        self.registros.append(registro)
+        return resultado
+
+    def etapas(self, pipeline):
+        """
+        Envuelve un generador de etapas (nombre, resultado) y mide cada una.
+        El generador puede correr en otro hilo (TrabajadorPipeline): como los
+        registros van a este Perfil, cada análisis debe usar uno nuevo.
+        """
+        iterador = iter(pipeline)
+        while True:
+            try:
+                (nombre, resultado), registro, perfilador = self._ejecutar(None, next, (iterador,), {})
+            except StopIteration:
+                return
+            # El nombre de la etapa se conoce recién cuando termina
+            registro["etapa"] = nombre
+            registro.update(_describir(resultado))
+            self._guardar_estadisticas(nombre, perfilador)
+            self.registros.append(registro)
+            yield nombre, resultado
+
+    def envolver(self, prefijo, funcion):
+        """Devuelve funcion(numero, nombre, resultado) medida como la etapa '<prefijo> <nombre>'."""
+        def medida(numero, nombre, resultado):
+            return self.medir(f"{prefijo} {nombre}", funcion, numero, nombre, resultado)
+        return medida
+
+    def total_ms(self):
+        return sum(r["ms"] for r in self.registros)
+
+    def resumen(self):
+        """Texto corto para una barra de estado."""
+        partes = [f"{r['etapa']} {r['ms']:.1f} ms" for r in self.registros]
+        return "  |  ".join(partes + [f"total {self.total_ms():.1f} ms"])
+
+class _SinPerfil:
+    """Perfil desactivado: no mide ni guarda nada."""
+    registros = ()
+    estadisticas = {}
+
+    def reiniciar(self):
+        pass
+
+    def medir(self, etapa, funcion, *args, **kwargs):
+        return funcion(*args, **kwargs)
+
+    def etapas(self, pipeline):
+        return pipeline
+
+    def envolver(self, prefijo, funcion):
+        return funcion
+
+SIN_PERFIL = _SinPerfil()
@@ -0,0 +1,188 @@
+"""
+Formato binario de plantillas de minucias.
+
+Un archivo de galería guarda muchas plantillas (una por huella) con registros
+de tamaño fijo y orden de bytes little-endian:
+
+    cabecera (64 bytes)   DTYPE_CABECERA
+    minucias              DTYPE_REGISTRO x n_minucias, de todas las plantillas seguidas
+    índice                DTYPE_INDICE x n_plantillas, al final del archivo
+
+El índice va al final para poder escribir la galería en un solo recorrido,
+sin conocer de antemano cuántas plantillas tendrá. La lectura mapea el
+archivo en memoria (np.memmap): abrir una galería de millones de plantillas
+no crea objetos de Python por plantilla ni lee las minucias hasta que se usan.
+"""
+import numpy as np
+from minucias import crear_minucias
+
+MAGICO = b"MINUCIAS"
+VERSION = 1
+
+DTYPE_CABECERA = np.dtype([
+    ("magico", "S8"),
+    ("version", "<u2"),
+    ("tam_registro", "<u2"),
+    ("reservado", "<u4"),
+    ("n_plantillas", "<u8"),
+    ("n_minucias", "<u8"),
+    ("offset_indice", "<u8"),
+    ("relleno", "V24"),
+])
+
+# Una minucia en disco: 8 bytes. El ángulo se cuantiza en 65535 pasos de
+# [0, 2*pi); ANGULO_DESCONOCIDO marca las minucias sin ángulo calculado. La
+# calidad se cuantiza en 1..255; CALIDAD_DESCONOCIDA (0) marca las que no la tienen.
+DTYPE_REGISTRO = np.dtype([
+    ("x", "<u2"),
+    ("y", "<u2"),
+    ("angulo", "<u2"),
+    ("tipo", "u1"),
+    ("calidad", "u1"),
+])
+ANGULO_DESCONOCIDO = 0xFFFF
+CALIDAD_DESCONOCIDA = 0
+MAX_COORDENADA = 0xFFFF   # x, y, ancho y alto van en 16 bits
+
+DTYPE_INDICE = np.dtype([
+    ("id", "<u8"),
+    ("inicio", "<u8"),     # Posición de la primera minucia (en registros)
+    ("cantidad", "<u4"),
+    ("ancho", "<u2"),
+    ("alto", "<u2"),
+])
+
+# ==============================
+# CONVERSIÓN ENTRE MINUCIAS Y REGISTROS
+# ==============================
+def a_registros(minucias):
+    """Convierte un arreglo DTYPE_MINUCIA en registros de disco."""
+    registros = np.zeros(len(minucias), dtype=DTYPE_REGISTRO)
+    registros["x"] = minucias["x"]
+    registros["y"] = minucias["y"]
+    registros["tipo"] = minucias["tipo"]
+    angulo = minucias["angulo"].astype(np.float64)
+    conocido = np.isfinite(angulo)
+    cuantizado = np.round(np.mod(angulo[conocido], 2*np.pi) / (2*np.pi) * ANGULO_DESCONOCIDO)
+    registros["angulo"] = ANGULO_DESCONOCIDO
+    registros["angulo"][conocido] = np.mod(cuantizado, ANGULO_DESCONOCIDO)
+    calidad = minucias["calidad"].astype(np.float64)
+    conocida = np.isfinite(calidad)
+    registros["calidad"] = CALIDAD_DESCONOCIDA
+    registros["calidad"][conocida] = 1 + np.round(np.clip(calidad[conocida], 0, 1) * 254)
+    return registros
+
+def desde_registros(registros):
+    """Convierte registros de disco (o una vista mapeada) en un arreglo DTYPE_MINUCIA."""
+    angulo = registros["angulo"].astype(np.float32) * np.float32(2*np.pi / ANGULO_DESCONOCIDO)
+    angulo[registros["angulo"] == ANGULO_DESCONOCIDO] = np.nan
+    calidad = (registros["calidad"].astype(np.float32) - 1) / np.float32(254)
+    calidad[registros["calidad"] == CALIDAD_DESCONOCIDA] = np.nan
+    return crear_minucias(registros["x"], registros["y"], registros["tipo"], angulo, calidad)
+
+# ==============================
+# ESCRITURA
+# ==============================
+class EscritorGaleria:
+    """
+    Escribe plantillas a medida que llegan:
+
+        with EscritorGaleria("galeria.min") as galeria:
+            galeria.agregar(minucias, ancho, alto)
+    """
+    def __init__(self, ruta):
+        self.archivo = open(ruta, "wb")
+        self.archivo.write(np.zeros(1, dtype=DTYPE_CABECERA).tobytes()) # Se completa al cerrar
+        self.indice = []
+        self.n_minucias = 0
+
+    def agregar(self, minucias, ancho, alto, id=None):
+        """
+        Agrega una plantilla y devuelve su id (por defecto, su posición en la
+        galería). Lanza ValueError si la imagen o alguna coordenada no entra
+        en 16 bits (MAX_COORDENADA).
+        """
+        if not (0 <= ancho <= MAX_COORDENADA and 0 <= alto <= MAX_COORDENADA):
+            raise ValueError(f"Imagen de {ancho}x{alto}: el formato admite hasta {MAX_COORDENADA} píxeles por lado")
+        if len(minucias) and not (0 <= min(minucias["x"].min(), minucias["y"].min())
+                                  and max(minucias["x"].max(), minucias["y"].max()) <= MAX_COORDENADA):
+            raise ValueError(f"Minucias fuera de 0..{MAX_COORDENADA}: el formato las guarda en 16 bits")
+        if id is None:
+            id = len(self.indice)
+        self.archivo.write(a_registros(minucias).tobytes())
+        self.indice.append((id, self.n_minucias, len(minucias), ancho, alto))
+        self.n_minucias += len(minucias)
+        return id
+
+    def cerrar(self):
+        if self.archivo.closed:
+            return
+        offset_indice = self.archivo.tell()
+        self.archivo.write(np.array(self.indice, dtype=DTYPE_INDICE).tobytes())
+        cabecera = np.zeros(1, dtype=DTYPE_CABECERA)
+        cabecera["magico"] = MAGICO
+        cabecera["version"] = VERSION
+        cabecera["tam_registro"] = DTYPE_REGISTRO.itemsize
+        cabecera["n_plantillas"] = len(self.indice)
+        cabecera["n_minucias"] = self.n_minucias
+        cabecera["offset_indice"] = offset_indice
+        self.archivo.seek(0)
+        self.archivo.write(cabecera.tobytes())
+        self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+def guardar_plantilla(ruta, minucias, ancho, alto):
+    """Guarda una sola plantilla (una galería de una plantilla)."""
+    with EscritorGaleria(ruta) as galeria:
+        galeria.agregar(minucias, ancho, alto)
+
+# ==============================
+# LECTURA
+# ==============================
+class Galeria:
+    """
+    Galería mapeada en memoria. galeria[k] devuelve la vista (sin copia) de
+    los registros de la plantilla k; galeria.minucias(k) la convierte en un
+    arreglo DTYPE_MINUCIA. Todas las minucias están en galeria.registros.
+    """
+    def __init__(self, ruta):
+        cabecera = np.fromfile(ruta, dtype=DTYPE_CABECERA, count=1)
+        if len(cabecera) == 0 or cabecera["magico"][0] != MAGICO:
+            raise ValueError(f"{ruta} no es una galería de minucias")
+        if cabecera["version"][0] != VERSION or cabecera["tam_registro"][0] != DTYPE_REGISTRO.itemsize:
+            raise ValueError(f"Versión de galería no soportada: {cabecera['version'][0]}")
+        self.ruta = ruta
+        n_plantillas = int(cabecera["n_plantillas"][0])
+        n_minucias = int(cabecera["n_minucias"][0])
+        offset_indice = int(cabecera["offset_indice"][0])
+        self.indice = self._mapear(DTYPE_INDICE, offset_indice, n_plantillas)
+        self.registros = self._mapear(DTYPE_REGISTRO, DTYPE_CABECERA.itemsize, n_minucias)
+
+    def _mapear(self, dtype, offset, cantidad):
+        # np.memmap no acepta arreglos vacíos
+        if cantidad == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.ruta, dtype=dtype, mode="r", offset=offset, shape=(cantidad,))
+
+    def __len__(self):
+        return len(self.indice)
+
+    def __getitem__(self, k):
+        inicio = int(self.indice["inicio"][k])
+        return self.registros[inicio:inicio + int(self.indice["cantidad"][k])]
+
+    def minucias(self, k):
+        return desde_registros(self[k])
+
+    def plantilla_de_minucia(self):
+        """Número de plantilla de cada registro, útil para búsquedas vectorizadas."""
+        return np.repeat(np.arange(len(self)), self.indice["cantidad"])
+
+def cargar_plantilla(ruta):
+    """Lee la primera plantilla de un archivo como arreglo DTYPE_MINUCIA."""
+    return Galeria(ruta).minucias(0)
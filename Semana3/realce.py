@@ -0,0 +1,145 @@
+"""
+Realce de crestas con filtros de Gabor orientados.
+
+1. La imagen se normaliza (media 0, desviación 1).
+2. Campo de orientación por bloques: gradientes de Sobel sumados en cada
+   bloque (método de los mínimos cuadrados) y suavizados como vector de
+   ángulo doble.
+3. Frecuencia de las crestas por bloque: pico del espectro (FFT) de una
+   ventana alrededor del bloque, todas las ventanas a la vez.
+4. Cada bloque se filtra con el Gabor de su orientación y frecuencia. Los
+   filtros se cuantizan en ORIENTACIONES x PERIODOS y su FFT se calcula una
+   sola vez (caché); los bloques con el mismo filtro se filtran juntos con FFT.
+
+El resultado es una imagen uint8 con crestas oscuras sobre fondo claro, lista
+para binarizar igual que la original.
+"""
+from functools import lru_cache
+
+import numpy as np
+import cv2
+
+BLOQUE = 16
+ORIENTACIONES = 16                 # Orientaciones del banco de filtros en [0, pi)
+PERIODOS = np.arange(4, 17)        # Periodos de cresta del banco, en píxeles
+VENTANA_FRECUENCIA = 32            # Lado de la ventana para estimar la frecuencia
+SIGMA = 4.0                        # Desviación de la gaussiana de los filtros
+FONDO = 0.25                       # Desvío local, relativo al de las zonas con crestas, bajo el cual hay fondo
+RADIO = int(3 * SIGMA)             # Los filtros miden 2*RADIO + 1 de lado
+_LADO = BLOQUE + 2 * RADIO         # Lado de cada retazo filtrado con FFT
+
+def normalizar(img):
+    img = np.asarray(img, dtype=np.float32)
+    return (img - img.mean()) / max(float(img.std()), 1e-6)
+
+def _por_bloques(M, bloque):
+    """Suma de M en bloques de bloque x bloque (los bordes sobrantes se descartan)."""
+    f, c = M.shape[0] // bloque, M.shape[1] // bloque
+    return M[:f*bloque, :c*bloque].reshape(f, bloque, c, bloque).sum(axis=(1, 3))
+
+def campo_orientacion(normalizada, bloque=BLOQUE, suavizado=1.0):
+    """
+    Orientación de las crestas por bloque, en [0, pi) (0 = crestas horizontales),
+    y su coherencia en [0, 1] (1 = crestas paralelas bien definidas).
+    """
+    gx = cv2.Sobel(normalizada, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(normalizada, cv2.CV_32F, 0, 1, ksize=3)
+    gxx = _por_bloques(gx * gx, bloque)
+    gyy = _por_bloques(gy * gy, bloque)
+    gxy = _por_bloques(gx * gy, bloque)
+    # Vector de ángulo doble del gradiente; las crestas son perpendiculares a él
+    coseno, seno = gxx - gyy, 2 * gxy
+    if suavizado:
+        coseno = cv2.GaussianBlur(coseno, (0, 0), suavizado)
+        seno = cv2.GaussianBlur(seno, (0, 0), suavizado)
+    energia = cv2.GaussianBlur(gxx + gyy, (0, 0), suavizado) if suavizado else gxx + gyy
+    coherencia = np.hypot(coseno, seno) / np.maximum(energia, 1e-6)
+    orientacion = np.mod(0.5 * np.arctan2(seno, coseno) + np.pi / 2, np.pi)
+    return orientacion, np.clip(coherencia, 0, 1)
+
+def frecuencia_crestas(normalizada, bloque=BLOQUE, ventana=VENTANA_FRECUENCIA):
+    """
+    Periodo de las crestas por bloque (en píxeles), a partir del pico del
+    espectro de una ventana centrada en cada bloque. Los bloques sin un pico
+    claro dentro de PERIODOS reciben la mediana de los demás.
+    """
+    f, c = normalizada.shape[0] // bloque, normalizada.shape[1] // bloque
+    margen = (ventana - bloque) // 2
+    P = np.pad(normalizada, margen, mode="reflect")
+    # Todas las ventanas como un arreglo (f, c, ventana, ventana) sin copiar
+    ventanas = np.lib.stride_tricks.sliding_window_view(P, (ventana, ventana))[::bloque, ::bloque][:f, :c]
+    hann = np.outer(np.hanning(ventana), np.hanning(ventana)).astype(np.float32)
+    espectro = np.abs(np.fft.rfft2(ventanas * hann))
+    fy = np.fft.fftfreq(ventana)[:, None]
+    fx = np.fft.rfftfreq(ventana)[None, :]
+    radio = np.hypot(fx, fy)
+    banda = (radio >= 1 / PERIODOS[-1]) & (radio <= 1 / PERIODOS[0])
+    espectro = np.where(banda, espectro, 0).reshape(f, c, -1)
+    pico = espectro.argmax(axis=2)
+    # Un pico claro sobresale del promedio de la banda
+    claro = espectro.max(axis=2) > 3 * espectro.sum(axis=2) / banda.sum()
+    periodo = 1 / radio.ravel()[pico]
+    if claro.any():
+        periodo[~claro] = np.median(periodo[claro])
+    else:
+        periodo[:] = np.median(PERIODOS)
+    return periodo
+
+@lru_cache(maxsize=None)
+def filtro_gabor(orientacion, periodo, sigma=SIGMA, radio=RADIO):
+    """Filtro de Gabor par para crestas con esa orientación (índice del banco) y periodo."""
+    theta = orientacion * np.pi / ORIENTACIONES
+    y, x = np.mgrid[-radio:radio+1, -radio:radio+1].astype(np.float64)
+    # Coordenada perpendicular a las crestas
+    u = -x * np.sin(theta) + y * np.cos(theta)
+    kernel = np.exp(-(x**2 + y**2) / (2 * sigma**2)) * np.cos(2 * np.pi * u / periodo)
+    kernel -= kernel.mean()    # Sin componente continua: una zona uniforme da 0
+    return kernel.astype(np.float32)
+
+@lru_cache(maxsize=None)
+def _fft_filtro(orientacion, periodo):
+    # El filtro centrado en el origen de un retazo de _LADO x _LADO
+    K = np.zeros((_LADO, _LADO), dtype=np.float32)
+    k = filtro_gabor(orientacion, periodo)
+    K[:k.shape[0], :k.shape[1]] = k
+    return np.fft.rfft2(np.roll(K, (-RADIO, -RADIO), axis=(0, 1)))
+
+def realzar(img_gray, bloque=BLOQUE):
+    """Devuelve la imagen realzada (uint8, crestas oscuras, mismo tamaño)."""
+    if bloque != BLOQUE:
+        raise ValueError(f"El banco de filtros está calculado para bloques de {BLOQUE}")
+    img_gray = np.asarray(img_gray, dtype=np.uint8)
+    alto, ancho = img_gray.shape
+    normalizada = normalizar(img_gray)
+    orientacion, coherencia = campo_orientacion(normalizada)
+    periodo = frecuencia_crestas(normalizada)
+    f, c = orientacion.shape
+    indice_o = np.round(orientacion / np.pi * ORIENTACIONES).astype(int) % ORIENTACIONES
+    indice_p = np.clip(np.round(periodo).astype(int), PERIODOS[0], PERIODOS[-1])
+
+    # Retazos de cada bloque con RADIO píxeles de contexto
+    P = np.pad(normalizada, ((RADIO, RADIO + BLOQUE), (RADIO, RADIO + BLOQUE)), mode="reflect")
+    retazos = np.lib.stride_tricks.sliding_window_view(P, (_LADO, _LADO))[::BLOQUE, ::BLOQUE]
+    f, c = -(-alto // BLOQUE), -(-ancho // BLOQUE)
+    retazos = retazos[:f, :c]
+    # Los bloques del borde que no llegaron al campo usan el del bloque vecino
+    indice_o = np.pad(indice_o, ((0, f - indice_o.shape[0]), (0, c - indice_o.shape[1])), mode="edge")
+    indice_p = np.pad(indice_p, ((0, f - indice_p.shape[0]), (0, c - indice_p.shape[1])), mode="edge")
+
+    salida = np.zeros((f, c, BLOQUE, BLOQUE), dtype=np.float32)
+    # Todos los bloques que usan el mismo filtro se filtran juntos
+    clave = indice_o * (PERIODOS[-1] + 1) + indice_p
+    for k in np.unique(clave):
+        filas, columnas = np.nonzero(clave == k)
+        espectro = np.fft.rfft2(retazos[filas, columnas]) * _fft_filtro(int(k // (PERIODOS[-1] + 1)), int(k % (PERIODOS[-1] + 1)))
+        filtrados = np.fft.irfft2(espectro, s=(_LADO, _LADO))
+        salida[filas, columnas] = filtrados[:, RADIO:RADIO + BLOQUE, RADIO:RADIO + BLOQUE]
+    salida = salida.transpose(0, 2, 1, 3).reshape(f * BLOQUE, c * BLOQUE)[:alto, :ancho]
+
+    # La respuesta es negativa sobre las crestas (oscuras) y positiva en los valles
+    escala = max(float(np.percentile(np.abs(salida), 99)), 1e-6)
+    realzada = np.clip(128 + 127 * salida / escala, 0, 255).astype(np.uint8)
+    # Los bloques casi uniformes (fondo) quedan claros para que el umbral no los parta
+    desvio = np.sqrt(cv2.blur(normalizada**2, (BLOQUE, BLOQUE)) - cv2.blur(normalizada, (BLOQUE, BLOQUE))**2)
+    realzada[desvio < FONDO * np.percentile(desvio, 90)] = 255
+    return realzada
@@ -0,0 +1,73 @@
+"""
+Segmentación de la huella: separa la zona con crestas del fondo del escaneo.
+
+1. La imagen se divide en bloques y de cada uno se toma su media y su
+   desviación. Un bloque es de la huella si tiene contraste (desviación alta)
+   o si es claramente más oscuro que el fondo.
+2. La grilla de bloques se suaviza con un cierre y una apertura, se
+   rellenan los agujeros y se descartan las manchas de pocos bloques.
+3. La máscara de bloques se lleva a píxeles, junto con la caja que la
+   contiene.
+
+El análisis (analisis.py) recorta la imagen a la caja y pone en fondo los
+píxeles fuera de la máscara, así que las etapas siguientes no recorren los
+bordes vacíos del escaneo.
+"""
+import numpy as np
+import cv2
+
+BLOQUE = 16
+CONTRASTE = 0.2     # Desviación mínima de un bloque de huella, relativa a la de los bloques con más contraste
+OSCURIDAD = 0.5     # Cuánto más oscuro que el fondo debe ser un bloque sin contraste, relativo a la misma referencia
+BLOQUES_MIN = 4     # Manchas con menos bloques se descartan
+
+def _estadisticas_por_bloques(img, bloque):
+    """Media y desviación de cada bloque; los bloques incompletos del borde usan los píxeles que tienen."""
+    alto, ancho = img.shape
+    f, c = -(-alto // bloque), -(-ancho // bloque)
+    P = np.pad(img.astype(np.float32), ((0, f*bloque - alto), (0, c*bloque - ancho)), mode="edge")
+    bloques = P.reshape(f, bloque, c, bloque)
+    return bloques.mean(axis=(1, 3)), bloques.std(axis=(1, 3))
+
+def _rellenar(mascara):
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    relleno = np.zeros_like(mascara)
+    cv2.drawContours(relleno, contornos, -1, 1, thickness=cv2.FILLED)
+    return relleno
+
+def mascara_huella(img_gray, bloque=BLOQUE):
+    """Máscara (bool, del tamaño de la imagen) de la zona con crestas."""
+    img_gray = np.asarray(img_gray, dtype=np.uint8)
+    alto, ancho = img_gray.shape
+    media, desvio = _estadisticas_por_bloques(img_gray, bloque)
+    referencia = max(float(np.percentile(desvio, 99)), 1e-6)
+    fondo = float(np.percentile(media, 95))
+    huella = ((desvio >= CONTRASTE * referencia) | (fondo - media >= OSCURIDAD * referencia)).astype(np.uint8)
+
+    kernel = np.ones((3, 3), np.uint8)
+    huella = cv2.morphologyEx(huella, cv2.MORPH_CLOSE, kernel)
+    huella = cv2.morphologyEx(huella, cv2.MORPH_OPEN, kernel)
+    huella = _rellenar(huella)
+    n, etiquetas, stats, _ = cv2.connectedComponentsWithStats(huella, 4, cv2.CV_32S)
+    grandes = stats[:, cv2.CC_STAT_AREA] >= BLOQUES_MIN
+    grandes[0] = False
+    huella = grandes[etiquetas]
+
+    # Cada bloque pasa a bloque x bloque píxeles
+    return np.repeat(np.repeat(huella, bloque, axis=0), bloque, axis=1)[:alto, :ancho]
+
+def caja_mascara(mascara):
+    """Caja (fila_ini, fila_fin, col_ini, col_fin) que contiene la máscara; None si está vacía."""
+    filas = np.flatnonzero(mascara.any(axis=1))
+    if len(filas) == 0:
+        return None
+    columnas = np.flatnonzero(mascara.any(axis=0))
+    return int(filas[0]), int(filas[-1]) + 1, int(columnas[0]), int(columnas[-1]) + 1
+
+def segmentar(img_gray, bloque=BLOQUE):
+    """Devuelve (mascara, caja) de la huella; sin huella, la caja es la imagen entera."""
+    mascara = mascara_huella(img_gray, bloque)
+    caja = caja_mascara(mascara)
+    if caja is None:
+        return mascara, (0, mascara.shape[0], 0, mascara.shape[1])
+    return mascara, caja
@@ -0,0 +1,81 @@
+import queue
+import threading
+
+class TrabajadorPipeline:
+    """
+    Ejecuta las etapas de un análisis en un hilo secundario para no congelar
+    la ventana de Tk.
+
+    El pipeline es un generador que produce tuplas (nombre_etapa, resultado)
+    a medida que termina cada etapa. Los resultados se envían por una cola
+    segura entre hilos y el hilo de Tk la revisa con after(), así que los
+    callbacks siempre se ejecutan en el hilo de la interfaz.
+    """
+    def __init__(self, master, intervalo_ms=30):
+        self.master = master
+        self.intervalo_ms = intervalo_ms
+        self.cola = queue.Queue()
+        self._trabajo = 0            # Identificador del análisis en curso
+        self._cancelado = threading.Event()
+        self._callbacks = None
+        self._revision = None        # Llamada a after() pendiente
+
+    def iniciar(self, pipeline, al_terminar_etapa, al_terminar=None, al_fallar=None):
+        """
+        Lanza el generador `pipeline` en un hilo nuevo, cancelando el anterior.
+        - al_terminar_etapa(numero, nombre, resultado): se llama por cada etapa.
+        - al_terminar(): se llama cuando el pipeline termina sin errores.
+        - al_fallar(excepcion): se llama si alguna etapa lanza una excepción.
+        """
+        self.cancelar()
+        self._trabajo += 1
+        self._cancelado = threading.Event()
+        self._callbacks = (al_terminar_etapa, al_terminar, al_fallar)
+        hilo = threading.Thread(target=self._ejecutar, args=(pipeline, self._trabajo, self._cancelado), daemon=True)
+        hilo.start()
+        self._revision = self.master.after(self.intervalo_ms, self._revisar_cola)
+
+    def cancelar(self):
+        """Cancela el análisis en curso; sus resultados pendientes se descartan."""
+        self._cancelado.set()
+        self._callbacks = None
+        if self._revision is not None:
+            self.master.after_cancel(self._revision)
+            self._revision = None
+
+    def ocupado(self):
+        return self._callbacks is not None
+
+    def _ejecutar(self, pipeline, trabajo, cancelado):
+        # Se ejecuta en el hilo secundario: no debe tocar ningún widget de Tk
+        try:
+            for numero, (nombre, resultado) in enumerate(pipeline, start=1):
+                if cancelado.is_set():
+                    pipeline.close()
+                    return
+                self.cola.put((trabajo, "etapa", (numero, nombre, resultado)))
+            self.cola.put((trabajo, "fin", None))
+        except Exception as e:
+            self.cola.put((trabajo, "error", e))
+
+    def _revisar_cola(self):
+        self._revision = None
+        while True:
+            try:
+                trabajo, tipo, datos = self.cola.get_nowait()
+            except queue.Empty:
+                break
+            if trabajo != self._trabajo or self._callbacks is None:
+                continue # Mensaje de un análisis cancelado
+            al_terminar_etapa, al_terminar, al_fallar = self._callbacks
+            if tipo == "etapa":
+                al_terminar_etapa(*datos)
+            else:
+                self._callbacks = None
+                if tipo == "fin" and al_terminar is not None:
+                    al_terminar()
+                elif tipo == "error" and al_fallar is not None:
+                    al_fallar(datos)
+                return
+        if self._callbacks is not None and self._revision is None:
+            self._revision = self.master.after(self.intervalo_ms, self._revisar_cola)
@@ -0,0 +1,56 @@
+"""
+Umbrales locales (Niblack y Sauvola) calculados con imágenes integrales.
+
+El umbral de cada píxel depende de la media m y la desviación s de una
+ventana centrada en él:
+
+    Niblack:  T = m + k*s              (k negativo, típicamente -0.2)
+    Sauvola:  T = m * (1 + k*(s/R - 1)) (k positivo, típicamente 0.2; R = 128)
+
+Con las imágenes integrales de la imagen y de su cuadrado, la suma de
+cualquier ventana sale de cuatro lecturas, así que el costo por píxel no
+depende del tamaño de la ventana. En los bordes la ventana se recorta a la
+parte que cae dentro de la imagen.
+"""
+import numpy as np
+import cv2
+
+VENTANA = 31
+K_POR_DEFECTO = {"niblack": -0.2, "sauvola": 0.2}
+RANGO_DESVIO = 128   # R de Sauvola para imágenes de 8 bits
+
+def medias_locales(img, ventana=VENTANA):
+    """Media y desviación estándar de la ventana de ventana x ventana centrada en cada píxel."""
+    img = np.asarray(img, dtype=np.uint8)
+    alto, ancho = img.shape
+    r = ventana // 2
+    suma, suma2 = cv2.integral2(img, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    # Píxeles de la ventana recortada: (filas dentro) x (columnas dentro)
+    filas = np.clip(np.arange(alto) + r + 1, 0, alto) - np.clip(np.arange(alto) - r, 0, alto)
+    columnas = np.clip(np.arange(ancho) + r + 1, 0, ancho) - np.clip(np.arange(ancho) - r, 0, ancho)
+    area = np.outer(filas, columnas).astype(np.float64)
+
+    def _ventanas(S):
+        # Repetir el borde de la integral recorta la ventana y deja las cuatro lecturas como rebanadas
+        S = cv2.copyMakeBorder(S, r, r, r, r, cv2.BORDER_REPLICATE)
+        a = 2*r + 1
+        total = S[a:a+alto, a:a+ancho] - S[:alto, a:a+ancho]
+        total -= S[a:a+alto, :ancho]
+        total += S[:alto, :ancho]
+        return total / area
+
+    media = _ventanas(suma)
+    varianza = _ventanas(suma2)
+    varianza -= media * media
+    np.maximum(varianza, 0, out=varianza)
+    return media, np.sqrt(varianza, out=varianza)
+
+def umbral_local(img, metodo="sauvola", ventana=VENTANA, k=None):
+    """Umbral por píxel (arreglo float del tamaño de la imagen) con "niblack" o "sauvola"."""
+    if metodo not in K_POR_DEFECTO:
+        raise ValueError(f"Método de umbral local desconocido: {metodo}")
+    k = K_POR_DEFECTO[metodo] if k is None else k
+    media, desvio = medias_locales(img, ventana)
+    if metodo == "niblack":
+        return media + k * desvio
+    return media * (1 + k * (desvio / RANGO_DESVIO - 1))
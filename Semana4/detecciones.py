@@ -0,0 +1,106 @@
+"""
+Archivo columnar de detecciones por cuadro.
+
+Una salida es una carpeta con un archivo binario por columna (little-endian,
+sin cabecera) y un esquema.json con el tipo de cada columna y la cantidad de
+filas de cada tabla:
+
+    cuadros     una fila por cuadro procesado: cuadro, contornos, cajas, keypoints
+    cajas       una fila por caja de contorno: cuadro, x, y, ancho, alto, cx, cy,
+                y la pista que la sigue: id (-1 sin seguimiento), vx, vy (píxeles por cuadro)
+    keypoints   una fila por blob: cuadro, x, y, tam
+
+Las filas se agregan al final de cada archivo a medida que llegan, así que
+horas de video no se acumulan en memoria, y para leer basta mapear cada
+columna con np.memmap (leer_detecciones), sin cargar el archivo entero.
+"""
+import json
+import os
+
+import numpy as np
+
+VERSION = 2
+TABLAS = {
+    "cuadros": [("cuadro", "<u4"), ("contornos", "<u4"), ("cajas", "<u4"), ("keypoints", "<u4")],
+    "cajas": [("cuadro", "<u4"), ("x", "<i4"), ("y", "<i4"), ("ancho", "<i4"), ("alto", "<i4"),
+              ("cx", "<i4"), ("cy", "<i4"), ("id", "<i8"), ("vx", "<f4"), ("vy", "<f4")],
+    "keypoints": [("cuadro", "<u4"), ("x", "<f4"), ("y", "<f4"), ("tam", "<f4")],
+}
+FILAS_POR_BLOQUE = 65536   # Filas que se juntan en memoria antes de escribir
+
+def _ruta(carpeta, tabla, columna):
+    return os.path.join(carpeta, f"{tabla}.{columna}.bin")
+
+class EscritorDetecciones:
+    def __init__(self, carpeta, filas_por_bloque=FILAS_POR_BLOQUE):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self.filas_por_bloque = filas_por_bloque
+        self.filas = {tabla: 0 for tabla in TABLAS}
+        self._archivos = {(tabla, columna): open(_ruta(carpeta, tabla, columna), "wb")
+                          for tabla, columnas in TABLAS.items() for columna, _ in columnas}
+        self._pendientes = {tabla: [] for tabla in TABLAS}
+        self._filas_pendientes = 0
+
+    def agregar(self, cuadro, contornos, cajas, keypoints, ids=None, velocidades=None):
+        """
+        Agrega las detecciones de un cuadro: `cajas` es un arreglo (n, 4) de
+        x, y, ancho, alto y `keypoints` uno (m, 3) de x, y, tam. Con
+        seguimiento, `ids` y `velocidades` (n, 2) son los de la pista de cada caja.
+        """
+        cajas = np.asarray(cajas, dtype=np.int32).reshape(-1, 4)
+        keypoints = np.asarray(keypoints, dtype=np.float32).reshape(-1, 3)
+        ids = np.full(len(cajas), -1) if ids is None else ids
+        velocidades = np.zeros((len(cajas), 2)) if velocidades is None else np.asarray(velocidades).reshape(-1, 2)
+        x, y, w, h = cajas.T
+        self._pendientes["cuadros"].append((np.array([cuadro]), np.array([contornos]),
+                                            np.array([len(cajas)]), np.array([len(keypoints)])))
+        self._pendientes["cajas"].append((np.full(len(cajas), cuadro), x, y, w, h, x + w // 2, y + h // 2,
+                                          ids, *velocidades.T))
+        self._pendientes["keypoints"].append((np.full(len(keypoints), cuadro), *keypoints.T))
+        self._filas_pendientes += 1 + len(cajas) + len(keypoints)
+        if self._filas_pendientes >= self.filas_por_bloque:
+            self._volcar()
+
+    def _volcar(self):
+        for tabla, columnas in TABLAS.items():
+            bloques = self._pendientes[tabla]
+            if not bloques:
+                continue
+            for k, (columna, dtype) in enumerate(columnas):
+                valores = np.concatenate([b[k] for b in bloques]).astype(dtype)
+                valores.tofile(self._archivos[(tabla, columna)])
+            self.filas[tabla] += sum(len(b[0]) for b in bloques)
+            self._pendientes[tabla] = []
+        self._filas_pendientes = 0
+
+    def cerrar(self):
+        self._volcar()
+        for archivo in self._archivos.values():
+            archivo.close()
+        esquema = {"version": VERSION, "filas": self.filas,
+                   "tablas": {tabla: dict(columnas) for tabla, columnas in TABLAS.items()}}
+        with open(os.path.join(self.carpeta, "esquema.json"), "w") as f:
+            json.dump(esquema, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+def leer_detecciones(carpeta):
+    """Devuelve {tabla: {columna: arreglo}} con cada columna mapeada en memoria."""
+    with open(os.path.join(carpeta, "esquema.json")) as f:
+        esquema = json.load(f)
+    if esquema["version"] != VERSION:
+        raise ValueError(f"Versión de detecciones no soportada: {esquema['version']}")
+    tablas = {}
+    for tabla, columnas in esquema["tablas"].items():
+        filas = esquema["filas"][tabla]
+        tablas[tabla] = {
+            columna: (np.memmap(_ruta(carpeta, tabla, columna), dtype=dtype, mode="r", shape=(filas,))
+                      if filas else np.zeros(0, dtype=dtype))
+            for columna, dtype in columnas.items()
+        }
+    return tablas
@@ -0,0 +1,126 @@
+"""
+Flujo de video en tres etapas que corren a la vez:
+
+    captura (un hilo)  ->  procesamiento (pool de hilos)  ->  consumidor (quien itera)
+
+- La captura lee los cuadros en orden y ejecuta la parte que depende del
+  orden (por ejemplo, el modelo de fondo de MOG2); el resto del cuadro se
+  manda al pool.
+- Los cuadros enviados esperan en una cola acotada, en orden de captura: el
+  consumidor los recibe en ese orden aunque el pool los termine desordenados.
+- Con la cola llena, descartar=True tira el cuadro más viejo (fuentes en
+  vivo: siempre se procesa lo último) y descartar=False frena la captura
+  (archivos: no se pierde ningún cuadro).
+
+OpenCV libera el GIL en sus funciones, así que los hilos del pool procesan
+cuadros en paralelo de verdad.
+"""
+import collections
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class ColaAcotada:
+    """Cola de a lo sumo `tam` elementos; llena, descarta el más viejo o bloquea a quien agrega."""
+    def __init__(self, tam, descartar=False):
+        self.tam = tam
+        self.descartar = descartar
+        self._elementos = collections.deque()
+        self._cerrada = False
+        self._condicion = threading.Condition()
+
+    def poner(self, elemento):
+        """Agrega un elemento y devuelve el que se descartó para hacerle lugar (o None)."""
+        with self._condicion:
+            descartado = None
+            if self.descartar:
+                if len(self._elementos) >= self.tam:
+                    descartado = self._elementos.popleft()
+            else:
+                while len(self._elementos) >= self.tam and not self._cerrada:
+                    self._condicion.wait()
+            self._elementos.append(elemento)
+            self._condicion.notify_all()
+            return descartado
+
+    def sacar(self):
+        """Saca el elemento más viejo; espera si no hay. Devuelve None si la cola se cerró y quedó vacía."""
+        with self._condicion:
+            while not self._elementos and not self._cerrada:
+                self._condicion.wait()
+            if not self._elementos:
+                return None
+            elemento = self._elementos.popleft()
+            self._condicion.notify_all()
+            return elemento
+
+    def cerrar(self):
+        with self._condicion:
+            self._cerrada = True
+            self._condicion.notify_all()
+
+class FlujoVideo:
+    """
+    Recorre los cuadros de `captura` (un cv2.VideoCapture o cualquier objeto
+    con read()) y produce (indice, cuadro, resultado) en orden, donde:
+      - datos = en_orden(cuadro) se ejecuta en el hilo de captura, cuadro por cuadro;
+      - resultado = procesar(indice, cuadro, datos) se ejecuta en el pool.
+    Los índices de los cuadros descartados no aparecen; `descartados` los cuenta.
+    """
+    def __init__(self, captura, procesar, en_orden=None, hilos=None, tam_cola=8, descartar=False):
+        self.captura = captura
+        self.procesar = procesar
+        self.en_orden = en_orden
+        self.hilos = hilos or os.cpu_count() or 1
+        self.tam_cola = tam_cola
+        self.descartar = descartar
+        self.leidos = 0
+        self.descartados = 0
+        self._detenido = threading.Event()
+
+    def detener(self):
+        self._detenido.set()
+
+    def _capturar(self, pool, cola):
+        try:
+            while not self._detenido.is_set():
+                ok, cuadro = self.captura.read()
+                if not ok:
+                    break
+                indice = self.leidos
+                self.leidos += 1
+                datos = self.en_orden(cuadro) if self.en_orden is not None else None
+                futuro = pool.submit(self.procesar, indice, cuadro, datos)
+                descartado = cola.poner((indice, cuadro, futuro))
+                if descartado is not None:
+                    # Si el pool no lo empezó, ni se procesa
+                    descartado[2].cancel()
+                    self.descartados += 1
+        except Exception as e:
+            cola.poner((None, None, e))
+        finally:
+            cola.cerrar()
+
+    def __iter__(self):
+        self._detenido.clear()
+        cola = ColaAcotada(self.tam_cola, self.descartar)
+        with ThreadPoolExecutor(max_workers=self.hilos) as pool:
+            hilo = threading.Thread(target=self._capturar, args=(pool, cola), daemon=True)
+            hilo.start()
+            try:
+                while True:
+                    elemento = cola.sacar()
+                    if elemento is None:
+                        break
+                    indice, cuadro, futuro = elemento
+                    if indice is None:
+                        raise futuro       # Error en la captura
+                    yield indice, cuadro, futuro.result()
+            finally:
+                # También si el consumidor deja de iterar antes del final
+                self._detenido.set()
+                cola.cerrar()
+                hilo.join()
+                while (elemento := cola.sacar()) is not None:
+                    if elemento[0] is not None:
+                        elemento[2].cancel()
@@ -1,146 +1,305 @@
+"""
+Detección de burbujas en video con sustracción de fondo (MOG2), contornos y blobs.
+
+Ejemplos:
+    python pc1.py                                  # video1.avi en una ventana de pygame
+    python pc1.py 0                                # cámara web
+    python pc1.py video1.avi --sin-ventana -o detecciones/
+    python pc1.py video1.avi --escala 0.5 --refinar      # detecta a media resolución
+    python pc1.py video1.avi --roi 100,50,320,240        # solo en esa región (x,y,ancho,alto)
+
+Sin ventana no se usa pygame ni se limita la velocidad: el video se procesa
+tan rápido como se decodifica y, con -o, las cajas, centroides y blobs de
+cada cuadro se escriben en formato columnar (ver detecciones.py).
+
+Con --escala y --roi, el modelo de fondo y la detección corren sobre el
+cuadro reducido o recortado y las coordenadas vuelven al cuadro completo
+(ver region.py); --refinar rehace cada caja a resolución completa.
+"""
+import argparse
+import sys
+import threading
+import time
+
 import cv2
 import numpy as np
-import pygame
-import sys
+from flujo import FlujoVideo
+from detecciones import EscritorDetecciones
+from seguimiento import Seguidor, ASIGNACIONES
+from region import Region, leer_roi, refinar, ventana_escalada
 
 # ==============================
 # CONFIGURACIÓN INICIAL
 # ==============================
 VIDEO_PATH = "video1.avi"  # usa 0 si quieres cámara web
 MIN_CONTOUR_AREA = 6
+TAM_COLA = 8               # Cuadros en vuelo entre la captura y la pantalla
+UMBRAL_FONDO = 30          # Diferencia con el fondo de un píxel de burbuja al refinar
 
-# ------------------------------
-# Inicializar captura de video
-# ------------------------------
-cap = cv2.VideoCapture(VIDEO_PATH)
-ret, frame = cap.read()
-if not ret:
-    print("No se pudo abrir el video.")
-    sys.exit(1)
-
-alto, ancho = frame.shape[:2]
-
-# ------------------------------
-# Inicializar background subtractor
-# ------------------------------
-fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=25, detectShadows=False)
+# Colores pygame
+WHITE = (255, 255, 255)
+BLUE = (0, 200, 255)
+RED = (255, 0, 0)
 
 # ------------------------------
 # Configuración del Blob Detector
 # ------------------------------
-params = cv2.SimpleBlobDetector_Params()
-params.filterByArea = True
-params.minArea = 5
-params.maxArea = 5000
-
-params.filterByConvexity = True
-params.minConvexity = 0.5
+def crear_detector(escala=1.0):
+    params = cv2.SimpleBlobDetector_Params()
+    params.filterByArea = True
+    # Las áreas son del cuadro completo: a la escala de proceso se reducen
+    params.minArea = 5 * escala ** 2
+    params.maxArea = 5000 * escala ** 2
 
-params.filterByInertia = True
-params.minInertiaRatio = 0.1
+    params.filterByConvexity = True
+    params.minConvexity = 0.5
 
-if cv2.__version__.startswith("3.") or cv2.__version__.startswith("4."):
-    detector = cv2.SimpleBlobDetector_create(params)
-else:
-    detector = cv2.SimpleBlobDetector(params)
+    params.filterByInertia = True
+    params.minInertiaRatio = 0.1
 
-# ------------------------------
-# Inicializar pygame
-# ------------------------------
-pygame.init()
-screen = pygame.display.set_mode((ancho, alto))
-pygame.display.set_caption("Detección de burbujas")
-font = pygame.font.SysFont("Arial", 16)
-clock = pygame.time.Clock()
+    if cv2.__version__.startswith("3.") or cv2.__version__.startswith("4."):
+        return cv2.SimpleBlobDetector_create(params)
+    return cv2.SimpleBlobDetector(params)
 
-# Colores pygame
-WHITE = (255, 255, 255)
-BLUE = (0, 200, 255)
-RED = (255, 0, 0)
+# Un detector por hilo del pool (y por escala)
+_local = threading.local()
 
-frame_count = 0
+def _detector(escala):
+    if not hasattr(_local, "detectores"):
+        _local.detectores = {}
+    if escala not in _local.detectores:
+        _local.detectores[escala] = crear_detector(escala)
+    return _local.detectores[escala]
 
 # ==============================
-# BUCLE PRINCIPAL
+# PROCESAMIENTO DE UN CUADRO
 # ==============================
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Fin del video.")
-        break
-
-    frame_count += 1
-
-    # --------------------------
-    # Preprocesamiento OpenCV
-    # --------------------------
-    fgmask = fgbg.apply(frame)            # aplicar background subtraction
-    fgmask_copy = fgmask.copy()           # copia de la máscara (lo pediste explícito)
+def _mascara_fina(frame, fondo, region):
+    """Máscara de primer plano de una ventana del cuadro completo, contra el fondo de MOG2 ampliado."""
+    kernel = np.ones((3, 3), np.uint8)
+    def mascara_en(x0, y0, x1, y1):
+        diferencia = cv2.absdiff(frame[y0:y1, x0:x1], ventana_escalada(fondo, region, frame.shape, x0, y0, x1, y1))
+        mascara = (diferencia.max(axis=2) > UMBRAL_FONDO).astype(np.uint8)
+        return cv2.morphologyEx(mascara, cv2.MORPH_OPEN, kernel)
+    return mascara_en
 
+def procesar_cuadro(indice, frame, datos, dibujar=True, region=None):
+    """
+    Limpia la máscara de primer plano, busca contornos y blobs y, si se pide,
+    los dibuja sobre el cuadro. Se ejecuta en un hilo del pool: no depende de
+    los cuadros anteriores (el modelo de fondo ya se aplicó en la captura).
+    `datos` es (máscara, fondo) a la escala de la región; con fondo, las cajas
+    se refinan a resolución completa.
+    """
+    region = region or Region()
+    fgmask, fondo = datos
     kernel = np.ones((3, 3), np.uint8)
-    fgmask_clean = cv2.morphologyEx(fgmask_copy, cv2.MORPH_OPEN, kernel, iterations=1)
+    fgmask_clean = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, kernel, iterations=1)
     fgmask_clean = cv2.morphologyEx(fgmask_clean, cv2.MORPH_CLOSE, kernel, iterations=1)
 
     # Contornos
     contornos, hierarchy = cv2.findContours(fgmask_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    area_min = MIN_CONTOUR_AREA * region.escala ** 2
+    cajas = np.array([cv2.boundingRect(c) for c in contornos if cv2.contourArea(c) > area_min],
+                     dtype=np.int32).reshape(-1, 4)
+    cajas = region.cajas_a_completa(cajas, frame.shape)
+    if fondo is not None:
+        cajas = refinar(cajas, _mascara_fina(frame, fondo, region), region.limites(frame.shape))
 
-    # Detecciones
-    for i, c in enumerate(contornos):
-        area = cv2.contourArea(c)
-        if area > MIN_CONTOUR_AREA:
-            # ======= AQUÍ USAMOS cv2.boundingRect =======
-            x, y, w, h = cv2.boundingRect(c)
-            cx, cy = x + w // 2, y + h // 2
+    # Detección de blobs
+    keypoints = _detector(region.escala).detect(fgmask_clean)
+    # Keypoints como columnas x, y, tam, en el cuadro completo
+    blobs = np.array([(k.pt[0], k.pt[1], k.size) for k in keypoints], dtype=np.float32).reshape(-1, 3)
+    blobs = region.puntos_a_completa(blobs, frame.shape)
 
-            # Dibujar rectángulo en OpenCV
+    if dibujar:
+        if region.roi is not None:
+            x0, y0, x1, y1 = region.limites(frame.shape)
+            cv2.rectangle(frame, (x0, y0), (x1 - 1, y1 - 1), (255, 0, 0), 1)
+        # Los ID los pone el seguimiento, que va en orden en el consumidor
+        for x, y, w, h in cajas.tolist():
+            cx, cy = x + w // 2, y + h // 2
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 1)
-            cv2.putText(frame, f"ID:{i}", (x, y - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
             cv2.putText(frame, f"({cx},{cy})", (x, y + h + 12),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.4, (200, 200, 200), 1)
+        keypoints = [cv2.KeyPoint(x, y, tam) for x, y, tam in blobs.tolist()]
+        frame = cv2.drawKeypoints(frame, keypoints, np.array([]), (0, 0, 255),
+                                  cv2.DRAW_MATCHES_FLAGS_DRAW_RICH_KEYPOINTS)
+    return {"cuadro": frame, "contornos": len(contornos), "cajas": cajas, "keypoints": blobs}
 
-    # --------------------------
-    # Detección de blobs
-    # --------------------------
-    keypoints = detector.detect(fgmask_clean)
-    im_with_keypoints = cv2.drawKeypoints(frame, keypoints, np.array([]),
-                                          (0, 0, 255),
-                                          cv2.DRAW_MATCHES_FLAGS_DRAW_RICH_KEYPOINTS)
-
-    # --------------------------
-    # Mostrar en pygame
-    # --------------------------
-    im_rgb = cv2.cvtColor(im_with_keypoints, cv2.COLOR_BGR2RGB)
-    surface = pygame.image.frombuffer(im_rgb.tobytes(), (ancho, alto), 'RGB')
-    screen.blit(surface, (0, 0))
-
-    # Líneas de referencia
-    pygame.draw.line(screen, BLUE, (ancho // 2, 0), (ancho // 2, alto), 1)
-    pygame.draw.line(screen, BLUE, (0, alto // 2), (ancho, alto // 2), 1)
-
-    # Info
-    text = font.render(f"Frame:{frame_count} Contornos:{len(contornos)} Keypoints:{len(keypoints)}",
-                       True, WHITE)
-    screen.blit(text, (10, 10))
-
-    pygame.display.flip()
-    clock.tick(30)
-
-    # Eventos pygame
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            cap.release()
-            pygame.quit()
-            sys.exit(0)
-        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-            cap.release()
-            pygame.quit()
-            sys.exit(0)
+def crear_flujo(cap, hilos=None, tam_cola=TAM_COLA, descartar=False, dibujar=True, region=None,
+                refinar_cajas=False):
+    """
+    Arma el flujo captura -> pool -> consumidor para un video ya abierto. El
+    modelo de fondo y la detección corren en la `region` (escala y recorte).
+    """
+    region = region or Region()
+    # El modelo de fondo depende de los cuadros anteriores: se aplica en orden, en la captura
+    fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=25, detectShadows=False)
+    def en_orden(frame):
+        fgmask = fgbg.apply(region.reducir(frame))
+        return fgmask, (fgbg.getBackgroundImage() if refinar_cajas else None)
+    return FlujoVideo(cap, lambda i, frame, datos: procesar_cuadro(i, frame, datos, dibujar, region),
+                      en_orden=en_orden, hilos=hilos, tam_cola=tam_cola, descartar=descartar)
+
+# ==============================
+# SEGUIMIENTO
+# ==============================
+def seguir(seguidor, indice, resultado):
+    """Asigna un id persistente a cada caja del cuadro; devuelve (ids, velocidades)."""
+    cajas = resultado["cajas"]
+    ids = seguidor.actualizar(cajas[:, :2] + cajas[:, 2:] / 2, indice)
+    return ids, seguidor.velocidad(ids)
+
+def dibujar_pistas(frame, cajas, ids, seguidor):
+    for (x, y, w, h), i in zip(cajas.tolist(), ids.tolist()):
+        cv2.putText(frame, f"ID:{i}", (x, y - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+    # Trayectoria reciente de cada pista, todas en una sola llamada
+    trayectorias = [np.array([(x, y) for _, x, y in seguidor.trayectorias[i]], dtype=np.int32)
+                    for i in ids.tolist() if len(seguidor.trayectorias[i]) > 1]
+    cv2.polylines(frame, trayectorias, False, (255, 0, 255), 1)
+
+# ==============================
+# CONSUMIDORES
+# ==============================
+def mostrar(flujo, ancho, alto, fps=0, seguidor=None):
+    """
+    Muestra los cuadros procesados en una ventana de pygame; fps=0 no limita
+    la velocidad. Con un Seguidor, cada caja lleva su id y su trayectoria.
+    """
+    import pygame
+    pygame.init()
+    screen = pygame.display.set_mode((ancho, alto))
+    pygame.display.set_caption("Detección de burbujas")
+    font = pygame.font.SysFont("Arial", 16)
+    clock = pygame.time.Clock()
+    # Un solo búfer y una sola Surface para todo el video: la Surface lee los
+    # píxeles del búfer en BGR, así que cada cuadro es una copia sin conversión
+    buffer = np.empty((alto, ancho, 3), dtype=np.uint8)
+    surface = pygame.image.frombuffer(buffer, (ancho, alto), "BGR")
+    ms_pantalla = 0.0
+
+    try:
+        for indice, _, resultado in flujo:
+            if seguidor is not None:
+                ids, _ = seguir(seguidor, indice, resultado)
+                dibujar_pistas(resultado["cuadro"], resultado["cajas"], ids, seguidor)
+            inicio = time.perf_counter()
+            cuadro = resultado["cuadro"]
+            if cuadro.shape[:2] == (alto, ancho):
+                np.copyto(buffer, cuadro)
+            else:
+                cv2.resize(cuadro, (ancho, alto), dst=buffer)
+            screen.blit(surface, (0, 0))
+
+            # Líneas de referencia
+            pygame.draw.line(screen, BLUE, (ancho // 2, 0), (ancho // 2, alto), 1)
+            pygame.draw.line(screen, BLUE, (0, alto // 2), (ancho, alto // 2), 1)
+
+            # Info
+            text = font.render(f"Frame:{indice + 1} Contornos:{resultado['contornos']} "
+                               f"Keypoints:{len(resultado['keypoints'])} Descartados:{flujo.descartados} "
+                               f"FPS:{clock.get_fps():.0f} Pantalla:{ms_pantalla:.2f} ms", True, WHITE)
+            screen.blit(text, (10, 10))
+
+            pygame.display.flip()
+            # Costo de pasar el cuadro a la ventana (promedio móvil)
+            ms_pantalla = 0.9 * ms_pantalla + 0.1 * (time.perf_counter() - inicio) * 1000
+            clock.tick(fps)
+
+            # Eventos pygame
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    return
+        print("Fin del video.")
+    finally:
+        pygame.quit()
+
+def consumir(flujo, escritor=None, seguidor=None, intervalo=2.0):
+    """
+    Procesa todos los cuadros sin ventana, lo más rápido posible, y escribe
+    sus detecciones si se pasa un EscritorDetecciones (con el id y la
+    velocidad de su pista, si se pasa un Seguidor). Cada `intervalo`
+    segundos informa el avance por la salida de error.
+    Devuelve (cuadros, segundos).
+    """
+    inicio = ultimo_informe = time.perf_counter()
+    cuadros = cuadros_informados = 0
+    for indice, _, resultado in flujo:
+        ids = velocidades = None
+        if seguidor is not None:
+            ids, velocidades = seguir(seguidor, indice, resultado)
+        if escritor is not None:
+            escritor.agregar(indice, resultado["contornos"], resultado["cajas"], resultado["keypoints"],
+                             ids, velocidades)
+        cuadros += 1
+        ahora = time.perf_counter()
+        if ahora - ultimo_informe >= intervalo:
+            print(f"cuadro {indice + 1}: {(cuadros - cuadros_informados) / (ahora - ultimo_informe):.1f} fps",
+                  file=sys.stderr)
+            ultimo_informe, cuadros_informados = ahora, cuadros
+    return cuadros, time.perf_counter() - inicio
 
 # ==============================
-# FIN
+# PROGRAMA PRINCIPAL
 # ==============================
-cap.release()
-pygame.quit()
-cv2.destroyAllWindows()
-print("Programa terminado correctamente.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detección de burbujas con sustracción de fondo.")
+    parser.add_argument("fuente", nargs="?", default=VIDEO_PATH, help="Archivo de video o número de cámara")
+    parser.add_argument("-j", "--hilos", type=int, default=None, help="Hilos de procesamiento (por defecto, todos los núcleos)")
+    parser.add_argument("--cola", type=int, default=TAM_COLA, help="Cuadros en vuelo entre la captura y la pantalla")
+    parser.add_argument("--descartar", action="store_true",
+                        help="Con la cola llena, descartar el cuadro más viejo (por defecto, solo con cámaras)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Limitar la ventana a estos cuadros por segundo (por defecto, los del video; 0 = sin límite)")
+    parser.add_argument("--sin-ventana", action="store_true",
+                        help="Procesar sin pygame ni límite de velocidad e informar los cuadros por segundo")
+    parser.add_argument("-o", "--salida", default=None,
+                        help="Con --sin-ventana, carpeta donde escribir las detecciones por cuadro (ver detecciones.py)")
+    parser.add_argument("--asignacion", choices=sorted(ASIGNACIONES), default="hungaro",
+                        help="Cómo asignar detecciones a pistas en el seguimiento")
+    parser.add_argument("--sin-seguimiento", action="store_true", help="No seguir las burbujas entre cuadros")
+    parser.add_argument("--escala", type=float, default=1.0,
+                        help="Escala a la que se detecta, en (0, 1] (las coordenadas siguen siendo del cuadro completo)")
+    parser.add_argument("--roi", type=leer_roi, default=None, help="Detectar solo en la región x,y,ancho,alto")
+    parser.add_argument("--refinar", action="store_true",
+                        help="Rehacer cada caja a resolución completa en una ventana a su alrededor")
+    args = parser.parse_args(argv)
+    if not 0 < args.escala <= 1:
+        parser.error("--escala debe estar en (0, 1]")
+
+    camara = args.fuente.isdigit()
+    cap = cv2.VideoCapture(int(args.fuente) if camara else args.fuente)
+    ancho = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    alto = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if not cap.isOpened() or ancho == 0:
+        print("No se pudo abrir el video.")
+        return 1
+
+    # Una cámara no espera: si el procesamiento se atrasa, se pierden los cuadros viejos
+    descartar = args.descartar or camara
+    flujo = crear_flujo(cap, args.hilos, args.cola, descartar, dibujar=not args.sin_ventana,
+                        region=Region(args.escala, args.roi), refinar_cajas=args.refinar)
+    # El seguimiento depende del cuadro anterior: corre en el consumidor, que recibe los cuadros en orden
+    seguidor = None if args.sin_seguimiento else Seguidor(asignacion=args.asignacion)
+    try:
+        if args.sin_ventana:
+            escritor = EscritorDetecciones(args.salida) if args.salida else None
+            try:
+                cuadros, segundos = consumir(flujo, escritor, seguidor)
+            finally:
+                if escritor is not None:
+                    escritor.cerrar()
+            print(f"{cuadros} cuadros en {segundos:.2f} s ({cuadros / max(segundos, 1e-9):.1f} fps), "
+                  f"{flujo.descartados} descartados")
+        else:
+            fps = args.fps if args.fps is not None else (0 if camara else cap.get(cv2.CAP_PROP_FPS))
+            mostrar(flujo, ancho, alto, fps, seguidor)
+    finally:
+        cap.release()
+    print("Programa terminado correctamente.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,75 @@
+"""
+Posición de una esfera naranja en video, por cuadrante.
+
+Ejemplos:
+    python posicionescolorvideo.py                             # esferamovimiento.mp4
+    python posicionescolorvideo.py --escala 0.5 --refinar      # detecta a media resolución
+    python posicionescolorvideo.py --roi 0,0,640,360           # solo en esa región (x,y,ancho,alto)
+
+La conversión a HSV y el inRange corren sobre el cuadro reducido o
+recortado (ver region.py); la posición vuelve al cuadro completo.
+"""
+import argparse
+
 import cv2
 import numpy as np
+from region import Region, leer_roi, refinar
 # import serial
 # arduino = serial.Serial('COM3', 9600)
 
-cap = cv2.VideoCapture('esferamovimiento.mp4')
+VIDEO_PATH = 'esferamovimiento.mp4'
+naranja_bajo = np.array([1, 190, 20])
+naranja_alto = np.array([18, 255, 255])
 
-while cap.isOpened():
-    ret, image = cap.read()
-    if not ret:  # Si no se pudo leer el frame (fin de video o error)
-        print("Fin del video o error al leer frame.")
-        break
-
-    m, n, _ = image.shape
-    cv2.line(image, (0, int(m/2)), (n, int(m/2)), (0, 0, 255), 1)
-    cv2.line(image, (int(n/2), 0), (int(n/2), m), (0, 0, 255), 1)
-
-    naranja_bajo = np.array([1, 190, 20])
-    naranja_alto = np.array([18, 255, 255])
+def mascara_naranja(image):
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-    mascara_naranja = cv2.inRange(hsv, naranja_bajo, naranja_alto)
+    return cv2.inRange(hsv, naranja_bajo, naranja_alto)
 
-    cnts, _ = cv2.findContours(mascara_naranja, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+def detectar_esfera(image, region, refinar_caja=False):
+    """Caja (x, y, ancho, alto) de la esfera en el cuadro completo, o None."""
+    cnts, _ = cv2.findContours(mascara_naranja(region.reducir(image)), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     for c in cnts:
         epsilon = 0.01 * cv2.arcLength(c, True)
         approx = cv2.approxPolyDP(c, epsilon, True)
         if len(approx) > 10:
-            x, y, w, h = cv2.boundingRect(approx)
+            caja = region.cajas_a_completa(cv2.boundingRect(approx), image.shape)
+            if refinar_caja:
+                # Solo la ventana alrededor de la esfera se pasa a HSV a resolución completa
+                caja = refinar(caja, lambda x0, y0, x1, y1: mascara_naranja(image[y0:y1, x0:x1]),
+                               region.limites(image.shape))
+            return tuple(caja[0].tolist())
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Posición de una esfera naranja por cuadrante.")
+    parser.add_argument("fuente", nargs="?", default=VIDEO_PATH, help="Archivo de video")
+    parser.add_argument("--escala", type=float, default=1.0, help="Escala a la que se detecta, en (0, 1]")
+    parser.add_argument("--roi", type=leer_roi, default=None, help="Detectar solo en la región x,y,ancho,alto")
+    parser.add_argument("--refinar", action="store_true",
+                        help="Rehacer la caja a resolución completa en una ventana a su alrededor")
+    args = parser.parse_args(argv)
+    if not 0 < args.escala <= 1:
+        parser.error("--escala debe estar en (0, 1]")
+    region = Region(args.escala, args.roi)
+
+    cap = cv2.VideoCapture(args.fuente)
+
+    while cap.isOpened():
+        ret, image = cap.read()
+        if not ret:  # Si no se pudo leer el frame (fin de video o error)
+            print("Fin del video o error al leer frame.")
+            break
+
+        m, n, _ = image.shape
+        cv2.line(image, (0, int(m/2)), (n, int(m/2)), (0, 0, 255), 1)
+        cv2.line(image, (int(n/2), 0), (int(n/2), m), (0, 0, 255), 1)
+        if region.roi is not None:
+            x0, y0, x1, y1 = region.limites(image.shape)
+            cv2.rectangle(image, (x0, y0), (x1 - 1, y1 - 1), (255, 0, 0), 1)
+
+        caja = detectar_esfera(image, region, args.refinar)
+        if caja is not None:
+            x, y, w, h = caja
             mensaje = f"({x},{y})"
             if y < m/2:
                 if x < n/2:
@@ -47,13 +91,15 @@ while cap.isOpened():
                     # arduino.write(b'd')
 
             cv2.putText(image, mensaje, (x, y-5), 1, 1, (255, 255, 255), 1)
+
+        cv2.imshow('imagen', image)
+        k = cv2.waitKey(30) & 0xff
+        if k == 27:  # Tecla ESC para salir
             break
 
-    cv2.imshow('imagen', image)
-    k = cv2.waitKey(30) & 0xff
-    if k == 27:  # Tecla ESC para salir
-        break
+    cap.release()
+    cv2.destroyAllWindows()
+    # arduino.close()
 
-cap.release()
-cv2.destroyAllWindows()
-# arduino.close()
+if __name__ == "__main__":
+    main()
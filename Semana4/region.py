@@ -0,0 +1,107 @@
+"""
+Región de procesamiento de los detectores de video: escala y recorte.
+
+Los detectores corren sobre el cuadro recortado a una región de interés
+(roi = x, y, ancho, alto, en píxeles del cuadro completo) y reducido por
+`escala`; las cajas y puntos que encuentran se llevan de vuelta al cuadro
+completo para dibujarlos y guardarlos.
+
+Reducir pierde precisión en los bordes de los objetos (una caja a escala
+0.5 puede quedar hasta 2 píxeles más grande por lado). refinar() la
+recupera: rehace cada caja con una máscara a resolución completa calculada
+solo en una ventana alrededor de ella, así que el costo es proporcional a
+los objetos y no al cuadro.
+"""
+import cv2
+import numpy as np
+
+ESCALA = 1.0
+MARGEN_REFINADO = 4   # Píxeles del cuadro completo que se agregan alrededor de cada caja al refinar
+
+def leer_roi(texto):
+    """Convierte "x,y,ancho,alto" en una tupla de enteros (para argparse)."""
+    valores = tuple(int(v) for v in texto.split(","))
+    if len(valores) != 4 or valores[2] <= 0 or valores[3] <= 0:
+        raise ValueError(f"Región inválida: {texto}")
+    return valores
+
+class Region:
+    def __init__(self, escala=ESCALA, roi=None):
+        if not 0 < escala <= 1:
+            raise ValueError(f"La escala debe estar en (0, 1]: {escala}")
+        self.escala = escala
+        self.roi = roi
+
+    def limites(self, forma):
+        """(x0, y0, x1, y1) de la región dentro de un cuadro de esa forma."""
+        alto, ancho = forma[:2]
+        if self.roi is None:
+            return 0, 0, ancho, alto
+        x, y, w, h = self.roi
+        x0, y0 = min(max(x, 0), ancho), min(max(y, 0), alto)
+        return x0, y0, max(min(x + w, ancho), x0), max(min(y + h, alto), y0)
+
+    def reducir(self, img, interpolacion=cv2.INTER_AREA):
+        """Recorta la imagen a la región (sin copiar) y la reduce a la escala de proceso."""
+        x0, y0, x1, y1 = self.limites(img.shape)
+        img = img[y0:y1, x0:x1]
+        if self.escala == 1:
+            return img
+        return cv2.resize(img, None, fx=self.escala, fy=self.escala, interpolation=interpolacion)
+
+    def cajas_a_completa(self, cajas, forma):
+        """Lleva cajas (n, 4) de x, y, ancho, alto del cuadro reducido al completo, cubriendo los mismos píxeles."""
+        x0, y0, x1, y1 = self.limites(forma)
+        cajas = np.asarray(cajas).reshape(-1, 4)
+        ini = np.floor(cajas[:, :2] / self.escala) + (x0, y0)
+        fin = np.ceil((cajas[:, :2] + cajas[:, 2:]) / self.escala) + (x0, y0)
+        fin = np.minimum(fin, (x1, y1))
+        return np.hstack([ini, fin - ini]).astype(np.int32)
+
+    def puntos_a_completa(self, puntos, forma):
+        """Lleva puntos (n, 2+) al cuadro completo: x, y se trasladan y las columnas siguientes (tamaños) solo se escalan."""
+        x0, y0, _, _ = self.limites(forma)
+        puntos = np.array(puntos, dtype=np.float32, ndmin=2)
+        # Centro de píxel a centro de píxel
+        puntos[:, :2] = (puntos[:, :2] + 0.5) / self.escala - 0.5 + (x0, y0)
+        puntos[:, 2:] /= self.escala
+        return puntos
+
+def refinar(cajas, mascara_en, limites, margen=MARGEN_REFINADO):
+    """
+    Rehace cada caja (ya en el cuadro completo) con la máscara fina de una
+    ventana a su alrededor: mascara_en(x0, y0, x1, y1) devuelve la máscara
+    uint8 de esa ventana a resolución completa. Las ventanas no salen de
+    `limites` (x0, y0, x1, y1, los de la región). La caja nueva es la de la
+    mancha más grande de la ventana; si la ventana no tiene ninguna, queda
+    la caja original.
+    """
+    rx0, ry0, rx1, ry1 = limites
+    cajas = np.asarray(cajas, dtype=np.int32).reshape(-1, 4)
+    refinadas = cajas.copy()
+    for k, (x, y, w, h) in enumerate(cajas.tolist()):
+        x0, y0 = max(x - margen, rx0), max(y - margen, ry0)
+        x1, y1 = min(x + w + margen, rx1), min(y + h + margen, ry1)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mascara_en(x0, y0, x1, y1), 8, cv2.CV_32S)
+        if n < 2:
+            continue
+        mayor = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        mx, my, mw, mh = stats[mayor, :4].tolist()
+        refinadas[k] = (x0 + mx, y0 + my, mw, mh)
+    return refinadas
+
+def ventana_escalada(img_reducida, region, forma, x0, y0, x1, y1, interpolacion=cv2.INTER_LINEAR):
+    """
+    La ventana (x0, y0, x1, y1) del cuadro completo tomada de una imagen
+    reducida por la región y ampliada a resolución completa (por ejemplo, el
+    fondo del modelo de MOG2, para compararlo con el cuadro original).
+    """
+    rx, ry, _, _ = region.limites(forma)
+    e = region.escala
+    # Cada píxel (u, v) de la ventana sale del punto que le corresponde en la imagen reducida
+    M = np.float32([[e, 0, e * (x0 - rx + 0.5) - 0.5],
+                    [0, e, e * (y0 - ry + 0.5) - 0.5]])
+    return cv2.warpAffine(img_reducida, M, (x1 - x0, y1 - y0),
+                          flags=interpolacion | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
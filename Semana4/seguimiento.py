@@ -0,0 +1,239 @@
+"""
+Seguimiento de varios objetos con identificadores persistentes.
+
+En cada cuadro:
+1. Cada pista predice su posición con velocidad constante.
+2. Se arma la matriz de costos pistas x detecciones (distancia al cuadrado
+   entre la predicción y el centroide) de una vez con NumPy; los pares más lejos que
+   distancia_max no se pueden asignar.
+3. La asignación es voraz (pares mutuamente más cercanos, por rondas) o
+   húngara (óptima, algoritmo de Kuhn-Munkres con potenciales).
+4. Las pistas asignadas actualizan posición y velocidad; las detecciones
+   sin pista abren pistas nuevas; las pistas sin detección durante más de
+   perdidos_max cuadros se cierran.
+
+El estado de todas las pistas vive en arreglos paralelos, así que predecir,
+armar los costos y actualizar cientos de pistas cuesta unas pocas
+operaciones vectorizadas. El método húngaro es un bucle de Python O(k³),
+pero solo sobre los grupos de pistas y detecciones que compiten entre sí.
+"""
+import collections
+
+import numpy as np
+
+DISTANCIA_MAX = 30.0   # Píxeles entre la predicción y la detección para poder asignarlas
+PERDIDOS_MAX = 5       # Cuadros sin detección antes de cerrar una pista
+SUAVIZADO = 0.5        # Peso de la velocidad medida frente a la anterior
+LARGO_TRAYECTORIA = 64 # Posiciones que se guardan por pista (None = todas)
+
+# ==============================
+# ASIGNACIÓN
+# ==============================
+def asignar_voraz(costo):
+    """
+    Pares (filas, columnas) de costo finito elegidos de menor a mayor costo:
+    en cada ronda se asignan todos los pares que son el mínimo de su fila y
+    de su columna, lo que da el mismo resultado que ordenar todos los pares.
+    """
+    costo = np.array(costo, dtype=np.float64)
+    filas, columnas = [], []
+    while costo.size and np.isfinite(costo).any():
+        j = np.argmin(costo, axis=1)
+        i = np.arange(costo.shape[0])
+        mutuos = np.isfinite(costo[i, j]) & (np.argmin(costo, axis=0)[j] == i)
+        i, j = i[mutuos], j[mutuos]
+        filas.append(i)
+        columnas.append(j)
+        costo[i, :] = np.inf
+        costo[:, j] = np.inf
+    if not filas:
+        vacio = np.zeros(0, dtype=np.intp)
+        return vacio, vacio
+    return np.concatenate(filas), np.concatenate(columnas)
+
+def _componentes(permitido):
+    """
+    Componente conexa de cada fila y de cada columna en el grafo de pares
+    permitidos (etiqueta = menor índice del componente, filas antes que
+    columnas). Se propaga el mínimo por las aristas y se acortan las etiquetas
+    hasta que no cambian: pocas rondas vectorizadas.
+    """
+    n = permitido.shape[0]
+    f, c = np.nonzero(permitido)
+    etiqueta = np.arange(n + permitido.shape[1])
+    while True:
+        menor = np.minimum(etiqueta[f], etiqueta[n + c])
+        nueva = etiqueta.copy()
+        np.minimum.at(nueva, f, menor)
+        np.minimum.at(nueva, n + c, menor)
+        nueva = nueva[nueva]
+        if np.array_equal(nueva, etiqueta):
+            return etiqueta[:n], etiqueta[n:]
+        etiqueta = nueva
+
+def asignar_hungaro(costo):
+    """
+    Asignación de costo total mínimo (pares de costo finito), con el método
+    húngaro. Las pistas y detecciones se separan en grupos que no comparten
+    ningún par permitido y cada grupo se resuelve por separado: los pares
+    sin alternativa se asignan de una vez, y el método (O(k³) en el tamaño
+    k del grupo) solo recorre los grupos con más de una opción, que con
+    objetos separados son pocos y chicos.
+    """
+    costo = np.asarray(costo, dtype=np.float64)
+    permitido = np.isfinite(costo)
+    por_fila, por_columna = permitido.sum(axis=1), permitido.sum(axis=0)
+    unicos = permitido & (por_fila == 1)[:, None] & (por_columna == 1)[None, :]
+    fijas, fijas_col = np.nonzero(unicos)
+    resto_f = np.flatnonzero((por_fila > 0) & ~unicos.any(axis=1))
+    resto_c = np.flatnonzero((por_columna > 0) & ~unicos.any(axis=0))
+    filas, columnas = [fijas], [fijas_col]
+    grupo_f, grupo_c = _componentes(permitido)
+    resto_f = resto_f[np.argsort(grupo_f[resto_f], kind="stable")]
+    resto_c = resto_c[np.argsort(grupo_c[resto_c], kind="stable")]
+    grupos, desde_f = np.unique(grupo_f[resto_f], return_index=True)
+    # Todo grupo que queda tiene filas y columnas, y en el mismo orden
+    desde_c = np.searchsorted(grupo_c[resto_c], grupos)
+    for f, c in zip(np.split(resto_f, desde_f[1:]), np.split(resto_c, desde_c[1:])):
+        i, j = _hungaro(costo[np.ix_(f, c)])
+        filas.append(f[i])
+        columnas.append(c[j])
+    filas, columnas = np.concatenate(filas), np.concatenate(columnas)
+    orden = np.argsort(filas)
+    return filas[orden], columnas[orden]
+
+def _hungaro(costo):
+    transpuesta = costo.shape[0] > costo.shape[1]
+    if transpuesta:
+        costo = costo.T
+    n, m = costo.shape
+    if n == 0:
+        vacio = np.zeros(0, dtype=np.intp)
+        return vacio, vacio
+    finitos = costo[np.isfinite(costo)]
+    # Los pares prohibidos cuestan más que cualquier asignación completa de pares permitidos
+    grande = (finitos.max() + 1) * (n + 1) if finitos.size else 1.0
+    C = np.where(np.isfinite(costo), costo, grande)
+
+    # Filas y columnas desde 1; la columna 0 es un comodín (e-maxx)
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    fila_de = np.zeros(m + 1, dtype=np.intp)   # Fila asignada a cada columna (0 = libre)
+    for i in range(1, n + 1):
+        fila_de[0] = i
+        j0 = 0
+        minimo = np.full(m + 1, np.inf)
+        previa = np.zeros(m + 1, dtype=np.intp)
+        usada = np.zeros(m + 1, dtype=bool)
+        while True:
+            usada[j0] = True
+            i0 = fila_de[j0]
+            libres = ~usada[1:]
+            reducido = C[i0 - 1] - u[i0] - v[1:]
+            mejora = libres & (reducido < minimo[1:])
+            minimo[1:][mejora] = reducido[mejora]
+            previa[1:][mejora] = j0
+            candidatos = np.where(libres, minimo[1:], np.inf)
+            j1 = int(np.argmin(candidatos)) + 1
+            delta = candidatos[j1 - 1]
+            u[fila_de[usada]] += delta
+            v[usada] -= delta
+            minimo[1:][libres] -= delta
+            j0 = j1
+            if fila_de[j0] == 0:
+                break
+        # Se invierte el camino aumentante
+        while j0:
+            j1 = previa[j0]
+            fila_de[j0] = fila_de[j1]
+            j0 = j1
+
+    columnas = np.flatnonzero(fila_de[1:])
+    filas = fila_de[1:][columnas] - 1
+    validos = np.isfinite(costo[filas, columnas])
+    filas, columnas = filas[validos], columnas[validos]
+    if transpuesta:
+        filas, columnas = columnas, filas
+    return filas, columnas
+
+ASIGNACIONES = {"voraz": asignar_voraz, "hungaro": asignar_hungaro}
+
+# ==============================
+# SEGUIDOR
+# ==============================
+class Seguidor:
+    def __init__(self, distancia_max=DISTANCIA_MAX, perdidos_max=PERDIDOS_MAX, asignacion="hungaro",
+                 largo_trayectoria=LARGO_TRAYECTORIA):
+        if asignacion not in ASIGNACIONES:
+            raise ValueError(f"Asignación desconocida: {asignacion}")
+        self.distancia_max = distancia_max
+        self.perdidos_max = perdidos_max
+        self.asignar = ASIGNACIONES[asignacion]
+        self.largo_trayectoria = largo_trayectoria
+        self.siguiente_id = 0
+        # Estado de las pistas abiertas, en arreglos paralelos
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.posiciones = np.zeros((0, 2))
+        self.velocidades = np.zeros((0, 2))       # Píxeles por cuadro
+        self.ultimo_cuadro = np.zeros(0, dtype=np.int64)
+        self.trayectorias = {}                    # id -> deque de (cuadro, x, y)
+
+    def predicciones(self, cuadro):
+        """Posición esperada de cada pista abierta en `cuadro`."""
+        pasos = (cuadro - self.ultimo_cuadro)[:, None]
+        return self.posiciones + self.velocidades * pasos
+
+    def actualizar(self, centroides, cuadro):
+        """
+        Asigna las detecciones del cuadro (arreglo (n, 2) de x, y) a las pistas
+        y devuelve el id de cada detección, en el mismo orden.
+        """
+        centroides = np.asarray(centroides, dtype=np.float64).reshape(-1, 2)
+        prediccion = self.predicciones(cuadro)
+        # Costo: distancia al cuadrado entre cada predicción y cada detección
+        dx = np.subtract.outer(prediccion[:, 0], centroides[:, 0])
+        dy = np.subtract.outer(prediccion[:, 1], centroides[:, 1])
+        costo = dx * dx
+        costo += dy * dy
+        costo[costo > self.distancia_max ** 2] = np.inf
+        pistas, detecciones = self.asignar(costo)
+
+        ids = np.empty(len(centroides), dtype=np.int64)
+        ids[detecciones] = self.ids[pistas]
+        # Pistas asignadas: velocidad medida suavizada y posición nueva
+        pasos = np.maximum(cuadro - self.ultimo_cuadro[pistas], 1)[:, None]
+        medida = (centroides[detecciones] - self.posiciones[pistas]) / pasos
+        self.velocidades[pistas] = SUAVIZADO * medida + (1 - SUAVIZADO) * self.velocidades[pistas]
+        self.posiciones[pistas] = centroides[detecciones]
+        self.ultimo_cuadro[pistas] = cuadro
+
+        # Detecciones sin pista: pistas nuevas
+        nuevas = np.ones(len(centroides), dtype=bool)
+        nuevas[detecciones] = False
+        cantidad = int(nuevas.sum())
+        ids[nuevas] = np.arange(self.siguiente_id, self.siguiente_id + cantidad)
+        self.siguiente_id += cantidad
+        self.ids = np.concatenate([self.ids, ids[nuevas]])
+        self.posiciones = np.concatenate([self.posiciones, centroides[nuevas]])
+        self.velocidades = np.concatenate([self.velocidades, np.zeros((cantidad, 2))])
+        self.ultimo_cuadro = np.concatenate([self.ultimo_cuadro, np.full(cantidad, cuadro)])
+
+        for i, (x, y) in zip(ids.tolist(), centroides.tolist()):
+            if i not in self.trayectorias:
+                self.trayectorias[i] = collections.deque(maxlen=self.largo_trayectoria)
+            self.trayectorias[i].append((cuadro, x, y))
+
+        # Pistas perdidas demasiado tiempo: se cierran
+        vigentes = cuadro - self.ultimo_cuadro <= self.perdidos_max
+        for i in self.ids[~vigentes].tolist():
+            self.trayectorias.pop(i, None)
+        self.ids = self.ids[vigentes]
+        self.posiciones = self.posiciones[vigentes]
+        self.velocidades = self.velocidades[vigentes]
+        self.ultimo_cuadro = self.ultimo_cuadro[vigentes]
+        return ids
+
+    def velocidad(self, ids):
+        """Velocidad (píxeles por cuadro) de las pistas abiertas con esos ids."""
+        # Los ids se crean en orden creciente y cerrar pistas no lo altera: self.ids está ordenado
+        return self.velocidades[np.searchsorted(self.ids, ids)]